@@ -0,0 +1,53 @@
+import time
+import uuid
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils.module_loading import import_string
+
+from tibib.middleware import JWTAuthenticationMiddleware
+
+ROUTES = [
+    ("public", "/static/css/styles.css"),
+    ("public, exact", "/healthz/"),
+    ("required", "/portfolio/"),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure the overhead of JWTAuthenticationMiddleware and the whole MIDDLEWARE chain per auth route class"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        view = lambda request: HttpResponse()
+        jwt_only = JWTAuthenticationMiddleware(view)
+        chain = view
+        for path in reversed(settings.MIDDLEWARE):
+            chain = import_string(path)(chain)
+
+        token = jwt.encode(
+            {"id": str(uuid.uuid4()), "full_phone": "+620000", "role": "user", "exp": int(time.time()) + 3600},
+            settings.JWT_SECRET_KEY,
+            algorithm="HS256",
+        )
+        factory = RequestFactory(HTTP_HOST="localhost")
+        for label, path in ROUTES:
+            headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if label == "required" else {}
+            request = factory.get(path, **headers)
+            self.stdout.write(
+                f"{label:>20} {path:<32} "
+                f"jwt {self.time(jwt_only, request, options['requests']):6.1f} us, "
+                f"chain {self.time(chain, request, options['requests']):6.1f} us per request"
+            )
+
+    def time(self, handler, request, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            response = handler(request)
+        assert response.status_code == 200
+        return (time.perf_counter() - start) / count * 1e6
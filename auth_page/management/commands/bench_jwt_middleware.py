@@ -0,0 +1,42 @@
+import time
+import uuid
+
+import jwt
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from tibib.middleware import JWTAuthenticationMiddleware
+
+
+class Command(BaseCommand):
+    help = "Measure requests/sec through JWTAuthenticationMiddleware with and without the token cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20000)
+        parser.add_argument("--tokens", type=int, default=50, help="Distinct users polling")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        requests = []
+        for _ in range(options["tokens"]):
+            token = jwt.encode(
+                {"id": str(uuid.uuid4()), "full_phone": "+620000", "role": "user", "exp": int(time.time()) + 3600},
+                settings.JWT_SECRET_KEY,
+                algorithm="HS256",
+            )
+            requests.append(factory.get("/dashboard/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+        for label, cache_size in [("without cache", 0), ("with cache", settings.JWT_CACHE_SIZE)]:
+            middleware = JWTAuthenticationMiddleware(lambda request: HttpResponse())
+            middleware.token_cache.maxsize = cache_size
+
+            start = time.perf_counter()
+            for i in range(options["requests"]):
+                middleware(requests[i % len(requests)])
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f"{label:>13}: {options['requests'] / elapsed:10.0f} req/s {middleware.token_cache.stats()}"
+            )
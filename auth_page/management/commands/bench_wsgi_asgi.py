@@ -0,0 +1,126 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+import httpx
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auth_page.standin import StandInAuthServer
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent logins against a slow stand-in auth service, served by gunicorn sync workers (tibib.wsgi, "
+        "sync views) and by uvicorn (tibib.asgi, async views). Every login also writes its session, run with "
+        "SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies to time only the upstream wait"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Processes for both servers")
+        parser.add_argument("--clients", type=int, default=64, help="Concurrent clients")
+        parser.add_argument("--requests", type=int, default=256)
+        parser.add_argument("--delay", type=float, default=0.5, help="Seconds the auth service takes per login")
+
+    def handle(self, *args, **options):
+        auth = StandInAuthServer(login_delay=options["delay"]).start()
+
+        env = {
+            **os.environ,
+            "API_BASE_URL": auth.base_url,
+            "AUTH_READ_TIMEOUT": str(options["delay"] * 10 + 5),
+            # Enough pooled connections that the pool is not the limit
+            "AUTH_POOL_SIZE": str(options["clients"]),
+        }
+        started = timezone.now()
+        try:
+            self.stdout.write(
+                f"{options['clients']} clients, {options['requests']} logins, "
+                f"auth service takes {options['delay'] * 1000:.0f} ms, {options['workers']} workers each:"
+            )
+            for label, command, profile in [
+                ("wsgi", ["gunicorn", "tibib.wsgi:application", "--workers", str(options["workers"])], "False"),
+                ("asgi", ["uvicorn", "tibib.asgi:application", "--workers", str(options["workers"]),
+                          "--no-access-log", "--log-level", "warning"], "True"),
+            ]:
+                self.run(label, command, {**env, "ASYNC_VIEWS": profile}, options)
+        finally:
+            auth.stop()
+            # The benchmark's logins, their sessions expire a full SESSION_COOKIE_AGE after `started`
+            Session.objects.filter(expire_date__gte=started + timedelta(seconds=settings.SESSION_COOKIE_AGE)).delete()
+
+    def run(self, label, command, env, options):
+        port = free_port()
+        bind = ["--bind", f"127.0.0.1:{port}"] if command[0] == "gunicorn" else ["--port", str(port)]
+        log = tempfile.TemporaryFile()
+        server = subprocess.Popen(
+            [sys.executable, "-m", *command, *bind], env=env, cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL, stderr=log,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            self.wait_until_up(base_url, server, log)
+            elapsed, latencies, statuses = asyncio.run(self.load(base_url, options))
+            latencies.sort()
+            ok = statuses.count(302)
+            self.stdout.write(
+                f"  {label}: {ok}/{len(statuses)} logins in {elapsed:.2f}s ({ok / elapsed:.1f}/s), "
+                f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+                f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms"
+            )
+        finally:
+            server.terminate()
+            server.wait()
+            log.close()
+
+    def wait_until_up(self, base_url, server, log):
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(log.read().decode())
+            try:
+                httpx.get(f"{base_url}/login/", timeout=1)
+                return
+            except httpx.TransportError:
+                time.sleep(0.1)
+        raise RuntimeError(f"{base_url} did not start")
+
+    async def load(self, base_url, options):
+        queue = asyncio.Queue()
+        for _ in range(options["requests"]):
+            queue.put_nowait(None)
+        latencies, statuses = [], []
+
+        async def client():
+            async with httpx.AsyncClient(base_url=base_url, timeout=60) as http:
+                # The login form is CSRF protected, the cookie and token come from a GET
+                await http.get("/login/")
+                csrf = http.cookies["csrftoken"]
+                while not queue.empty():
+                    queue.get_nowait()
+                    begin = time.perf_counter()
+                    response = await http.post(
+                        "/login/",
+                        data={"country_code": "+62", "phone_number": "1", "password": "x"},
+                        headers={"X-CSRFToken": csrf},
+                    )
+                    latencies.append(time.perf_counter() - begin)
+                    statuses.append(response.status_code)
+
+        begin = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options["clients"])))
+        return time.perf_counter() - begin, latencies, statuses
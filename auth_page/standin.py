@@ -0,0 +1,95 @@
+"""
+A stand-in for the auth service on a local port, for the tests and for
+bench_wsgi_asgi, so neither needs the real service running.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInAuthHandler(BaseHTTPRequestHandler):
+    """
+    Just enough of the auth service for the client: /login/, /register/ and
+    /staff/ behave normally, /slow/, /flaky/ and /down/ misbehave.
+    """
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # One send per response, else Nagle + delayed ACK add ~40 ms to every
+    # reused connection
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, data=None):
+        body = json.dumps(data or {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+            hits = self.server.hits[self.path]
+
+        if self.path == "/login/":
+            time.sleep(self.server.login_delay)
+            self.reply(200, {"Authorization": "Bearer stand-in", "role": "user"})
+        elif self.path == "/register/":
+            self.reply(200)
+        elif self.path == "/staff/":
+            auth_header = self.headers.get("Authorization") or ""
+            self.reply(403 if not auth_header or "not-staff" in auth_header else 200)
+        elif self.path == "/slow/":
+            time.sleep(self.server.delay)
+            self.reply(200)
+        elif self.path == "/flaky/":
+            self.reply(503 if hits <= self.server.flaky_failures else 200)
+        else:
+            self.reply(500)
+
+    do_GET = handle_request
+    do_POST = handle_request
+
+
+class StandInAuthServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, login_delay=0, delay=0.5):
+        super().__init__(("127.0.0.1", 0), StandInAuthHandler)
+        self.lock = threading.Lock()
+        self.login_delay = login_delay
+        self.delay = delay
+        self.flaky_failures = 0
+        self.reset()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.hits = {}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        pass  # e.g. the client timed out on /slow/ and hung up
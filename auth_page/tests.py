@@ -1,3 +1,266 @@
-from django.test import TestCase
+import asyncio
+import socket
+import time
 
-# Create your tests here.
+import requests
+from asgiref.sync import sync_to_async
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from tibib import upstream
+from tibib.middleware import TokenCache
+from tibib.testing import ASYNC_URLCONF
+from tibib.upstream import AsyncUpstreamClient, CircuitOpenError, UpstreamClient
+
+from .standin import StandInAuthServer
+from .views import login_view
+
+
+class StandInAuthMixin:
+    """Runs a StandInAuthServer for the tests of the class."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StandInAuthServer().start()
+        cls.addClassCleanup(cls.server.stop)
+
+    def setUp(self):
+        self.server.flaky_failures = 0
+        self.server.reset()
+
+    def upstream_client(self, **kwargs):
+        return UpstreamClient("auth", self.server.base_url, **{"backoff": 0, **kwargs})
+
+    def async_upstream_client(self, **kwargs):
+        return AsyncUpstreamClient("auth", self.server.base_url, **{"backoff": 0, **kwargs})
+
+
+class StandInAuthTestCase(StandInAuthMixin, SimpleTestCase):
+    pass
+
+
+class UpstreamClientTests(StandInAuthTestCase):
+    def test_keep_alive(self):
+        client = self.upstream_client()
+        for _ in range(20):
+            self.assertEqual(client.post("/login/", json={}).status_code, 200)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_read_timeout(self):
+        # A slow upstream costs at most (1 + retries) x timeout
+        started = time.perf_counter()
+        with self.assertRaises(requests.ConnectionError):
+            self.upstream_client(read_timeout=0.1, retries=1).get("/slow/")
+        self.assertLess(time.perf_counter() - started, self.server.delay * 2)
+        self.assertEqual(self.server.hits["/slow/"], 2)
+
+    async def test_async_read_timeout(self):
+        client = self.async_upstream_client(read_timeout=0.1, retries=1)
+        started = time.perf_counter()
+        with self.assertRaises(requests.ReadTimeout):
+            await client.get("/slow/")
+        self.assertLess(time.perf_counter() - started, self.server.delay * 2)
+        self.assertEqual(self.server.hits["/slow/"], 2)
+
+        # Not retried, a POST may already have been acted on
+        self.server.reset()
+        with self.assertRaises(requests.ReadTimeout):
+            await client.post("/slow/")
+        self.assertEqual(self.server.hits["/slow/"], 1)
+        await client.client.aclose()
+
+    def test_only_idempotent_calls_retried(self):
+        self.server.flaky_failures = 2
+        self.assertEqual(self.upstream_client(retries=2).get("/flaky/").status_code, 200)
+        self.assertEqual(self.server.hits["/flaky/"], 3)
+
+        self.server.reset()
+        self.assertEqual(self.upstream_client(retries=2).post("/flaky/").status_code, 503)
+        self.assertEqual(self.server.hits["/flaky/"], 1)
+
+    async def test_async_only_idempotent_calls_retried(self):
+        self.server.flaky_failures = 2
+        client = self.async_upstream_client(retries=2)
+        self.assertEqual((await client.get("/flaky/")).status_code, 200)
+        self.assertEqual(self.server.hits["/flaky/"], 3)
+
+        self.server.reset()
+        self.assertEqual((await client.post("/flaky/")).status_code, 503)
+        self.assertEqual(self.server.hits["/flaky/"], 1)
+        await client.client.aclose()
+
+    def test_refused_connection(self):
+        # Retried for any method, nothing was sent, then counted as a failure
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        client = UpstreamClient("auth", f"http://127.0.0.1:{port}", retries=1, backoff=0, failure_threshold=1)
+        with self.assertRaises(requests.ConnectionError):
+            client.post("/login/")
+        self.assertEqual(client.breaker.state, "open")
+
+    def test_circuit_breaker(self):
+        client = self.upstream_client(retries=0, failure_threshold=3, reset_timeout=0.2)
+        for _ in range(3):
+            self.assertEqual(client.get("/down/").status_code, 500)
+        self.assertEqual(client.breaker.state, "open")
+
+        # Open: fails fast without reaching the upstream
+        for _ in range(10):
+            with self.assertRaises(CircuitOpenError):
+                client.get("/staff/", headers={"Authorization": "x"})
+        self.assertEqual(self.server.hits, {"/down/": 3})
+        self.assertEqual(client.metrics()["rejected"], 10)
+
+        # Half-open: one trial call, a failure opens the circuit again
+        time.sleep(0.25)
+        self.assertEqual(client.breaker.state, "half-open")
+        self.assertEqual(client.get("/down/").status_code, 500)
+        self.assertEqual(client.breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            client.get("/staff/", headers={"Authorization": "x"})
+
+        # A trial that fails before reaching the upstream hands the trial on
+        time.sleep(0.25)
+        with self.assertRaises(ValueError):
+            client.get("/staff/", headers={"Authorization": "x"}, timeout="soon")
+        self.assertEqual(client.breaker.state, "half-open")
+
+        # A good trial call closes it
+        self.assertEqual(client.get("/staff/", headers={"Authorization": "x"}).status_code, 200)
+        self.assertEqual(client.breaker.state, "closed")
+        self.assertEqual(self.server.hits, {"/down/": 4, "/staff/": 1})
+
+    async def test_async_cancelled_trial(self):
+        client = self.async_upstream_client(retries=0, failure_threshold=1, reset_timeout=0.2)
+        self.assertEqual((await client.get("/down/")).status_code, 500)
+        await asyncio.sleep(0.25)
+
+        trial = asyncio.ensure_future(client.get("/slow/"))
+        while "/slow/" not in self.server.hits:
+            await asyncio.sleep(0.01)
+        with self.assertRaises(CircuitOpenError, msg="only one trial call while half-open"):
+            await client.get("/staff/", headers={"Authorization": "x"})
+
+        # Cancelled, e.g. the client went away, the next call is the trial
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+        self.assertEqual(client.breaker.state, "half-open")
+        self.assertEqual((await client.get("/staff/", headers={"Authorization": "x"})).status_code, 200)
+        self.assertEqual(client.breaker.state, "closed")
+        await client.client.aclose()
+
+
+class LoginViewTests(StandInAuthTestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(UPSTREAMS={"auth": {"base_url": self.server.base_url}}))
+        upstream.reset_clients()
+        self.addCleanup(upstream.reset_clients)
+
+    def test_login_uses_the_pooled_client(self):
+        factory = RequestFactory(HTTP_HOST="localhost")
+        for _ in range(3):
+            request = factory.post("/login/", {"country_code": "+62", "phone_number": "1", "password": "x"})
+            request.session = {}
+            response = login_view(request)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(request.session["token"], "Bearer stand-in")
+        self.assertEqual(self.server.hits["/login/"], 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(upstream.upstream_metrics()["auth"]["calls"], 3)
+
+
+class AsyncLoginViewTests(StandInAuthMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(
+            ROOT_URLCONF=ASYNC_URLCONF, UPSTREAMS={"auth": {"base_url": self.server.base_url, "retries": 0}},
+        ))
+        upstream.reset_clients()
+        self.addCleanup(upstream.reset_clients)
+
+    async def test_login(self):
+        form = {"country_code": "+62", "phone_number": "1", "password": "x"}
+        response = await self.async_client.post("/login/", form)
+        self.assertRedirects(response, "/home/", fetch_redirect_response=False)
+        session = await self.async_client.asession()
+        self.assertEqual(await session.aget("token"), "Bearer stand-in")
+        self.assertEqual(await session.aget("user_role"), "user")
+        self.assertEqual(self.server.hits["/login/"], 1)
+
+    async def test_auth_service_down(self):
+        # Rendered like login_view does
+        form = {"country_code": "+62", "phone_number": "1", "password": "x"}
+        with override_settings(UPSTREAMS={"auth": {"base_url": "http://127.0.0.1:9", "retries": 0}}):
+            upstream.reset_clients()
+            response = await self.async_client.post("/login/", form)
+            sync_response = await sync_to_async(self.client.post)("/login/", form)
+        self.assertContains(response, "An error occurred")
+        self.assertEqual(response.context["error"], sync_response.context["error"])
+
+
+class RoutePolicyTests(SimpleTestCase):
+    def test_health_probe_is_public(self):
+        response = self.client.get("/healthz/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+    def test_fund_reads_require_a_token(self):
+        for path in [
+            "/reksadana/get-all-reksadana/",
+            "/reksadana/search-reksadana/",
+            "/reksadana/get-reksadana-history/5f1c6c9e-8a4f-4f59-9c53-1f3f4c2d7a10/",
+            "/reksadana/get-multi-reksadana-history/?ids=5f1c6c9e-8a4f-4f59-9c53-1f3f4c2d7a10",
+            "/reksadana/get-reksadana-candles/5f1c6c9e-8a4f-4f59-9c53-1f3f4c2d7a10/",
+        ]:
+            self.assertEqual(self.client.get(path).status_code, 401, path)
+
+
+class TokenCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1_700_000_000.0
+
+    def cache(self, maxsize=2, ttl=60):
+        return TokenCache(maxsize, ttl, clock=lambda: self.now)
+
+    def test_entries_live_for_the_ttl(self):
+        cache = self.cache(ttl=60)
+        cache.set("token", {"id": "a"})
+        self.now += 59
+        self.assertEqual(cache.get("token"), {"id": "a"})
+        self.now += 1
+        self.assertIsNone(cache.get("token"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 0})
+
+    def test_entries_end_with_the_token(self):
+        cache = self.cache(ttl=60)
+        cache.set("token", {"id": "a", "exp": self.now + 10})
+        self.now += 9
+        self.assertEqual(cache.get("token"), {"id": "a", "exp": self.now + 1})
+        self.now += 1
+        self.assertIsNone(cache.get("token"))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = self.cache(maxsize=2)
+        cache.set("a", {"id": "a"})
+        cache.set("b", {"id": "b"})
+        self.assertEqual(cache.get("a"), {"id": "a"})
+        cache.set("c", {"id": "c"})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"id": "a"})
+        self.assertEqual(cache.get("c"), {"id": "c"})
+        self.assertEqual(cache.stats(), {"hits": 3, "misses": 1, "size": 2})
+
+    def test_size_zero_caches_nothing(self):
+        cache = self.cache(maxsize=0)
+        cache.set("token", {"id": "a"})
+        self.assertIsNone(cache.get("token"))
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 1, "size": 0})
+
+    def test_invalid_tokens_are_logged(self):
+        with self.assertLogs("tibib.middleware", "WARNING") as logs:
+            response = self.client.get("/reksadana/get-all-reksadana/", headers={"Authorization": "Bearer not-a-jwt"})
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("Rejected JWT", logs.output[0])
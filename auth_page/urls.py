@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('register/', views.register_view, name='register'),
-    path('login/', views.login_view, name='login'),
+    path('register/', views.aregister_view if settings.ASYNC_VIEWS else views.register_view, name='register'),
+    path('login/', views.alogin_view if settings.ASYNC_VIEWS else views.login_view, name='login'),
     path('home/', views.home_view, name='home'),
     path('logout/', views.logout_view, name='logout'),
-    path('', views.login_view, name='index'),  # Default route goes to login
+    path('metrics/upstreams/', views.upstream_metrics_view, name='upstream_metrics'),
+    path('healthz/', views.health_view, name='health'),
+    path('', views.alogin_view if settings.ASYNC_VIEWS else views.login_view, name='index'),  # Default route goes to login
 ]
\ No newline at end of file
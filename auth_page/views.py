@@ -1,82 +1,96 @@
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
-import os
-import requests
+from tibib.upstream import get_async_client, get_client, upstream_metrics
 
-API_BASE_URL = os.environ.get('API_BASE_URL')
+def register_payload(request):
+    # Prepare data for API
+    return {
+        "phone_number": request.POST.get('phone_number'),
+        "country_code": request.POST.get('country_code'),
+        "card_number": request.POST.get('card_number').replace(' ', ''),  # Remove spaces from card number
+        "password": request.POST.get('password')
+    }
+
+def register_result(request, response):
+    if response.status_code == 200:
+        return redirect('login')
+    return render(request, 'register.html', {
+        'error': 'Registration failed. Please try again.'
+    })
+
+def login_payload(request):
+    # Create full phone number
+    full_phone = f"{request.POST.get('country_code')}{request.POST.get('phone_number')}"
+    return {
+        "full_phone": full_phone,
+        "password": request.POST.get('password')
+    }
+
+def login_failed(request):
+    return render(request, 'login.html', {
+        'error': 'Login failed. Please check your credentials.'
+    })
+
+def error_page(request, template, e):
+    return render(request, template, {
+        'error': f'An error occurred: {str(e)}'
+    })
 
 def register_view(request):
     if request.method == 'POST':
         try:
-            # Get data from form
-            phone_number = request.POST.get('phone_number')
-            country_code = request.POST.get('country_code')
-            card_number = request.POST.get('card_number').replace(' ', '')  # Remove spaces from card number
-            password = request.POST.get('password')
-            
-            # Prepare data for API
-            payload = {
-                "phone_number": phone_number,
-                "country_code": country_code,
-                "card_number": card_number,
-                "password": password
-            }
-            
             # Make API request
-            response = requests.post(f"{API_BASE_URL}/register/",
-                                     json=payload,
-                                     headers={'Content-Type': 'application/json'})
-            
-            if response.status_code == 200:
-                return redirect('login')
-            else:
-                return render(request, 'register.html', {
-                    'error': 'Registration failed. Please try again.'
-                })
+            response = get_client('auth').post("/register/", json=register_payload(request))
+            return register_result(request, response)
         except Exception as e:
-            return render(request, 'register.html', {
-                'error': f'An error occurred: {str(e)}'
-            })
-    
+            return error_page(request, 'register.html', e)
+
     return render(request, 'register.html')
 
 def login_view(request):
     if request.method == 'POST':
         try:
-            # Get data from form
-            country_code = request.POST.get('country_code')
-            phone_number = request.POST.get('phone_number')
-            password = request.POST.get('password')
-            
-            # Create full phone number
-            full_phone = f"{country_code}{phone_number}"
-            
-            # Prepare data for API
-            payload = {
-                "full_phone": full_phone,
-                "password": password
-            }
-            
             # Make API request
-            response = requests.post(f"{API_BASE_URL}/login/", 
-                                    json=payload, 
-                                    headers={'Content-Type': 'application/json'})
-            
-            if response.status_code == 200:
-                data = response.json()
-                # Store JWT token in session
-                request.session['token'] = data.get('Authorization')
-                request.session['user_role'] = data.get('role')
-                return redirect('home')
-            else:
-                return render(request, 'login.html', {
-                    'error': 'Login failed. Please check your credentials.'
-                })
+            response = get_client('auth').post("/login/", json=login_payload(request))
+
+            if response.status_code != 200:
+                return login_failed(request)
+            data = response.json()
+            # Store JWT token in session
+            request.session['token'] = data.get('Authorization')
+            request.session['user_role'] = data.get('role')
+            return redirect('home')
         except Exception as e:
-            return render(request, 'login.html', {
-                'error': f'An error occurred: {str(e)}'
-            })
-    
+            return error_page(request, 'login.html', e)
+
+    return render(request, 'login.html')
+
+async def aregister_view(request):
+    """register_view for ASGI, see ASYNC_VIEWS."""
+    if request.method == 'POST':
+        try:
+            response = await get_async_client('auth').post("/register/", json=register_payload(request))
+            return register_result(request, response)
+        except Exception as e:
+            return error_page(request, 'register.html', e)
+
+    return render(request, 'register.html')
+
+async def alogin_view(request):
+    """login_view for ASGI, see ASYNC_VIEWS."""
+    if request.method == 'POST':
+        try:
+            response = await get_async_client('auth').post("/login/", json=login_payload(request))
+
+            if response.status_code != 200:
+                return login_failed(request)
+            data = response.json()
+            await request.session.aset('token', data.get('Authorization'))
+            await request.session.aset('user_role', data.get('role'))
+            return redirect('home')
+        except Exception as e:
+            return error_page(request, 'login.html', e)
+
     return render(request, 'login.html')
 
 def home_view(request):
@@ -98,4 +112,12 @@ def logout_view(request):
         del request.session['user_role']
     
     # Redirect to login page
-    return redirect('login')
\ No newline at end of file
+    return redirect('login')
+
+def upstream_metrics_view(request):
+    # Latency, error and circuit state of the upstream clients in this process
+    return JsonResponse(upstream_metrics())
+
+def health_view(request):
+    # Liveness probe, public in JWT_ROUTE_POLICY
+    return JsonResponse({"status": "ok"})
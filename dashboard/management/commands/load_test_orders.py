@@ -0,0 +1,115 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import jwt
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from reksadana_rest.models import Bank, CategoryReksadana, Payment, Reksadana, UnitDibeli
+from tibib import upstream
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class WorkerPool:
+    """
+    Wraps the WSGI app so at most `workers` requests run at once, like a
+    gunicorn sync worker pool, and records how long workers are occupied.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.slots = threading.BoundedSemaphore(workers)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.busy_seconds = 0.0
+
+    def __call__(self, environ, start_response):
+        with self.slots:
+            start = time.perf_counter()
+            try:
+                return list(self.app(environ, start_response))
+            finally:
+                with self.lock:
+                    self.requests += 1
+                    self.busy_seconds += time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test beli-unit purchases with the local vs http order transport and report worker occupancy. "
+        "With --clients >= --workers the http transport deadlocks: every worker waits on its own loopback call."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--clients", type=int, default=4)
+        parser.add_argument("--purchases", type=int, default=200)
+        parser.add_argument("--timeout", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        bank = Bank.objects.create(name="Load Test Bank")
+        category = CategoryReksadana.objects.create(name="Load Test Category")
+        fund = Reksadana.objects.create(
+            name=f"Load Test {uuid.uuid4()}", category=category, kustodian=bank, penampung=bank, nav=100, aum=1000
+        )
+        user_id = uuid.uuid4()
+        token = jwt.encode({"id": str(user_id), "full_phone": "+620000", "role": "user"}, settings.JWT_SECRET_KEY, algorithm="HS256")
+
+        try:
+            for transport in ["local", "http"]:
+                self.run(transport, fund, token, options)
+        finally:
+            UnitDibeli.objects.filter(user_id=user_id).delete()
+            Payment.objects.filter(user_id=user_id).delete()
+            fund.delete()
+            bank.delete()
+            category.delete()
+
+    def run(self, transport, fund, token, options):
+        pool = WorkerPool(get_wsgi_application(), options["workers"])
+        server = make_server("127.0.0.1", 0, pool, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def purchase(_):
+            try:
+                requests.post(
+                    f"{base_url}/dashboard/beli-unit/",
+                    json={"id_reksadana": str(fund.pk), "nominal": 10000},
+                    headers={"Authorization": f"Bearer {token}"},
+                    allow_redirects=False,
+                    timeout=options["timeout"],
+                )
+                return True
+            except requests.Timeout:
+                return False
+
+        with override_settings(ORDER_TRANSPORT=transport, UPSTREAMS={**settings.UPSTREAMS, "orders": {"base_url": base_url}}):
+            upstream.reset_clients()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options["clients"]) as executor:
+                completed = sum(executor.map(purchase, range(options["purchases"])))
+            elapsed = time.perf_counter() - start
+        upstream.reset_clients()
+        server.shutdown()
+
+        self.stdout.write(
+            f"{transport:>5}: {completed}/{options['purchases']} purchases in {elapsed:.2f}s "
+            f"({completed / elapsed:.1f}/s), {pool.requests} requests served, "
+            f"{pool.busy_seconds / max(completed, 1) * 1000:.1f} worker-ms per purchase"
+        )
@@ -1,3 +1,81 @@
-from django.test import TestCase
+import json
+import uuid
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, override_settings
+
+from reksadana_rest.models import Bank, CategoryReksadana, Payment, Reksadana, UnitDibeli
+from tibib.crypto import encode_value
+from tibib.testing import ASYNC_URLCONF, bearer
+
+
+class PurchaseViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryReksadana.objects.create(name="Kategori")
+        bank = Bank.objects.create(name="Bank")
+        cls.fund = Reksadana.objects.create(
+            name="Reksadana", category=category, kustodian=bank, penampung=bank, nav=100, aum=1000,
+            tingkat_resiko="Moderat",
+        )
+        cls.user_id = uuid.uuid4()
+
+    def setUp(self):
+        self.headers = {"Authorization": bearer(self.user_id)}
+        self.client = self.client_class(headers=self.headers)
+        # AsyncClient(headers=...) doesn't reach ASGI requests, headers go per request
+        self.async_client = AsyncClient()
+
+    def orders(self):
+        """(body, expected status) of process-payment requests."""
+        return [
+            ({"id_reksadana": str(self.fund.pk), "nominal": encode_value(10000)}, 201),
+            ({"id_reksadana": str(self.fund.pk), "nominal": "not encrypted"}, 400),
+            ({"id_reksadana": str(self.fund.pk), "nominal": encode_value("ten")}, 400),
+            ({"id_reksadana": str(self.fund.pk), "nominal": encode_value(0)}, 400),
+            ({"id_reksadana": str(self.fund.pk), "nominal": encode_value(-10000)}, 400),
+            ({"id_reksadana": str(uuid.uuid4()), "nominal": encode_value(10000)}, 404),
+            ({"nominal": encode_value(10000)}, 400),
+        ]
+
+    async def apurchase(self, body):
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            return await self.async_client.post(
+                "/dashboard/process-payment/", json.dumps(body), content_type="application/json", headers=self.headers,
+            )
+
+    async def test_async_purchase(self):
+        response = await self.apurchase(self.orders()[0][0])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        payment = await Payment.objects.aget(pk=data["payment_id"])
+        unit = await UnitDibeli.objects.aget(pk=data["unit_id"])
+        self.assertEqual((payment.user_id, payment.nominal), (self.user_id, 10000))
+        self.assertEqual((unit.user_id, unit.nominal), (self.user_id, 10000))
+
+    def test_sync_and_async_agree(self):
+        for body, status in self.orders():
+            sync = self.client.post("/dashboard/process-payment/", body, content_type="application/json")
+            asynchronous = async_to_sync(self.apurchase)(body)
+            self.assertEqual((sync.status_code, asynchronous.status_code), (status, status), body)
+            if status != 201:
+                self.assertEqual(sync.json(), asynchronous.json())
+        self.assertEqual(Payment.objects.filter(user_id=self.user_id).count(), 2)
+
+    async def test_async_purchase_requires_a_token(self):
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = await AsyncClient().post(
+                "/dashboard/process-payment/", json.dumps(self.orders()[0][0]), content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(await Payment.objects.aexists())
+
+    async def test_async_buy_page(self):
+        # Renders the form for the fund picked on the dashboard, like beli_unit
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            response = await self.async_client.get(
+                f"/dashboard/beli-unit/?id_reksadana={self.fund.pk}", headers=self.headers,
+            )
+        self.assertContains(response, f'name="id_reksadana" value="{self.fund.pk}"')
+        response = self.client.get(f"/dashboard/beli-unit/?id_reksadana={self.fund.pk}")
+        self.assertContains(response, f'name="id_reksadana" value="{self.fund.pk}"')
@@ -1,9 +1,10 @@
+from django.conf import settings
 from django.urls import path
 
 from .views import *
 
 urlpatterns = [
     path("", index, name="index"),
-    path("beli-unit/", beli_unit, name="beli_unit"),
-    path('process-payment/', process_payment, name="process_payment")
-]
\ No newline at end of file
+    path("beli-unit/", abeli_unit if settings.ASYNC_VIEWS else beli_unit, name="beli_unit"),
+    path('process-payment/', aprocess_payment if settings.ASYNC_VIEWS else process_payment, name="process_payment")
+]
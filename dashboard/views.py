@@ -1,42 +1,42 @@
 import json
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
-import requests
-from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.csrf import csrf_exempt
-from reksadana_rest.views import get_all_reksadana, create_unit_dibeli, create_payment
-import os
-import base64
-
-AES_KEY = base64.b64decode(os.getenv("AES_KEY"))
-AES_IV = base64.b64decode(os.getenv("AES_IV"))
-
-def encode_value(value):
-    """
-    Encrypts a single value using AES.
-    """
-    padder = padding.PKCS7(128).padder()
-    cipher = Cipher(algorithms.AES(AES_KEY), modes.CBC(AES_IV), backend=default_backend())
-    encryptor = cipher.encryptor()
-
-    # Convert value to string and pad it
-    value_str = str(value)
-    padded_data = padder.update(value_str.encode('utf-8')) + padder.finalize()
-    encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
-
-    return encrypted_data.hex()  # Convert bytes to hex string
+from reksadana_rest.services import apurchase_units, get_order_transport, purchase_units
+from reksadana_rest.search import catalogue_page, find_reksadana
+from reksadana_rest.views import order_data
+from tibib.crypto import decode_value
 
+# Query parameters passed through to find_reksadana
+DASHBOARD_FILTERS = ("category", "tingkat_resiko", "kustodian", "name")
 
 # Create your views here.
 def index(request):
     if not hasattr(request, "user_id"):
         return JsonResponse({"error": "Unauthorized"}, status=401)
-    reksadanas = json.loads(get_all_reksadana(request).content)['reksadana']
+    filters = {field: request.GET.get(field) for field in DASHBOARD_FILTERS}
+    sort = request.GET.get("sort", "name")
+    cursor = request.GET.get("cursor")
+    try:
+        if not any(filters.values()) and sort.lstrip("-") == "name":
+            # The plain listing, paged from the cached catalogue
+            reksadanas, next_cursor = catalogue_page(sort=sort, cursor=cursor)
+        else:
+            reksadanas, next_cursor = find_reksadana(sort=sort, cursor=cursor, **filters)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
     #TODO: Bikin html dashboard
-    return render(request, "dashboard.html", context={"reksadanas": reksadanas})
+    # The next page keeps the filters and sort of this one
+    next_query = request.GET.copy()
+    next_query["cursor"] = next_cursor
+    return render(request, "dashboard.html", context={
+        "reksadanas": reksadanas,
+        "next_cursor": next_cursor,
+        "next_query": next_query.urlencode() if next_cursor else None,
+    })
+
+def buy_page(request):
+    return render(request, "buy_page.html", context={"reksadana_id": request.GET.get("id_reksadana")})
 
 @csrf_exempt
 def beli_unit(request):
@@ -44,46 +44,64 @@ def beli_unit(request):
         return JsonResponse({"error": "Unauthorized"}, status=401)
     if request.method=='POST':
         #Simulate third party payment
-        data = json.loads(request.body)
+        data = order_data(request)
         reksadana_id = data.get("id_reksadana")
         nominal = data.get("nominal")
-        
-        base_url = settings.BASE_BACKEND_URL  # Example: "http://127.0.0.1:8000"
-        jwt = request.headers.get('Authorization')
-        headers = {
-            "Authorization": jwt,  # Add JWT Token here
-            "Content-Type": "application/json"
-        }
 
-        data = {
-            "id_reksadana": reksadana_id,
-            "nominal": encode_value(nominal),
-        }
+        get_order_transport().purchase(request, reksadana_id, nominal)
 
-        requests.post(
-            f"{base_url}/dashboard/process-payment/",  # Full URL
-            json=data,
-            headers=headers, 
-        )
-        
         return redirect('/dashboard/')
 
     #TODO: Bikin html buy page
-    return render(request, "buy_page.html", context={'reksadana_id':reksadana_id})
+    return buy_page(request)
+
+@csrf_exempt
+async def abeli_unit(request):
+    """beli_unit for ASGI, see ASYNC_VIEWS."""
+    if not hasattr(request, "user_id"):
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+    if request.method=='POST':
+        data = order_data(request)
+        await get_order_transport().apurchase(request, data.get("id_reksadana"), data.get("nominal"))
+        return redirect('/dashboard/')
+    return buy_page(request)
+
+def parse_payment(request):
+    """
+    (error response, None) or (None, (user_id, id_reksadana, nominal)) for
+    a process-payment request.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Invalid request method"}, status=405), None
+    if not hasattr(request, "user_id"):
+        return JsonResponse({"error": "Unauthorized"}, status=401), None
+    try:
+        data = json.loads(request.body)
+        nominal = decode_value(data.get("nominal"))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400), None
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Invalid nominal"}, status=400), None
+    return None, (request.user_id, data.get("id_reksadana"), nominal)
 
 # async function call
 @csrf_exempt
 def process_payment(request):
-    if request.method == 'POST':
-        res = create_payment(request)
-        if res.status_code != 201:
-            res_data = json.loads(res.content.decode('utf-8'))
-            return JsonResponse(res_data, status=400)
-        
+    """
+    Simulated third party: decrypts the order once and records the payment
+    and its units in one transaction.
+    """
+    error, order = parse_payment(request)
+    if error:
+        return error
+    res_data, status = purchase_units(*order)
+    return JsonResponse(res_data, status=status)
 
-        res = create_unit_dibeli(request)
-        if res.status_code != 201:
-            res_data = json.loads(res.content.decode('utf-8'))
-            return JsonResponse(res_data, status=400)
-        
-        return JsonResponse({"message": "Successfully processed payment"}, status=201)
\ No newline at end of file
+@csrf_exempt
+async def aprocess_payment(request):
+    """process_payment for ASGI, see ASYNC_VIEWS."""
+    error, order = parse_payment(request)
+    if error:
+        return error
+    res_data, status = await apurchase_units(*order)
+    return JsonResponse(res_data, status=status)
@@ -1,3 +1,59 @@
-from django.test import TestCase
+import json
+import uuid
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+
+from reksadana_rest.models import Bank, CategoryReksadana, Reksadana, UnitDibeli
+from tibib.testing import ASYNC_URLCONF, bearer
+
+
+class SellViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryReksadana.objects.create(name="Kategori")
+        bank = Bank.objects.create(name="Bank")
+        fund = Reksadana.objects.create(
+            name="Reksadana", category=category, kustodian=bank, penampung=bank, nav=100, aum=1000,
+            tingkat_resiko="Moderat",
+        )
+        cls.user_id = uuid.uuid4()
+        cls.units = [
+            UnitDibeli.objects.create(
+                user_id=user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=timezone.now(), nav_pembelian=100,
+            )
+            for user_id in (cls.user_id, cls.user_id, cls.user_id, uuid.uuid4())
+        ]
+
+    def setUp(self):
+        self.headers = {"Authorization": bearer(self.user_id)}
+        self.client = self.client_class(headers=self.headers)
+
+    def sell(self, id_unitdibeli):
+        return self.client.post("/portfolio/process-sell/", {"id_unitdibeli": id_unitdibeli}, content_type="application/json")
+
+    async def asell(self, id_unitdibeli):
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            return await AsyncClient().post(
+                "/portfolio/process-sell/", json.dumps({"id_unitdibeli": id_unitdibeli}),
+                content_type="application/json", headers=self.headers,
+            )
+
+    def test_sync_and_async_agree(self):
+        first, second, kept, someone_elses = self.units
+        self.assertEqual(self.sell(first.pk).status_code, 201)
+        self.assertEqual(async_to_sync(self.asell)(second.pk).status_code, 201)
+        for id_unitdibeli, status in [
+            (first.pk, 404),  # sold above, by either view
+            (second.pk, 404),
+            (someone_elses.pk, 403),
+            (None, 400),
+        ]:
+            sync = self.sell(id_unitdibeli)
+            asynchronous = async_to_sync(self.asell)(id_unitdibeli)
+            self.assertEqual((sync.status_code, asynchronous.status_code), (status, status), id_unitdibeli)
+            self.assertEqual(sync.json(), asynchronous.json())
+        self.assertEqual(
+            set(UnitDibeli.objects.values_list("pk", flat=True)), {kept.pk, someone_elses.pk},
+        )
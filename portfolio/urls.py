@@ -1,10 +1,11 @@
+from django.conf import settings
 from django.urls import path, include
 from .views import *
 
 urlpatterns = [
     path('',index, name="index"),
-    path('jual-unitdibeli/', jual_unitdibeli, name="jual_unitdibeli"),
+    path('jual-unitdibeli/', ajual_unitdibeli if settings.ASYNC_VIEWS else jual_unitdibeli, name="jual_unitdibeli"),
 
     # ini simulasi third party
-    path('process-sell/', process_sell, name="proccess_sell"),
+    path('process-sell/', aprocess_sell if settings.ASYNC_VIEWS else process_sell, name="proccess_sell"),
 ]
@@ -1,47 +1,25 @@
 import json
 
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
-
-import requests
-import httpx
-from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.csrf import csrf_exempt
-from reksadana_rest.views import get_units_by_user,delete_unit_dibeli_by_id
-import os
-import base64
-
-AES_KEY = base64.b64decode(os.getenv("AES_KEY"))
-AES_IV = base64.b64decode(os.getenv("AES_IV"))
-
-def encode_value(value):
-    """
-    Encrypts a single value using AES.
-    """
-    padder = padding.PKCS7(128).padder()
-    cipher = Cipher(algorithms.AES(AES_KEY), modes.CBC(AES_IV), backend=default_backend())
-    encryptor = cipher.encryptor()
-
-    # Convert value to string and pad it
-    value_str = str(value)
-    padded_data = padder.update(value_str.encode('utf-8')) + padder.finalize()
-    encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
-
-    return encrypted_data.hex()  # Convert bytes to hex string
+from reksadana_rest.services import asell_unit, get_order_transport, sell_unit
+from reksadana_rest.valuation import user_holdings, value_holdings
+from reksadana_rest.views import order_data
+from tibib.routers import read_from_replica
 
 # TODO: Not tested with postman
+@read_from_replica
 def index(request):
     if request.method == 'GET':
-        data = json.loads(get_units_by_user(request).content)
+        valuation = value_holdings(user_holdings(request.user_id, latest_unit=True))
+        holdings = valuation.pop("holdings")
 
         #TODO: Blm bikin portfolio.html
         # di tiap unit dalam daftarnya ada tombol jual aja, biar
         # gk usah bikin file tampilin detail lagi 
         # Jangan lupa buat simpen id unitdibeli supaya bisa sell
-        return render(request, 'portfolio.html', context={"units": data})
+        return render(request, 'portfolio.html', context={"holdings": holdings, "valuation": valuation})
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 # TODO: Not tested with postman
@@ -51,34 +29,54 @@ def jual_unitdibeli(request):
         return JsonResponse({"error": "Unauthorized"}, status=401)
     if request.method=='POST':
         #Process jual
-        data = json.loads(request.body)
+        data = order_data(request)
         id_unitdibeli = data.get("id_unitdibeli")
 
-        base_url = settings.BASE_BACKEND_URL  # Example: "http://127.0.0.1:8000"
-        jwt = request.headers.get("Authorization")
-        headers = {
-            "Authorization": jwt,  # Add JWT Token here
-            "Content-Type": "application/json"
-        }
+        get_order_transport().sell(request, id_unitdibeli)
 
-        data = {
-            "id_unitdibeli": id_unitdibeli
-        }
-        
-        # return delete_unit_dibeli_by_id(request)
-        
-        requests.post(
-            f"{base_url}/portfolio/process-sell/",  # Full URL
-            json=data,
-            headers=headers,
-        )
+        return redirect('/portfolio/')
+    return JsonResponse({"error": "Invalid request method"}, status=405)
 
+@csrf_exempt
+async def ajual_unitdibeli(request):
+    """jual_unitdibeli for ASGI, see ASYNC_VIEWS."""
+    if not hasattr(request, "user_id"):
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+    if request.method=='POST':
+        data = order_data(request)
+        await get_order_transport().asell(request, data.get("id_unitdibeli"))
         return redirect('/portfolio/')
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+
+def parse_sell(request):
+    """(error response, None) or (None, (user_id, id_unitdibeli)) for a process-sell request."""
+    if request.method != 'POST':
+        return JsonResponse({"error": "Method not allowed"}, status=405), None
+    if not hasattr(request, "user_id"):
+        return JsonResponse({"error": "Unauthorized"}, status=401), None
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400), None
+    return None, (request.user_id, data.get("id_unitdibeli"))
 
 
 @csrf_exempt
 def process_sell(request):
-    if request.method=='POST':
-        #Process jual
-        delete_unit_dibeli_by_id(request)
-        return JsonResponse({"message": "Successfully sold unit reksadana"}, status=201)
\ No newline at end of file
+    #Process jual
+    error, order = parse_sell(request)
+    if error:
+        return error
+    res_data, status = sell_unit(*order)
+    return JsonResponse(res_data, status=status)
+
+
+@csrf_exempt
+async def aprocess_sell(request):
+    """process_sell for ASGI, see ASYNC_VIEWS."""
+    error, order = parse_sell(request)
+    if error:
+        return error
+    res_data, status = await asell_unit(*order)
+    return JsonResponse(res_data, status=status)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReksadanaRestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reksadana_rest'
+
+    def ready(self):
+        from . import signals  # noqa: F401
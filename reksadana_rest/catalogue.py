@@ -0,0 +1,84 @@
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+
+from .models import CatalogueVersion, Reksadana
+
+# The one CatalogueVersion row, created by its migration or on the first
+# invalidate_catalogue() without it
+CATALOGUE_VERSION_ID = 1
+
+# (version, rows, payload) of the last catalogue built in this process
+_entry = None
+# time.monotonic() of the last version read, None to read it on next use
+_checked_at = None
+_lock = threading.Lock()
+
+
+def catalogue_version():
+    """
+    Current catalogue version. Kept in the database so every worker process
+    sees the same one, always read from the primary. 0 while the row is
+    missing, invalidate_catalogue() recreates it.
+    """
+    versions = CatalogueVersion.objects.using(DEFAULT_DB_ALIAS).filter(pk=CATALOGUE_VERSION_ID)
+    return versions.values_list("version", flat=True).first() or 0
+
+
+def invalidate_catalogue():
+    global _checked_at
+    # A single UPDATE, concurrent bumps can't overwrite each other
+    versions = CatalogueVersion.objects.filter(pk=CATALOGUE_VERSION_ID)
+    if not versions.update(version=F("version") + 1):
+        # The row is gone (a flush, tables made with --run-syncdb). Start it
+        # past any version a process may have cached before, then bump
+        CatalogueVersion.objects.get_or_create(pk=CATALOGUE_VERSION_ID, defaults={"version": time.time_ns()})
+        versions.update(version=F("version") + 1)
+    # This process sees its own edit straight away, others within
+    # CATALOGUE_RECHECK_SECONDS
+    _checked_at = None
+
+
+def invalidate_catalogue_on_commit():
+    # Bumping before commit would let another worker rebuild from the old rows
+    # and keep them under the new version
+    transaction.on_commit(invalidate_catalogue)
+
+
+def catalogue_entry():
+    global _entry, _checked_at
+    entry, checked_at = _entry, _checked_at
+    now = time.monotonic()
+    if entry is not None and checked_at is not None and now - checked_at < settings.CATALOGUE_RECHECK_SECONDS:
+        return entry
+
+    version = catalogue_version()
+    with _lock:
+        entry = _entry
+        if entry is None or entry[0] != version:
+            # Always from the primary, a lagging replica would cache stale
+            # rows under the new version until the next edit
+            rows = list(Reksadana.objects.using(DEFAULT_DB_ALIAS).values())
+            payload = json.dumps({"reksadana": rows}, cls=DjangoJSONEncoder).encode()
+            entry = _entry = (version, rows, payload)
+        _checked_at = now
+    return entry
+
+
+def get_catalogue():
+    """
+    Every fund as a dict of its fields. Shared between requests, don't mutate.
+    """
+    return catalogue_entry()[1]
+
+
+def get_catalogue_payload():
+    """
+    The get_all_reksadana response body, ``{"reksadana": [...]}`` as bytes.
+    """
+    return catalogue_entry()[2]
@@ -0,0 +1,134 @@
+import json
+import struct
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+HISTORY_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/vnd.tibib.history.columnar+json",
+    "binary": "application/vnd.tibib.history.binary",
+}
+
+# magic, row count, first timestamp (epoch seconds)
+BINARY_HEADER = struct.Struct("<4sIq")
+BINARY_MAGIC = b"RKH1"
+
+STREAM_CHUNK_ROWS = 500
+
+
+def negotiate_format(request):
+    """
+    Picks the history encoding from `format=` or else the Accept header.
+    Returns None for an unknown `format=`.
+    """
+    if "format" in request.GET:
+        return request.GET["format"] if request.GET["format"] in HISTORY_FORMATS else None
+    accept = request.headers.get("Accept", "")
+    for name, media_type in HISTORY_FORMATS.items():
+        if name != "json" and media_type in accept:
+            return name
+    return "json"
+
+
+def stream_json_array(rows, prefix=b"", suffix=b""):
+    """
+    Yields `rows` as a JSON array a chunk of rows at a time, so it can be
+    sent with StreamingHttpResponse straight from ``QuerySet.iterator()``.
+    """
+    rows = iter(rows)
+    yield prefix + b"["
+    separator = b""
+    while chunk := list(islice(rows, STREAM_CHUNK_ROWS)):
+        yield separator + encode_json_items(chunk)
+        separator = b","
+    yield b"]" + suffix
+
+
+async def astream_json_array(rows, prefix=b"", suffix=b""):
+    """
+    stream_json_array over an async iterator, e.g. ``QuerySet.aiterator()``,
+    for StreamingHttpResponse under ASGI.
+    """
+    yield prefix + b"["
+    separator = b""
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == STREAM_CHUNK_ROWS:
+            yield separator + encode_json_items(chunk)
+            separator = b","
+            chunk = []
+    if chunk:
+        yield separator + encode_json_items(chunk)
+    yield b"]" + suffix
+
+
+def encode_json_items(rows):
+    return b",".join(json.dumps(row, cls=DjangoJSONEncoder).encode() for row in rows)
+
+
+def encode_json(rows):
+    return json.dumps(rows, cls=DjangoJSONEncoder).encode()
+
+
+def encode_columnar(rows):
+    """
+    {"date": [epoch seconds...], "nav": [...], "aum": [...]} instead of one
+    dict per row.
+    """
+    return json.dumps({
+        "date": [int(row["date"].timestamp()) for row in rows],
+        "nav": [row["nav"] for row in rows],
+        "aum": [row["aum"] for row in rows],
+    }).encode()
+
+
+def encode_binary(rows):
+    """
+    Little-endian layout, one column after the other:
+
+        header   4s magic "RKH1", uint32 count, int64 first epoch second
+        date     count x int32 seconds since the previous row (first is 0)
+        nav      count x float64
+        aum      count x float64
+
+    Timestamps are truncated to whole seconds.
+    """
+    timestamps = [int(row["date"].timestamp()) for row in rows]
+    first = timestamps[0] if timestamps else 0
+    deltas = [later - earlier for earlier, later in zip([first] + timestamps, timestamps)]
+    count = len(rows)
+    return b"".join([
+        BINARY_HEADER.pack(BINARY_MAGIC, count, first),
+        struct.pack(f"<{count}i", *deltas),
+        struct.pack(f"<{count}d", *(row["nav"] for row in rows)),
+        struct.pack(f"<{count}d", *(row["aum"] for row in rows)),
+    ])
+
+
+def decode_binary(data):
+    """
+    Inverse of encode_binary, returns (epoch seconds, navs, aums) lists.
+    """
+    magic, count, first = BINARY_HEADER.unpack_from(data)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Not a binary history payload")
+    offset = BINARY_HEADER.size
+    deltas = struct.unpack_from(f"<{count}i", data, offset)
+    navs = struct.unpack_from(f"<{count}d", data, offset + 4 * count)
+    aums = struct.unpack_from(f"<{count}d", data, offset + 12 * count)
+
+    timestamps = []
+    timestamp = first
+    for delta in deltas:
+        timestamp += delta
+        timestamps.append(timestamp)
+    return timestamps, list(navs), list(aums)
+
+
+HISTORY_ENCODERS = {
+    "json": encode_json,
+    "columnar": encode_columnar,
+    "binary": encode_binary,
+}
@@ -0,0 +1,292 @@
+import datetime
+import math
+import time
+from itertools import accumulate
+from random import randint, uniform
+
+from django.db import transaction
+from django.db.models import Avg, F, Max, Min, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce, TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+
+from .catalogue import invalidate_catalogue_on_commit
+from .locks import acquire_lease, release_lease
+from .models import HistoryReksadana, Lease, Reksadana
+from .procedural import query_procedural_history
+from .rollups import update_candles
+
+HISTORY_BULK_BATCH_SIZE = 1000
+HISTORY_LEASE_TTL = 60  # seconds
+HISTORY_WAIT_TIMEOUT = 10  # seconds
+HISTORY_WAIT_POLL = 0.05  # seconds
+
+# resolution -> (bucket function, bucket width), finest first
+HISTORY_RESOLUTIONS = {
+    "hourly": (None, datetime.timedelta(hours=1)),
+    "daily": (TruncDay, datetime.timedelta(days=1)),
+    "weekly": (TruncWeek, datetime.timedelta(weeks=1)),
+}
+
+
+def generate_series(last_nav, last_aum, hours):
+    """
+    Computes the next ``hours`` hourly (nav, aum) points of the made-up
+    random walk in one pass instead of one step per loop iteration.
+    """
+    steps = range(1, hours + 1)
+
+    # Base price movement plus oscillations for the zigzag effect
+    nav_changes = [uniform(-5, 5) + math.sin(i * uniform(0.5, 2.0)) * uniform(2, 5) for i in steps]
+    aum_changes = [uniform(-50, 50) + math.sin(i * uniform(0.5, 2.0)) * uniform(10, 30) for i in steps]
+
+    # Ensure values stay within reasonable bounds, NAV/AUM shouldn't go negative
+    navs = accumulate(nav_changes, lambda nav, change: max(1, round(nav + change, 2)), initial=last_nav)
+    aums = accumulate(aum_changes, lambda aum, change: max(100, round(aum + change, 2)), initial=last_aum)
+
+    return list(zip(navs, aums))[1:]
+
+
+def backfill_history(reksadanas=None, now=None, batch_size=HISTORY_BULK_BATCH_SIZE):
+    """
+    Generates the missing hourly history of many funds at once.
+
+    The latest entry of every fund comes from its Reksadana.latest_* columns
+    and all new rows are written with chunked ``bulk_create`` inside one
+    transaction, together with the daily/monthly candles they touch and the
+    refreshed latest_* columns. Hours that another writer
+    already stored are skipped, so running it twice is harmless.
+    Returns a dict of ``id_reksadana`` -> number of rows generated.
+    """
+    now = now or timezone.now()
+    funds = Reksadana.objects.filter(history_origin__isnull=True)
+    if isinstance(reksadanas, QuerySet):
+        funds = funds.filter(pk__in=reksadanas.values("pk"))
+    elif reksadanas is not None:
+        funds = funds.filter(pk__in=[fund.pk for fund in reksadanas])
+
+    created = {}
+    stored_ranges = {}
+    pending = []
+    with transaction.atomic():
+        # Rows stored without refresh_latest() (bulk loads, the admin, data
+        # from before the snapshot) leave latest_date empty, take it from them
+        unsnapshotted = list(funds.filter(
+            latest_date__isnull=True,
+            pk__in=HistoryReksadana.objects.values("id_reksadana"),
+        ).values_list("pk", flat=True))
+        if unsnapshotted:
+            refresh_latest(unsnapshotted)
+
+        for fund in funds.iterator():
+            if fund.latest_date is None:
+                # If no history, create the first entry on the current hour
+                pending.append(HistoryReksadana(
+                    id_reksadana=fund,
+                    date=now.replace(minute=0, second=0, microsecond=0),
+                    nav=randint(50, 150),
+                    aum=randint(500, 1500),
+                ))
+                created[fund.pk] = 1
+                stored_ranges[fund.pk] = (pending[-1].date, pending[-1].date)
+            else:
+                last_date = fund.latest_date
+                if timezone.is_naive(last_date):
+                    last_date = timezone.make_aware(last_date, timezone.get_current_timezone())
+
+                hours_passed = int((now - last_date).total_seconds() // 3600)
+                if hours_passed <= 0:
+                    continue  # No new data needed
+
+                series = generate_series(fund.latest_nav, fund.latest_aum, hours_passed)
+                pending.extend(
+                    HistoryReksadana(
+                        id_reksadana=fund,
+                        date=last_date + datetime.timedelta(hours=i),
+                        nav=nav,
+                        aum=aum,
+                    )
+                    for i, (nav, aum) in enumerate(series, start=1)
+                )
+                created[fund.pk] = hours_passed
+                stored_ranges[fund.pk] = (last_date + datetime.timedelta(hours=1), pending[-1].date)
+
+            if len(pending) >= batch_size:
+                HistoryReksadana.objects.bulk_create(pending, batch_size=batch_size, ignore_conflicts=True)
+                pending = []
+
+        if pending:
+            HistoryReksadana.objects.bulk_create(pending, batch_size=batch_size, ignore_conflicts=True)
+
+        update_candles(stored_ranges)
+        refresh_latest(stored_ranges)
+
+    return created
+
+
+def refresh_latest(reksadanas):
+    """
+    Copies the newest stored history entry of the given funds (instances or
+    primary keys) onto Reksadana.latest_nav/latest_aum/latest_date with one
+    UPDATE, and invalidates the catalogue if any of them changed. Read back from the table rather than from what the caller
+    generated, since rows another writer stored first win the conflict.
+    """
+    latest = HistoryReksadana.objects.filter(id_reksadana=OuterRef("pk")).order_by("-date")
+    funds = Reksadana.objects.filter(pk__in=[getattr(fund, "pk", fund) for fund in reksadanas]).annotate(
+        new_date=Subquery(latest.values("date")[:1]),
+        new_nav=Coalesce(Subquery(latest.values("nav")[:1]), F("nav")),
+        new_aum=Coalesce(Subquery(latest.values("aum")[:1]), F("aum")),
+    )
+    # Only funds whose snapshot moves, so the catalogue is only rebuilt then
+    unchanged = (
+        (Q(latest_date=F("new_date")) | Q(latest_date__isnull=True, new_date__isnull=True))
+        & Q(latest_nav=F("new_nav"), latest_aum=F("new_aum"))
+    )
+    updated = funds.exclude(unchanged).update(
+        latest_date=F("new_date"), latest_nav=F("new_nav"), latest_aum=F("new_aum"),
+    )
+    if updated:
+        invalidate_catalogue_on_commit()
+
+
+def backfill_fund_history(reksadana, now=None):
+    """
+    Brings one fund's history up to date, coalescing concurrent callers.
+
+    Only the caller holding the fund's lease generates, across threads and
+    worker processes alike. Everyone else waits for that lease to go away and
+    then reads the rows it wrote.
+    """
+    if reksadana.history_origin:
+        return {}  # Computed on read, nothing to store
+
+    now = now or timezone.now()
+    last_date = reksadana.latest_date
+    if last_date and now - last_date < datetime.timedelta(hours=1):
+        return {}  # Already up to date, no lease needed
+
+    name = f"history:{reksadana.pk}"
+    owner = acquire_lease(name, HISTORY_LEASE_TTL)
+    if owner:
+        try:
+            return backfill_history([reksadana], now=now)
+        finally:
+            release_lease(name, owner)
+
+    deadline = time.monotonic() + HISTORY_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        if not Lease.objects.filter(name=name, expires_at__gt=timezone.now()).exists():
+            break
+        time.sleep(HISTORY_WAIT_POLL)
+    return {}
+
+
+def pick_resolution(reksadana, start, end, max_points):
+    """
+    Returns the finest resolution that covers ``start``..``end`` in at most
+    ``max_points`` buckets, None when even weekly buckets don't fit. Open
+    bounds fall back to the stored history range.
+    """
+    if reksadana.history_origin:
+        start = start or reksadana.history_origin
+        end = end or timezone.now()
+    if start is None or end is None:
+        bounds = HistoryReksadana.objects.filter(id_reksadana=reksadana).aggregate(
+            first=Min("date"), last=Max("date")
+        )
+        start = start or bounds["first"]
+        end = end or bounds["last"]
+    if start is None or end is None:
+        return "hourly"
+    return resolution_for_span(start, end, max_points)
+
+
+def resolution_for_span(start, end, max_points):
+    for resolution, (_, width) in HISTORY_RESOLUTIONS.items():
+        if (end - start) / width < max_points:
+            return resolution
+    return None
+
+
+def query_history(reksadana, start=None, end=None, resolution="hourly", after=None, limit=None):
+    """
+    Reads one page of a fund's history ordered by date.
+
+    ``after`` is the date of the last entry of the previous page. Coarser
+    resolutions are averaged per bucket in the database, so a long range costs
+    as many rows as it has buckets. Stored hourly rows are returned as a lazy
+    queryset so they can be streamed, everything else as a list.
+    """
+    trunc, width = HISTORY_RESOLUTIONS[resolution]
+    if reksadana.history_origin:
+        return query_procedural_history(reksadana, start, end, resolution, after, limit, width)
+
+    rows = HistoryReksadana.objects.filter(id_reksadana=reksadana)
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+
+    if trunc is None:
+        if after:
+            rows = rows.filter(date__gt=after)
+        return rows.order_by("date").values()[:limit]
+
+    if after:
+        rows = rows.filter(date__gte=after + width)
+    buckets = (
+        rows.annotate(bucket=trunc("date"))
+        .values("bucket")
+        .annotate(avg_nav=Avg("nav"), avg_aum=Avg("aum"))
+        .order_by("bucket")[:limit]
+    )
+    return [
+        {
+            "id_reksadana_id": reksadana.pk,
+            "date": bucket["bucket"],
+            "nav": round(bucket["avg_nav"], 2),
+            "aum": round(bucket["avg_aum"], 2),
+        }
+        for bucket in buckets
+    ]
+
+
+def query_aligned_history(reksadanas, start, end, resolution="hourly"):
+    """
+    Reads several funds' history on one shared timestamp axis.
+
+    Stored funds are read in a single grouped query. Even hourly data is
+    bucketed so every fund lands on the same axis. Returns the sorted axis and
+    ``id_reksadana`` -> {"nav": [...], "aum": [...]} with None where a fund
+    has no value.
+    """
+    trunc, width = HISTORY_RESOLUTIONS[resolution]
+    points = {fund.pk: {} for fund in reksadanas}
+
+    stored = [fund.pk for fund in reksadanas if not fund.history_origin]
+    if stored:
+        buckets = (
+            HistoryReksadana.objects.filter(id_reksadana__in=stored, date__gte=start, date__lte=end)
+            .annotate(bucket=(trunc or TruncHour)("date"))
+            .values("id_reksadana", "bucket")
+            .annotate(avg_nav=Avg("nav"), avg_aum=Avg("aum"))
+            .order_by()
+        )
+        for bucket in buckets:
+            points[bucket["id_reksadana"]][bucket["bucket"]] = (
+                round(bucket["avg_nav"], 2), round(bucket["avg_aum"], 2)
+            )
+
+    for fund in reksadanas:
+        if fund.history_origin:
+            for row in query_procedural_history(fund, start, end, resolution, None, None, width):
+                points[fund.pk][row["date"]] = (row["nav"], row["aum"])
+
+    axis = sorted(set().union(*points.values()))
+    series = {
+        str(id_reksadana): {
+            "nav": [values[date][0] if date in values else None for date in axis],
+            "aum": [values[date][1] if date in values else None for date in axis],
+        }
+        for id_reksadana, values in points.items()
+    }
+    return axis, series
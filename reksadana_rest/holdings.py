@@ -0,0 +1,101 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast
+
+from .models import Holding, UnitDibeli
+
+# Fund units of a UnitDibeli row, the SQL version of UnitDibeli.units
+UNITS = Cast("nominal", FloatField()) / F("nav_pembelian")
+
+
+def holding_changes(units, sign=1):
+    """
+    Sums UnitDibeli rows into
+    {(user_id, id_reksadana pk): (nominal, count, fund units)},
+    negated with sign=-1 for sells.
+    """
+    changes = defaultdict(lambda: (0, 0, 0))
+    for unit in units:
+        key = (str(unit.user_id), unit.id_reksadana_id)
+        nominal, count, quantity = changes[key]
+        changes[key] = (nominal + sign * unit.nominal, count + sign, quantity + sign * unit.units)
+    return changes
+
+
+def apply_holding_changes(changes):
+    """
+    Adds the (nominal, count, fund units) deltas to the matching Holding
+    rows, creating missing ones and removing the ones left without units.
+
+    Call inside the transaction that writes the UnitDibeli rows so the
+    ledger never disagrees with them.
+    """
+    emptied = []
+    for (user_id, id_reksadana), (nominal, count, quantity) in changes.items():
+        holdings = Holding.objects.filter(user_id=user_id, id_reksadana_id=id_reksadana)
+        increments = {
+            "total_nominal": F("total_nominal") + nominal,
+            "unit_count": F("unit_count") + count,
+            "total_units": F("total_units") + quantity,
+        }
+        if holdings.update(**increments):
+            if count < 0:
+                emptied.append(holdings)
+            continue
+        try:
+            with transaction.atomic():
+                Holding.objects.create(
+                    user_id=user_id,
+                    id_reksadana_id=id_reksadana,
+                    total_nominal=nominal,
+                    unit_count=count,
+                    total_units=quantity,
+                )
+        except IntegrityError:
+            # Created by a concurrent order in the meantime
+            holdings.update(**increments)
+
+    for holdings in emptied:
+        holdings.filter(unit_count__lte=0).delete()
+
+
+def record_purchases(units):
+    apply_holding_changes(holding_changes(units))
+
+
+def record_sells(units):
+    apply_holding_changes(holding_changes(units, sign=-1))
+
+
+def rebuild_holdings(user_ids=None):
+    """
+    Recomputes Holding from the raw UnitDibeli rows, for every user or only
+    `user_ids`. Returns the number of holdings written.
+    """
+    holdings = Holding.objects.all()
+    units = UnitDibeli.objects.all()
+    if user_ids is not None:
+        holdings = holdings.filter(user_id__in=user_ids)
+        units = units.filter(user_id__in=user_ids)
+
+    totals = units.values("user_id", "id_reksadana").annotate(
+        total_nominal=Sum("nominal"), unit_count=Count("id"), total_units=Sum(UNITS)
+    )
+    with transaction.atomic():
+        holdings.delete()
+        created = Holding.objects.bulk_create(
+            [
+                Holding(
+                    user_id=total["user_id"],
+                    id_reksadana_id=total["id_reksadana"],
+                    total_nominal=total["total_nominal"],
+                    unit_count=total["unit_count"],
+                    total_units=total["total_units"] or 0,
+                )
+                for total in totals.order_by().iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
@@ -0,0 +1,37 @@
+import datetime
+import uuid
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Lease
+
+
+def acquire_lease(name, ttl, owner=None):
+    """
+    Tries to take (or renew) the named lease for ``ttl`` seconds.
+    Returns the owner token on success and None if someone else holds it.
+    """
+    owner = owner or uuid.uuid4().hex
+    now = timezone.now()
+    expires_at = now + datetime.timedelta(seconds=ttl)
+
+    # Take over an expired lease or renew our own
+    taken = Lease.objects.filter(name=name).filter(
+        Q(expires_at__lte=now) | Q(owner=owner)
+    ).update(owner=owner, expires_at=expires_at)
+    if taken:
+        return owner
+
+    try:
+        with transaction.atomic():
+            Lease.objects.create(name=name, owner=owner, expires_at=expires_at)
+        return owner
+    except IntegrityError:
+        return None
+
+
+def release_lease(name, owner):
+    Lease.objects.filter(name=name, owner=owner).delete()
+
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reksadana_rest.history import backfill_history
+from reksadana_rest.locks import acquire_lease, release_lease
+from reksadana_rest.models import Reksadana
+from reksadana_rest.procedural import refresh_procedural_latest
+
+LOCK_NAME = "advance_history"
+
+
+class Command(BaseCommand):
+    help = "Advance the hourly history of every reksadana, catching up any missed hours"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run a single tick and exit")
+        parser.add_argument("--interval", type=int, default=3600, help="Seconds between ticks")
+        parser.add_argument("--batch-size", type=int, default=100, help="Funds advanced per transaction")
+        parser.add_argument("--lock-ttl", type=int, default=600, help="Seconds before a stale lock is taken over")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            self.tick(options["batch_size"], options["lock_ttl"])
+            if options["once"]:
+                return
+            time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
+
+    def tick(self, batch_size, lock_ttl):
+        owner = acquire_lease(LOCK_NAME, lock_ttl)
+        if not owner:
+            self.stdout.write(self.style.WARNING("Another scheduler holds the lock, skipping tick"))
+            return
+
+        started = time.monotonic()
+        funds_advanced = 0
+        rows_created = 0
+        try:
+            ids = list(Reksadana.objects.order_by("pk").values_list("pk", flat=True))
+            for start in range(0, len(ids), batch_size):
+                batch = Reksadana.objects.filter(pk__in=ids[start:start + batch_size])
+                created = backfill_history(batch)
+                funds_advanced += len(created)
+                rows_created += sum(created.values())
+                # Keep the lock while working through a long catch-up. If it
+                # expired and another scheduler took it, that one carries on.
+                if not acquire_lease(LOCK_NAME, lock_ttl, owner=owner):
+                    self.stdout.write(self.style.WARNING("Lost the lock to another scheduler, stopping this tick"))
+                    break
+            else:
+                refresh_procedural_latest()
+        finally:
+            release_lease(LOCK_NAME, owner)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Advanced {funds_advanced}/{len(ids)} reksadana, "
+            f"created {rows_created} history rows in {time.monotonic() - started:.2f}s"
+        ))
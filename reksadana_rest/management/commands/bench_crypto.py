@@ -0,0 +1,58 @@
+import time
+from random import randint
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from django.core.management.base import BaseCommand, CommandError
+
+from tibib.crypto import AES_IV, AES_KEY, decode_value, decrypt_many, encode_value, encrypt_many
+
+
+def legacy_encode_value(value):
+    # What the views did before tibib.crypto: new Cipher and padder per value
+    padder = padding.PKCS7(128).padder()
+    encryptor = Cipher(algorithms.AES(AES_KEY), modes.CBC(AES_IV), backend=default_backend()).encryptor()
+    padded_data = padder.update(str(value).encode("utf-8")) + padder.finalize()
+    return (encryptor.update(padded_data) + encryptor.finalize()).hex()
+
+
+def legacy_decode_value(encrypted_value):
+    decryptor = Cipher(algorithms.AES(AES_KEY), modes.CBC(AES_IV), backend=default_backend()).decryptor()
+    decrypted_data = decryptor.update(bytes.fromhex(encrypted_value)) + decryptor.finalize()
+    unpadder = padding.PKCS7(128).unpadder()
+    return (unpadder.update(decrypted_data) + unpadder.finalize()).decode("utf-8")
+
+
+class Command(BaseCommand):
+    help = "Compare the legacy per-value AES code with the shared tibib.crypto functions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--values", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        # Nominals up to 10^20 so some values span two blocks
+        values = [str(randint(1, 10 ** randint(1, 20))) for _ in range(options["values"])]
+        encrypted = [legacy_encode_value(value) for value in values]
+
+        cases = {
+            "legacy encode": lambda: [legacy_encode_value(value) for value in values],
+            "encode_value": lambda: [encode_value(value) for value in values],
+            "encrypt_many": lambda: encrypt_many(values),
+            "legacy decode": lambda: [legacy_decode_value(value) for value in encrypted],
+            "decode_value": lambda: [decode_value(value) for value in encrypted],
+            "decrypt_many": lambda: decrypt_many(encrypted),
+        }
+        for name, run in cases.items():
+            timings = []
+            for _ in range(options["repeat"]):
+                begin = time.perf_counter()
+                result = run()
+                timings.append(time.perf_counter() - begin)
+            if result != (encrypted if "encode" in name or "encrypt" in name else values):
+                raise CommandError(f"{name} does not match the legacy output")
+            per_value = min(timings) / len(values) * 1e6
+            self.stdout.write(
+                f"{name:>14}: {min(timings) * 1000:8.2f} ms for {len(values)} values, {per_value:6.2f} us/value"
+            )
@@ -0,0 +1,61 @@
+import datetime
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reksadana_rest.history import backfill_history, refresh_latest
+from reksadana_rest.models import Bank, CategoryReksadana, HistoryReksadana, Reksadana
+
+GAPS = [
+    ("1 hour", 1),
+    ("1 month", 24 * 30),
+    ("1 year", 24 * 365),
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark hourly history backfill per fund for different gaps (nothing is kept in the database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--funds", type=int, default=1, help="Number of funds backfilled together")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        for label, hours in GAPS:
+            timings = []
+            for _ in range(options["repeat"]):
+                with transaction.atomic():
+                    funds = self.make_funds(options["funds"], hours)
+                    start = time.perf_counter()
+                    created = backfill_history(funds)
+                    timings.append(time.perf_counter() - start)
+                    transaction.set_rollback(True)
+
+            per_fund = min(timings) / options["funds"]
+            self.stdout.write(
+                f"gap {label:>8}: {sum(created.values()):>8} rows, "
+                f"{per_fund * 1000:10.2f} ms/fund ({options['funds']} funds)"
+            )
+
+    def make_funds(self, count, hours):
+        bank = Bank.objects.create(name="Bench Bank")
+        category = CategoryReksadana.objects.create(name="Bench Category")
+        last_date = timezone.now() - datetime.timedelta(hours=hours, minutes=1)
+
+        funds = []
+        for _ in range(count):
+            fund = Reksadana.objects.create(
+                name=f"Bench {uuid.uuid4()}",
+                category=category,
+                kustodian=bank,
+                penampung=bank,
+                nav=100,
+                aum=1000,
+            )
+            HistoryReksadana.objects.create(id_reksadana=fund, date=last_date, nav=100, aum=1000)
+            refresh_latest([fund])
+            funds.append(fund)
+        return funds
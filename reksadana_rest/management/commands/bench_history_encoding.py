@@ -0,0 +1,46 @@
+import datetime
+import time
+from random import uniform
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.utils import timezone
+
+from reksadana_rest.encoders import HISTORY_ENCODERS, decode_binary
+
+
+class Command(BaseCommand):
+    help = "Compare size and serialization time of the history response encodings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=24 * 365)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        rows = [
+            {
+                "id": i,
+                "id_reksadana_id": "cbe9b3dd-7c86-41b5-90bf-a673290f135b",
+                "date": start + datetime.timedelta(hours=i),
+                "nav": int(uniform(50, 150)),
+                "aum": int(uniform(500, 1500)),
+            }
+            for i in range(options["rows"])
+        ]
+
+        encoders = {"current (JsonResponse)": lambda rows: JsonResponse(rows, safe=False).content}
+        encoders.update(HISTORY_ENCODERS)
+        for name, encode in encoders.items():
+            timings = []
+            for _ in range(options["repeat"]):
+                begin = time.perf_counter()
+                payload = encode(rows)
+                timings.append(time.perf_counter() - begin)
+            self.stdout.write(
+                f"{name:>22}: {len(payload):>9} bytes, {min(timings) * 1000:8.2f} ms for {len(rows)} rows"
+            )
+
+        timestamps, navs, aums = decode_binary(HISTORY_ENCODERS["binary"](rows))
+        assert timestamps == [int(row["date"].timestamp()) for row in rows]
+        assert navs == [row["nav"] for row in rows]
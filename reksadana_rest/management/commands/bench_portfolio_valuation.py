@@ -0,0 +1,91 @@
+import datetime
+import time
+import uuid
+from random import choice, randint
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from reksadana_rest.history import refresh_latest
+from reksadana_rest.holdings import rebuild_holdings
+from reksadana_rest.models import Bank, CategoryReksadana, HistoryReksadana, Reksadana, UnitDibeli
+from reksadana_rest.valuation import value_portfolio
+
+
+def naive_market_value(user_id):
+    # One latest-history lookup per unit, what the portfolio page would need without the ledger
+    total = 0
+    for unit in UnitDibeli.objects.filter(user_id=user_id):
+        latest = HistoryReksadana.objects.filter(id_reksadana=unit.id_reksadana_id).order_by("-date").first()
+        total += unit.units * latest.nav
+    return total
+
+
+class Command(BaseCommand):
+    help = "Benchmark portfolio valuation for users holding 10, 1k and 100k units"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+        parser.add_argument("--funds", type=int, default=12)
+        parser.add_argument("--naive-limit", type=int, default=1000,
+                            help="Skip the per-unit baseline above this many units")
+
+    def handle(self, *args, **options):
+        bank = Bank.objects.create(name="Bench Bank")
+        categories = [CategoryReksadana.objects.create(name=f"Bench {name}") for name in ["Saham", "Obligasi", "Pasar Uang"]]
+        risks = [risk for risk, _ in Reksadana.TINGKAT_RESIKO_CHOICE]
+        funds = [
+            Reksadana.objects.create(
+                name=f"Bench Valuation {uuid.uuid4()}", category=categories[i % len(categories)],
+                kustodian=bank, penampung=bank, nav=100, aum=1000, tingkat_resiko=risks[i % len(risks)],
+            )
+            for i in range(options["funds"])
+        ]
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        HistoryReksadana.objects.bulk_create([
+            HistoryReksadana(id_reksadana=fund, date=now - datetime.timedelta(hours=hour), nav=randint(50, 150), aum=1000)
+            for fund in funds
+            for hour in range(48)
+        ])
+        refresh_latest(funds)
+
+        try:
+            for size in options["sizes"]:
+                self.run(size, funds, now, options)
+        finally:
+            for fund in funds:
+                fund.delete()
+            for category in categories:
+                category.delete()
+            bank.delete()
+
+    def run(self, size, funds, now, options):
+        user_id = uuid.uuid4()
+        UnitDibeli.objects.bulk_create(
+            [
+                UnitDibeli(
+                    user_id=user_id, id_reksadana=choice(funds), nominal=randint(10, 1000) * 1000,
+                    waktu_pembelian=now, nav_pembelian=randint(50, 150),
+                )
+                for _ in range(size)
+            ],
+            batch_size=1000,
+        )
+        rebuild_holdings([user_id])
+
+        with CaptureQueriesContext(connection) as queries:
+            begin = time.perf_counter()
+            valuation = value_portfolio(user_id)
+            elapsed = time.perf_counter() - begin
+        line = f"{size:>7} units: value_portfolio {elapsed * 1000:8.2f} ms, {len(queries)} queries"
+
+        if size <= options["naive_limit"]:
+            with CaptureQueriesContext(connection) as queries:
+                begin = time.perf_counter()
+                expected = naive_market_value(user_id)
+                elapsed = time.perf_counter() - begin
+            assert abs(expected - valuation["market_value"]) <= 0.01 * len(valuation["holdings"]) + 1e-6 * expected
+            line += f" | per-unit lookups {elapsed * 1000:8.2f} ms, {len(queries)} queries"
+        self.stdout.write(line)
@@ -0,0 +1,71 @@
+import datetime
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reksadana_rest.history import backfill_history, query_history, refresh_latest
+from reksadana_rest.models import Bank, CategoryReksadana, CheckpointReksadana, HistoryReksadana, Reksadana
+
+HOURS = 24 * 365
+RANGES = [
+    ("1 day", datetime.timedelta(days=1)),
+    ("1 month", datetime.timedelta(days=30)),
+    ("1 year", datetime.timedelta(days=365)),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare storage and read latency of stored vs procedural history for one year of one fund"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            bank = Bank.objects.create(name="Bench Bank")
+            category = CategoryReksadana.objects.create(name="Bench Category")
+            now = timezone.now().replace(minute=0, second=0, microsecond=0)
+            origin = now - datetime.timedelta(hours=HOURS)
+
+            stored = self.make_fund(bank, category)
+            HistoryReksadana.objects.create(id_reksadana=stored, date=origin, nav=100, aum=1000)
+            refresh_latest([stored])
+            backfill_history([stored])
+            procedural = self.make_fund(bank, category, history_origin=origin)
+
+            # Stores the checkpoints, reproducibility is covered in reksadana_rest/tests.py
+            query_history(procedural, end=now)
+
+            self.stdout.write(
+                f"stored rows: {HistoryReksadana.objects.filter(id_reksadana=stored).count()} history, "
+                f"procedural rows: {CheckpointReksadana.objects.filter(id_reksadana=procedural).count()} checkpoints"
+            )
+            for label, span in RANGES:
+                start = now - span
+                self.stdout.write(
+                    f"read {label:>7}: stored {self.time(stored, start, now, options['repeat']):8.2f} ms, "
+                    f"procedural {self.time(procedural, start, now, options['repeat']):8.2f} ms"
+                )
+            transaction.set_rollback(True)
+
+    def make_fund(self, bank, category, **kwargs):
+        return Reksadana.objects.create(
+            name=f"Bench {uuid.uuid4()}",
+            category=category,
+            kustodian=bank,
+            penampung=bank,
+            nav=100,
+            aum=1000,
+            **kwargs,
+        )
+
+    def time(self, fund, start, end, repeat):
+        timings = []
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            list(query_history(fund, start=start, end=end, limit=HOURS + 1))
+            timings.append(time.perf_counter() - begin)
+        return min(timings) * 1000
@@ -0,0 +1,74 @@
+import time
+from random import choice, randint
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reksadana_rest.models import Bank, CategoryReksadana, Reksadana
+from reksadana_rest.search import find_reksadana, search_queryset
+
+
+class Command(BaseCommand):
+    help = "Benchmark search-reksadana on a synthetic catalogue (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--funds", type=int, default=100000)
+        parser.add_argument("--pages", type=int, default=50, help="Pages walked for the deep page timing")
+        parser.add_argument("--limit", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            categories, banks = self.make_catalogue(options["funds"])
+            cases = [
+                ("sort nav", {"sort": "nav"}),
+                ("sort -aum", {"sort": "-aum"}),
+                ("category, sort nav", {"category": categories[0].id, "sort": "nav"}),
+                ("category, sort -aum", {"category": categories[1].id, "sort": "-aum"}),
+                ("tingkat_resiko, sort name", {"tingkat_resiko": "Moderat"}),
+                ("tingkat_resiko, sort -nav", {"tingkat_resiko": "Agresif", "sort": "-nav"}),
+                ("kustodian, sort name", {"kustodian": banks[0].id}),
+                ("kustodian, sort aum", {"kustodian": banks[1].id, "sort": "aum"}),
+                ("name prefix", {"name": "Bench 01"}),
+            ]
+
+            begin = time.perf_counter()
+            everything = list(Reksadana.objects.all().values())
+            self.stdout.write(
+                f"{'load all + filter in client':>28}: {(time.perf_counter() - begin) * 1000:8.2f} ms "
+                f"({len(everything)} rows)"
+            )
+
+            for label, filters in cases:
+                plan = search_queryset(**filters)[0][:options["limit"]].explain()
+                begin = time.perf_counter()
+                rows, cursor = find_reksadana(limit=options["limit"], **filters)
+                first = time.perf_counter() - begin
+
+                page = 1
+                last = first
+                while cursor and page < options["pages"]:
+                    begin = time.perf_counter()
+                    rows, cursor = find_reksadana(limit=options["limit"], cursor=cursor, **filters)
+                    last = time.perf_counter() - begin
+                    page += 1
+
+                self.stdout.write(
+                    f"{label:>28}: first page {first * 1000:6.2f} ms, page {page} {last * 1000:6.2f} ms"
+                    f"{'  TEMP B-TREE' if 'TEMP B-TREE' in plan else ''}"
+                )
+            transaction.set_rollback(True)
+
+    def make_catalogue(self, count):
+        categories = [CategoryReksadana.objects.create(name=f"Bench Category {i}") for i in range(20)]
+        banks = [Bank.objects.create(name=f"Bench Bank {i}") for i in range(50)]
+        risks = [risk for risk, _ in Reksadana.TINGKAT_RESIKO_CHOICE]
+        funds = []
+        for i in range(count):
+            nav, aum = randint(50, 150), randint(500, 1500)
+            funds.append(Reksadana(
+                name=f"Bench {i:06d}", category=choice(categories), kustodian=choice(banks),
+                penampung=choice(banks), nav=nav, aum=aum, latest_nav=nav, latest_aum=aum,
+                tingkat_resiko=choice(risks),
+            ))
+        Reksadana.objects.bulk_create(funds, batch_size=1000)
+        return categories, banks
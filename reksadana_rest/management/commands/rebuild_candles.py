@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reksadana_rest.rollups import rebuild_candles
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily and monthly NAV/AUM candles and the latest snapshot from the hourly history"
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            rebuild_candles()
+        self.stdout.write(self.style.SUCCESS("Rebuilt reksadana candles"))
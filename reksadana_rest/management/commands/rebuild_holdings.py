@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from reksadana_rest.holdings import rebuild_holdings
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user Holding ledger from the UnitDibeli rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", help="Only rebuild this user id (repeatable)")
+
+    def handle(self, *args, **options):
+        count = rebuild_holdings(options["users"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} holdings"))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_history(apps, schema_editor):
+    HistoryReksadana = apps.get_model('reksadana_rest', 'HistoryReksadana')
+    duplicates = (
+        HistoryReksadana.objects.values('id_reksadana', 'date')
+        .annotate(keep=Min('id'), count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        HistoryReksadana.objects.filter(
+            id_reksadana=duplicate['id_reksadana'], date=duplicate['date']
+        ).exclude(id=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0004_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_history, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='historyreksadana',
+            constraint=models.UniqueConstraint(fields=('id_reksadana', 'date'), name='unique_history_per_hour'),
+        ),
+    ]
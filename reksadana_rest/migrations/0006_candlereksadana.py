@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0005_historyreksadana_unique_per_hour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandleReksadana',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('daily', 'Daily'), ('monthly', 'Monthly')], max_length=10)),
+                ('date', models.DateTimeField()),
+                ('open_nav', models.IntegerField()),
+                ('high_nav', models.IntegerField()),
+                ('low_nav', models.IntegerField()),
+                ('close_nav', models.IntegerField()),
+                ('open_aum', models.IntegerField()),
+                ('high_aum', models.IntegerField()),
+                ('low_aum', models.IntegerField()),
+                ('close_aum', models.IntegerField()),
+                ('id_reksadana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reksadana_rest.reksadana')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('id_reksadana', 'period', 'date'), name='unique_candle_per_period')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0006_candlereksadana'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reksadana',
+            name='history_origin',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CheckpointReksadana',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.IntegerField()),
+                ('nav', models.FloatField()),
+                ('aum', models.FloatField()),
+                ('id_reksadana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reksadana_rest.reksadana')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('id_reksadana', 'hour'), name='unique_checkpoint_per_hour')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_holdings(apps, schema_editor):
+    UnitDibeli = apps.get_model("reksadana_rest", "UnitDibeli")
+    Holding = apps.get_model("reksadana_rest", "Holding")
+    totals = UnitDibeli.objects.values("user_id", "id_reksadana").annotate(
+        total_nominal=Sum("nominal"), unit_count=Count("id")
+    ).order_by()
+    Holding.objects.bulk_create(
+        [
+            Holding(
+                user_id=total["user_id"],
+                id_reksadana_id=total["id_reksadana"],
+                total_nominal=total["total_nominal"],
+                unit_count=total["unit_count"],
+            )
+            for total in totals
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0007_procedural_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.UUIDField()),
+                ('total_nominal', models.BigIntegerField(default=0)),
+                ('unit_count', models.IntegerField(default=0)),
+                ('id_reksadana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reksadana_rest.reksadana')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user_id', 'id_reksadana'), name='unique_holding_per_fund')],
+            },
+        ),
+        migrations.RunPython(build_holdings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:58
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfill_purchase_nav(apps, schema_editor):
+    # NAV of the last history entry at or before the purchase, else the fund's initial NAV
+    Reksadana = apps.get_model("reksadana_rest", "Reksadana")
+    HistoryReksadana = apps.get_model("reksadana_rest", "HistoryReksadana")
+    UnitDibeli = apps.get_model("reksadana_rest", "UnitDibeli")
+    Holding = apps.get_model("reksadana_rest", "Holding")
+
+    history_nav = HistoryReksadana.objects.filter(
+        id_reksadana=OuterRef("id_reksadana"), date__lte=OuterRef("waktu_pembelian")
+    ).order_by("-date").values("nav")[:1]
+    fund_nav = Reksadana.objects.filter(pk=OuterRef("id_reksadana")).values("nav")[:1]
+    UnitDibeli.objects.filter(nav_pembelian__isnull=True).update(
+        nav_pembelian=Coalesce(Subquery(history_nav), Subquery(fund_nav))
+    )
+
+    units = UnitDibeli.objects.filter(
+        user_id=OuterRef("user_id"), id_reksadana=OuterRef("id_reksadana")
+    ).order_by().values("user_id").annotate(
+        total=Sum(Cast("nominal", FloatField()) / F("nav_pembelian"))
+    ).values("total")
+    Holding.objects.update(total_units=Coalesce(Subquery(units), 0.0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0008_holding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holding',
+            name='total_units',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='unitdibeli',
+            name='nav_pembelian',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_purchase_nav, migrations.RunPython.noop),
+    ]
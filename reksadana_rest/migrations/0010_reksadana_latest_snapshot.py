@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:59
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_latest(apps, schema_editor):
+    Reksadana = apps.get_model("reksadana_rest", "Reksadana")
+    HistoryReksadana = apps.get_model("reksadana_rest", "HistoryReksadana")
+    latest = HistoryReksadana.objects.filter(id_reksadana=OuterRef("pk")).order_by("-date")
+    Reksadana.objects.update(
+        latest_date=Subquery(latest.values("date")[:1]),
+        # Funds without history yet are priced at their initial nav/aum
+        latest_nav=Coalesce(Subquery(latest.values("nav")[:1]), F("nav")),
+        latest_aum=Coalesce(Subquery(latest.values("aum")[:1]), F("aum")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0009_unit_purchase_nav'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reksadana',
+            name='latest_aum',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reksadana',
+            name='latest_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reksadana',
+            name='latest_nav',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_latest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:03
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_missing_latest(apps, schema_editor):
+    # Search sorts on these, funds without history use their initial values
+    Reksadana = apps.get_model("reksadana_rest", "Reksadana")
+    Reksadana.objects.filter(latest_nav__isnull=True).update(latest_nav=F("nav"))
+    Reksadana.objects.filter(latest_aum__isnull=True).update(latest_aum=F("aum"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0010_reksadana_latest_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_missing_latest, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['latest_nav', 'id_reksadana'], name='reksadana_nav_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['latest_aum', 'id_reksadana'], name='reksadana_aum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['category', 'name'], name='reksadana_cat_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['category', 'latest_nav', 'id_reksadana'], name='reksadana_cat_nav_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['category', 'latest_aum', 'id_reksadana'], name='reksadana_cat_aum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['tingkat_resiko', 'name'], name='reksadana_risk_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['tingkat_resiko', 'latest_nav', 'id_reksadana'], name='reksadana_risk_nav_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['tingkat_resiko', 'latest_aum', 'id_reksadana'], name='reksadana_risk_aum_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['kustodian', 'name'], name='reksadana_kust_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['kustodian', 'latest_nav', 'id_reksadana'], name='reksadana_kust_nav_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reksadana',
+            index=models.Index(fields=['kustodian', 'latest_aum', 'id_reksadana'], name='reksadana_kust_aum_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0011_reksadana_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user_id'], name='payment_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unitdibeli',
+            index=models.Index(fields=['user_id', 'id_reksadana', 'id'], name='unitdibeli_user_fund_idx'),
+        ),
+    ]
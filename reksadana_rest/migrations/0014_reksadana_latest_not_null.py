@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_missing_latest(apps, schema_editor):
+    # Funds bulk inserted without a snapshot, or that had no history when
+    # 0010 ran, start at their initial nav/aum like Reksadana.save() does
+    Reksadana = apps.get_model("reksadana_rest", "Reksadana")
+    Reksadana.objects.filter(latest_nav__isnull=True).update(latest_nav=F("nav"))
+    Reksadana.objects.filter(latest_aum__isnull=True).update(latest_aum=F("aum"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reksadana_rest', '0013_catalogue_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_missing_latest, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reksadana',
+            name='latest_aum',
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='reksadana',
+            name='latest_nav',
+            field=models.IntegerField(default=0),
+            preserve_default=False,
+        ),
+    ]
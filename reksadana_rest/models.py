@@ -1,8 +1,6 @@
 import datetime
-import math
 import uuid
 from django.db import models
-from random import randint, uniform
 from django.utils import timezone
 
 #TODO: Semua class ini belum ada validasi
@@ -35,76 +33,44 @@ class Reksadana(models.Model):
         choices=TINGKAT_RESIKO_CHOICE,
         default="Konservatif",
     )
+    # Set for funds whose history is computed on read from checkpoints
+    # (see procedural.py) instead of being stored one row per hour
+    history_origin = models.DateTimeField(null=True, blank=True)
+    # Copy of the newest history point, refreshed whenever history is appended.
+    # Never null, search pages on them. save() starts them at nav/aum, bulk
+    # inserts have to set them.
+    latest_nav = models.IntegerField()
+    latest_aum = models.IntegerField()
+    latest_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # One per search filter and sort pair, see search.py. The name sort
+        # without a filter uses the unique index on name.
+        indexes = [
+            models.Index(fields=["latest_nav", "id_reksadana"], name="reksadana_nav_idx"),
+            models.Index(fields=["latest_aum", "id_reksadana"], name="reksadana_aum_idx"),
+            models.Index(fields=["category", "name"], name="reksadana_cat_name_idx"),
+            models.Index(fields=["category", "latest_nav", "id_reksadana"], name="reksadana_cat_nav_idx"),
+            models.Index(fields=["category", "latest_aum", "id_reksadana"], name="reksadana_cat_aum_idx"),
+            models.Index(fields=["tingkat_resiko", "name"], name="reksadana_risk_name_idx"),
+            models.Index(fields=["tingkat_resiko", "latest_nav", "id_reksadana"], name="reksadana_risk_nav_idx"),
+            models.Index(fields=["tingkat_resiko", "latest_aum", "id_reksadana"], name="reksadana_risk_aum_idx"),
+            models.Index(fields=["kustodian", "name"], name="reksadana_kust_name_idx"),
+            models.Index(fields=["kustodian", "latest_nav", "id_reksadana"], name="reksadana_kust_nav_idx"),
+            models.Index(fields=["kustodian", "latest_aum", "id_reksadana"], name="reksadana_kust_aum_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Until there is history the current price is the initial one
+        if self.latest_nav is None:
+            self.latest_nav = self.nav
+        if self.latest_aum is None:
+            self.latest_aum = self.aum
+        super().save(*args, **kwargs)
 
     def generate_made_up_history_per_hour(self):
-        history = HistoryReksadana.objects.filter(id_reksadana=self.id_reksadana).order_by('-date')
-        print("aaaa", history)
-        if not history.exists():
-            # If no history, create the first entry
-            new_nav = randint(50, 150)
-            new_aum = randint(500, 1500)
-
-            HistoryReksadana.objects.create(
-                id_reksadana=self,
-                date=datetime.datetime.now(),
-                nav=new_nav,
-                aum=new_aum
-            )
-
-            print('ppp',datetime.datetime.now())
-            return
-
-        # Get the latest history entry
-        last_entry = history.first()
-        print('uwu',last_entry)
-        last_nav = last_entry.nav
-        last_aum = last_entry.aum
-        last_date = last_entry.date
-        
-        if timezone.is_naive(last_date):
-            last_date = timezone.make_aware(last_date, timezone.get_current_timezone())
-        # Get current datetime
-        current_time = datetime.datetime.now()
-        if timezone.is_naive(current_time):
-            current_time = timezone.make_aware(current_time, timezone.get_current_timezone())
-        
-        # Calculate how many hours have passed
-        hours_passed = int((current_time - last_date).total_seconds() // 3600)
-
-        if hours_passed <= 0:
-            return  # No new data needed
-
-        # Generate missing history entries for each passed hour
-        for i in range(1, hours_passed + 1):
-            new_time = last_date + datetime.timedelta(hours=i)
-
-            # Introduce randomness in changes
-            base_change_nav = uniform(-5, 5)  # Base price movement
-            base_change_aum = uniform(-50, 50)
-
-            # Add oscillations for zigzag effect
-            oscillation_nav = math.sin(i * uniform(0.5, 2.0)) * uniform(2, 5)
-            oscillation_aum = math.sin(i * uniform(0.5, 2.0)) * uniform(10, 30)
-
-            # Compute new values
-            new_nav = last_nav + base_change_nav + oscillation_nav
-            new_aum = last_aum + base_change_aum + oscillation_aum
-
-            # Ensure values stay within reasonable bounds
-            new_nav = max(1, round(new_nav, 2))  # NAV shouldn't go negative
-            new_aum = max(100, round(new_aum, 2))  # AUM shouldn't go negative
-
-            # Save new history entry
-            HistoryReksadana.objects.create(
-                id_reksadana=self,
-                date=new_time,
-                nav=new_nav,
-                aum=new_aum
-            )
-
-            # Update last_nav and last_aum for next iteration
-            last_nav = new_nav
-            last_aum = new_aum
+        from .history import backfill_fund_history
+        backfill_fund_history(self)
 
 class Bank(models.Model):
     name = models.CharField(max_length=255)
@@ -120,6 +86,27 @@ class HistoryReksadana(models.Model):
     nav = models.IntegerField()
     aum = models.IntegerField()
 
+    class Meta:
+        constraints = [
+            # One entry per fund per hour, concurrent generators can't duplicate
+            models.UniqueConstraint(fields=["id_reksadana", "date"], name="unique_history_per_hour"),
+        ]
+
+
+class CheckpointReksadana(models.Model):
+    # Exact walk state `hour` hours after Reksadana.history_origin
+    id_reksadana = models.ForeignKey(to="Reksadana",
+                                     on_delete=models.CASCADE,
+                                     to_field="id_reksadana")
+    hour = models.IntegerField()
+    nav = models.FloatField()
+    aum = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["id_reksadana", "hour"], name="unique_checkpoint_per_hour"),
+        ]
+
 
 class UnitDibeli(models.Model):
     user_id = models.UUIDField()
@@ -128,11 +115,24 @@ class UnitDibeli(models.Model):
                                      to_field="id_reksadana")
     nominal = models.IntegerField()
     waktu_pembelian = models.DateTimeField()
+    # Fund NAV at purchase, the units bought are nominal / nav_pembelian
+    nav_pembelian = models.FloatField(null=True, blank=True)
 
     def clean(self):
         super().clean()
         if self.nominal<0:
             raise ValueError("Ini apaan uang <0 :V")
+
+    class Meta:
+        indexes = [
+            # Portfolio reads by user, and the newest unit per user and fund
+            # that get_holdings_by_user hands to sells
+            models.Index(fields=["user_id", "id_reksadana", "id"], name="unitdibeli_user_fund_idx"),
+        ]
+
+    @property
+    def units(self):
+        return self.nominal / self.nav_pembelian if self.nav_pembelian else 0
         
 class Payment(models.Model):
     #TODO: BELUM DI HASH
@@ -144,7 +144,64 @@ class Payment(models.Model):
     nominal = models.IntegerField()
     waktu_pembelian = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id"], name="payment_user_idx"),
+        ]
+
     def clean(self):
         super().clean()
         if self.nominal<0:
-            raise ValueError("Ini apaan uang <0 :V")
\ No newline at end of file
+            raise ValueError("Ini apaan uang <0 :V")
+
+class Lease(models.Model):
+    # Row-level lock shared by every process using the same database
+    name = models.CharField(max_length=255, primary_key=True)
+    owner = models.CharField(max_length=64)
+    expires_at = models.DateTimeField()
+
+
+class CatalogueVersion(models.Model):
+    # Single row bumped on every fund change, see catalogue.py
+    version = models.BigIntegerField(default=0)
+
+
+class CandleReksadana(models.Model):
+    PERIOD_CHOICE = [
+        ("daily", "Daily"),
+        ("monthly", "Monthly"),
+    ]
+    id_reksadana = models.ForeignKey(to="Reksadana",
+                                     on_delete=models.CASCADE,
+                                     to_field="id_reksadana")
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICE)
+    date = models.DateTimeField()  # Start of the day/month
+    open_nav = models.IntegerField()
+    high_nav = models.IntegerField()
+    low_nav = models.IntegerField()
+    close_nav = models.IntegerField()
+    open_aum = models.IntegerField()
+    high_aum = models.IntegerField()
+    low_aum = models.IntegerField()
+    close_aum = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["id_reksadana", "period", "date"], name="unique_candle_per_period"),
+        ]
+
+
+class Holding(models.Model):
+    # Running total of a user's UnitDibeli per fund, kept in step by holdings.py
+    user_id = models.UUIDField()
+    id_reksadana = models.ForeignKey(to="Reksadana",
+                                     on_delete=models.CASCADE,
+                                     to_field="id_reksadana")
+    total_nominal = models.BigIntegerField(default=0)
+    unit_count = models.IntegerField(default=0)
+    total_units = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "id_reksadana"], name="unique_holding_per_fund"),
+        ]
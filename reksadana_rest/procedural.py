@@ -0,0 +1,194 @@
+import datetime
+import hashlib
+import math
+import struct
+from itertools import groupby
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .catalogue import invalidate_catalogue_on_commit
+from .models import CheckpointReksadana, Reksadana
+from .rollups import day_start
+
+CHECKPOINT_INTERVAL = 24 * 7  # hours
+HOUR = datetime.timedelta(hours=1)
+
+
+def hour_draws(key, hour):
+    """
+    Six uniform [0, 1) numbers for the given hour of a fund's series.
+
+    Counter based: the numbers depend only on the fund key and the hour, so
+    any hour can be recomputed without replaying the ones before it.
+    """
+    digest = hashlib.blake2b(hour.to_bytes(8, "little"), key=key, digest_size=48).digest()
+    return [value / 2 ** 64 for value in struct.unpack("<6Q", digest)]
+
+
+def initial_point(key):
+    draws = hour_draws(key, 0)
+    return 50 + int(draws[0] * 101), 500 + int(draws[1] * 1001)
+
+
+def step(nav, aum, hour, draws):
+    """
+    Same movement as history.generate_series, with the draws passed in.
+    """
+    nav_change = (draws[0] * 10 - 5) + math.sin(hour * (0.5 + draws[1] * 1.5)) * (2 + draws[2] * 3)
+    aum_change = (draws[3] * 100 - 50) + math.sin(hour * (0.5 + draws[4] * 1.5)) * (10 + draws[5] * 20)
+    return max(1, round(nav + nav_change, 2)), max(100, round(aum + aum_change, 2))
+
+
+def replay(key, start, last):
+    """
+    The (hour, nav, aum) points from ``start``, a point of the series,
+    through hour ``last``.
+    """
+    hour, nav, aum = start
+    points = [start]
+    for hour in range(hour + 1, last + 1):
+        nav, aum = step(nav, aum, hour, hour_draws(key, hour))
+        points.append((hour, nav, aum))
+    return points
+
+
+def walk(reksadana, first, last, store=False):
+    """
+    Returns the (hour, nav, aum) points ``first``..``last`` of the series,
+    replayed from the closest checkpoint before ``first``.
+
+    With ``store`` the checkpoints passed for the first time are stored.
+    Only the scheduler does that (refresh_procedural_latest), reads must not
+    write, they may run on a replica.
+    """
+    key = reksadana.pk.bytes
+    checkpoints = CheckpointReksadana.objects.filter(id_reksadana=reksadana)
+    if store:
+        checkpoints = checkpoints.using(DEFAULT_DB_ALIAS)
+    checkpoint = checkpoints.filter(hour__lte=first).order_by("-hour").first()
+    if checkpoint:
+        start = (checkpoint.hour, checkpoint.nav, checkpoint.aum)
+    else:
+        start = (0, *initial_point(key))
+    points = replay(key, start, last)
+
+    if store:
+        stored_until = checkpoints.aggregate(last=Max("hour"))["last"] or 0
+        CheckpointReksadana.objects.bulk_create([
+            CheckpointReksadana(id_reksadana=reksadana, hour=hour, nav=nav, aum=aum)
+            for hour, nav, aum in points
+            if hour % CHECKPOINT_INTERVAL == 0 and hour > stored_until
+        ], ignore_conflicts=True)
+    return [point for point in points if point[0] >= first]
+
+
+def week_start(date):
+    date = day_start(date)
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def query_procedural_history(reksadana, start, end, resolution, after, limit, width):
+    """
+    Computes one page of a procedural fund's history in the same shape as
+    the stored rows returned by history.query_history.
+    """
+    origin = reksadana.history_origin
+    first = 0
+    last = (timezone.now() - origin) // HOUR
+    if start:
+        first = max(first, -((origin - start) // HOUR))
+    if after:
+        first = max(first, -((origin - after - width) // HOUR))
+    if end:
+        last = min(last, (end - origin) // HOUR)
+    if limit:
+        # One extra bucket so the last one returned is complete
+        buckets = limit if resolution == "hourly" else limit + 1
+        last = min(last, first + buckets * (width // HOUR) - 1)
+    if first > last:
+        return []
+
+    points = [
+        (origin + hour * HOUR, int(nav), int(aum))
+        for hour, nav, aum in walk(reksadana, first, last)
+    ]
+    if resolution == "hourly":
+        return [
+            {"id": None, "id_reksadana_id": reksadana.pk, "date": date, "nav": nav, "aum": aum}
+            for date, nav, aum in points
+        ]
+
+    bucket_of = day_start if resolution == "daily" else week_start
+    buckets = []
+    for bucket, entries in groupby(points, key=lambda point: bucket_of(point[0])):
+        entries = list(entries)
+        buckets.append({
+            "id_reksadana_id": reksadana.pk,
+            "date": bucket,
+            "nav": round(sum(entry[1] for entry in entries) / len(entries), 2),
+            "aum": round(sum(entry[2] for entry in entries) / len(entries), 2),
+        })
+    return buckets[:limit]
+
+
+def current_hour(reksadana, now=None):
+    return max(0, ((now or timezone.now()) - reksadana.history_origin) // HOUR)
+
+
+def current_points(reksadanas, now=None):
+    """
+    {id_reksadana: (date, nav, aum)} of the latest hour of many procedural
+    funds, reading the checkpoints of all of them in one query.
+    """
+    hours = {fund.pk: current_hour(fund, now) for fund in reksadanas}
+    if not hours:
+        return {}
+    # The checkpoint at or less than CHECKPOINT_INTERVAL hours before each
+    # fund's current hour, once the scheduler has stored it
+    near = Q()
+    for pk, hour in hours.items():
+        near |= Q(id_reksadana_id=pk, hour__lte=hour, hour__gt=hour - CHECKPOINT_INTERVAL)
+    starts = {
+        checkpoint.id_reksadana_id: (checkpoint.hour, checkpoint.nav, checkpoint.aum)
+        for checkpoint in CheckpointReksadana.objects.filter(near)
+    }
+
+    points = {}
+    for fund in reksadanas:
+        hour = hours[fund.pk]
+        start = starts.get(fund.pk)
+        if start is None and hour < CHECKPOINT_INTERVAL:
+            start = (0, *initial_point(fund.pk.bytes))
+        if start is None:
+            _, nav, aum = walk(fund, hour, hour)[0]  # Not advanced lately
+        else:
+            _, nav, aum = replay(fund.pk.bytes, start, hour)[-1]
+        points[fund.pk] = (fund.history_origin + hour * HOUR, int(nav), int(aum))
+    return points
+
+
+def current_point(reksadana, now=None):
+    """
+    (date, nav, aum) of the latest hour of a procedural fund's series.
+    """
+    return current_points([reksadana], now)[reksadana.pk]
+
+
+def refresh_procedural_latest(reksadanas=None, now=None):
+    """
+    Stores the current point of procedural funds in Reksadana.latest_*,
+    the equivalent of history.refresh_latest for funds with no stored rows,
+    and the checkpoints their series passed since the last run.
+    """
+    funds = Reksadana.objects.filter(history_origin__isnull=False)
+    if reksadanas is not None:
+        funds = funds.filter(pk__in=[getattr(fund, "pk", fund) for fund in reksadanas])
+    for fund in funds.iterator():
+        hour = current_hour(fund, now)
+        _, nav, aum = walk(fund, hour, hour, store=True)[0]
+        Reksadana.objects.filter(pk=fund.pk).update(
+            latest_date=fund.history_origin + hour * HOUR, latest_nav=int(nav), latest_aum=int(aum),
+        )
+    invalidate_catalogue_on_commit()
@@ -0,0 +1,125 @@
+import datetime
+from itertools import groupby
+
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .models import CandleReksadana, HistoryReksadana
+
+CANDLE_BATCH_SIZE = 1000
+CANDLE_FUNDS_PER_QUERY = 100
+CANDLE_FIELDS = [
+    "open_nav", "high_nav", "low_nav", "close_nav",
+    "open_aum", "high_aum", "low_aum", "close_aum",
+]
+
+
+def day_start(date):
+    return timezone.localtime(date).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def month_start(date):
+    return day_start(date).replace(day=1)
+
+
+def next_month(date):
+    return (date.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def merge_candles(id_reksadana, period, date, parts):
+    """
+    Builds one candle out of time-ordered (open, high, low, close) x (nav, aum)
+    tuples. A single hourly entry is the tuple (nav, nav, nav, nav, aum, ...).
+    """
+    return CandleReksadana(
+        id_reksadana_id=id_reksadana,
+        period=period,
+        date=date,
+        open_nav=parts[0][0],
+        high_nav=max(part[1] for part in parts),
+        low_nav=min(part[2] for part in parts),
+        close_nav=parts[-1][3],
+        open_aum=parts[0][4],
+        high_aum=max(part[5] for part in parts),
+        low_aum=min(part[6] for part in parts),
+        close_aum=parts[-1][7],
+    )
+
+
+def save_candles(candles):
+    CandleReksadana.objects.bulk_create(
+        candles,
+        batch_size=CANDLE_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["id_reksadana", "period", "date"],
+        update_fields=CANDLE_FIELDS,
+    )
+
+
+def update_candles(ranges):
+    """
+    Refreshes the daily and monthly candles touched by newly stored history.
+
+    ``ranges`` maps ``id_reksadana`` -> (first, last) date of the new rows.
+    Daily candles are recomputed from the hourly rows of the touched days only
+    and monthly candles from the daily candles of the touched months, so the
+    result is exact no matter how often the same rows are reported.
+    """
+    ranges = list(ranges.items())
+    for start in range(0, len(ranges), CANDLE_FUNDS_PER_QUERY):
+        update_fund_candles(ranges[start:start + CANDLE_FUNDS_PER_QUERY])
+
+
+def update_fund_candles(ranges):
+    touched_days = Q()
+    for id_reksadana, (first, last) in ranges:
+        touched_days |= Q(
+            id_reksadana_id=id_reksadana,
+            date__gte=day_start(first),
+            date__lt=day_start(last) + datetime.timedelta(days=1),
+        )
+    rows = (
+        HistoryReksadana.objects.filter(touched_days)
+        .order_by("id_reksadana", "date")
+        .values_list("id_reksadana", "date", "nav", "aum")
+    )
+    daily = []
+    for (id_reksadana, day), entries in groupby(rows.iterator(), key=lambda row: (row[0], day_start(row[1]))):
+        parts = [(nav,) * 4 + (aum,) * 4 for _, _, nav, aum in entries]
+        daily.append(merge_candles(id_reksadana, "daily", day, parts))
+    save_candles(daily)
+
+    touched_months = Q()
+    for id_reksadana, (first, last) in ranges:
+        touched_months |= Q(
+            id_reksadana_id=id_reksadana,
+            date__gte=month_start(first),
+            date__lt=next_month(month_start(last)),
+        )
+    days = (
+        CandleReksadana.objects.filter(touched_months, period="daily")
+        .order_by("id_reksadana", "date")
+        .values_list("id_reksadana", "date", *CANDLE_FIELDS)
+    )
+    monthly = []
+    for (id_reksadana, month), candles in groupby(days.iterator(), key=lambda row: (row[0], month_start(row[1]))):
+        parts = [candle[2:] for candle in candles]
+        monthly.append(merge_candles(id_reksadana, "monthly", month, parts))
+    save_candles(monthly)
+
+
+def rebuild_candles(reksadanas=None):
+    """
+    Recomputes every candle and the Reksadana.latest_* snapshot from the
+    stored hourly history, e.g. after an import that bypassed
+    ``backfill_history``.
+    """
+    from .history import refresh_latest
+
+    history = HistoryReksadana.objects.all()
+    if reksadanas is not None:
+        history = history.filter(id_reksadana__in=[fund.pk for fund in reksadanas])
+    bounds = history.values("id_reksadana").annotate(first=Min("date"), last=Max("date"))
+    ranges = {bound["id_reksadana"]: (bound["first"], bound["last"]) for bound in bounds}
+    update_candles(ranges)
+    refresh_latest(ranges)
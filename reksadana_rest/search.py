@@ -0,0 +1,101 @@
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+
+from .catalogue import get_catalogue
+from .models import Reksadana
+
+# sort parameter -> column, prefix with "-" for descending
+SEARCH_SORTS = {
+    "name": "name",
+    "nav": "latest_nav",
+    "aum": "latest_aum",
+}
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
+
+# Above any code point, so name__lt=prefix + PREFIX_END bounds a prefix
+PREFIX_END = "\U0010ffff"
+
+
+def encode_search_cursor(row, column):
+    key = [row[column], str(row["id_reksadana"])]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_search_cursor(cursor):
+    try:
+        value, id_reksadana = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, uuid.UUID(id_reksadana)
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def search_queryset(category=None, tingkat_resiko=None, kustodian=None, name=None, sort="name", cursor=None):
+    """
+    Funds matching every given filter, ordered by `sort` and starting after
+    `cursor`. Returns (queryset, sort column).
+
+    Pages are keyset paginated on (sort column, id_reksadana) so a deep page
+    costs the same as the first one, with the matching
+    Reksadana.Meta.indexes serving both the filter and the order. `name` is
+    a case-sensitive prefix, matched as a range so the name index applies.
+    """
+    descending = sort.startswith("-")
+    column = SEARCH_SORTS.get(sort.lstrip("-"))
+    if column is None:
+        raise ValueError(f"sort must be one of {', '.join(SEARCH_SORTS)}, optionally prefixed with -")
+
+    funds = Reksadana.objects.all()
+    if category:
+        funds = funds.filter(category_id=category)
+    if tingkat_resiko:
+        funds = funds.filter(tingkat_resiko=tingkat_resiko)
+    if kustodian:
+        funds = funds.filter(kustodian_id=kustodian)
+    if name:
+        funds = funds.filter(name__gte=name, name__lt=name + PREFIX_END)
+
+    # Names are unique, the other columns need id_reksadana to break ties
+    order = [column] if column == "name" else [column, "id_reksadana"]
+    if cursor:
+        value, id_reksadana = decode_search_cursor(cursor)
+        after = "lt" if descending else "gt"
+        keyset = Q(**{f"{column}__{after}": value})
+        if column != "name":
+            keyset |= Q(**{column: value, f"id_reksadana__{after}": id_reksadana})
+        funds = funds.filter(keyset)
+
+    if descending:
+        order = [f"-{field}" for field in order]
+    return funds.order_by(*order), column
+
+
+def find_reksadana(limit=SEARCH_PAGE_SIZE, **filters):
+    """
+    One page of search_queryset. Returns (rows, cursor of the next page or None).
+    """
+    funds, column = search_queryset(**filters)
+    rows = list(funds.values()[:limit])
+    next_cursor = encode_search_cursor(rows[-1], column) if len(rows) == limit else None
+    return rows, next_cursor
+
+
+def catalogue_page(sort="name", cursor=None, limit=SEARCH_PAGE_SIZE):
+    """
+    find_reksadana without filters, sorted by name, paged from the cached
+    catalogue instead of the database. Same rows and cursors as
+    find_reksadana(sort=sort, cursor=cursor).
+    """
+    if sort.lstrip("-") != "name":
+        raise ValueError("catalogue_page only sorts by name")
+    descending = sort.startswith("-")
+    rows = sorted(get_catalogue(), key=lambda row: row["name"], reverse=descending)
+    if cursor:
+        name, _ = decode_search_cursor(cursor)
+        rows = [row for row in rows if (row["name"] < name if descending else row["name"] > name)]
+    rows = rows[:limit]
+    next_cursor = encode_search_cursor(rows[-1], "name") if len(rows) == limit else None
+    return rows, next_cursor
@@ -0,0 +1,292 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from tibib.crypto import encode_value
+from tibib.upstream import get_async_client, get_client
+
+from .holdings import record_purchases, record_sells
+from .models import Payment, Reksadana, UnitDibeli
+from .valuation import current_nav, current_navs
+
+BATCH_SIZE = 500
+BATCH_MAX_ORDERS = 1000
+
+
+def parse_nominal(nominal):
+    """A decrypted nominal as a positive int, ValueError otherwise."""
+    try:
+        nominal = int(nominal)
+    except TypeError:
+        raise ValueError("nominal must be a number")
+    if nominal <= 0:
+        raise ValueError("nominal must be positive")
+    return nominal
+
+
+def parse_purchase(user_id, id_reksadana, nominal):
+    """The error (data, status) of a purchase request, or its int nominal."""
+    if not user_id or not id_reksadana or nominal in (None, ""):
+        return ({"error": "Missing required fields"}, 400), None
+    try:
+        return None, parse_nominal(nominal)
+    except ValueError:
+        return ({"error": "Invalid nominal"}, 400), None
+
+
+def record_purchase(user_id, reksadana, nominal):
+    nav = current_nav(reksadana)
+    now = timezone.now()
+    # Both rows or neither, a payment without its units must never be visible
+    with transaction.atomic():
+        payment = Payment.objects.create(
+            user_id=user_id,
+            id_reksadana=reksadana,
+            nominal=nominal,
+            waktu_pembelian=now
+        )
+        unit = UnitDibeli.objects.create(
+            user_id=user_id,
+            id_reksadana=reksadana,
+            nominal=nominal,
+            waktu_pembelian=now,
+            nav_pembelian=nav
+        )
+        record_purchases([unit])
+    return {"message": "Successfully processed payment", "payment_id": payment.id, "unit_id": unit.id}, 201
+
+
+def purchase_units(user_id, id_reksadana, nominal):
+    """
+    Records a purchase: the payment and the units bought with it.
+    Returns (response data, HTTP status) like the matching endpoints.
+    """
+    error, nominal = parse_purchase(user_id, id_reksadana, nominal)
+    if error:
+        return error
+
+    try:
+        reksadana = Reksadana.objects.filter(id_reksadana=id_reksadana).first()
+    except ValidationError:
+        return {"error": "Invalid id_reksadana"}, 400
+    if reksadana is None:
+        return {"error": "Reksadana not found"}, 404
+    return record_purchase(user_id, reksadana, nominal)
+
+
+async def apurchase_units(user_id, id_reksadana, nominal):
+    """
+    purchase_units for async views. The fund is looked up with the async
+    ORM, the writes run in one thread as transactions can't span awaits.
+    """
+    error, nominal = parse_purchase(user_id, id_reksadana, nominal)
+    if error:
+        return error
+
+    try:
+        reksadana = await Reksadana.objects.filter(id_reksadana=id_reksadana).afirst()
+    except ValidationError:
+        return {"error": "Invalid id_reksadana"}, 400
+    if reksadana is None:
+        return {"error": "Reksadana not found"}, 404
+    return await sync_to_async(record_purchase)(user_id, reksadana, nominal)
+
+
+def remove_unit(unitdibeli):
+    """Deletes a UnitDibeli and updates its holding, False if it was already gone."""
+    with transaction.atomic():
+        # Only the request that actually removes the row updates the holding
+        deleted, _ = UnitDibeli.objects.filter(id=unitdibeli.id).delete()
+        if deleted:
+            record_sells([unitdibeli])
+    return bool(deleted)
+
+
+def sell_unit(user_id, id_unitdibeli):
+    """
+    Sells (removes) one UnitDibeli owned by `user_id`.
+    Returns (response data, HTTP status) like the matching endpoints.
+    """
+    if not id_unitdibeli:
+        return {"error": "id_unitdibeli is required"}, 400
+
+    unitdibeli = UnitDibeli.objects.filter(id=id_unitdibeli).first()
+    if unitdibeli is None:
+        return {"error": "UnitDibeli not found"}, 404
+    if str(user_id) != str(unitdibeli.user_id):
+        return {"error": "You are not authorized to delete this unit"}, 403
+
+    if not remove_unit(unitdibeli):
+        return {"error": "UnitDibeli not found"}, 404
+    return {"message": "Successfully sold unit reksadana"}, 201
+
+
+async def asell_unit(user_id, id_unitdibeli):
+    """sell_unit for async views."""
+    if not id_unitdibeli:
+        return {"error": "id_unitdibeli is required"}, 400
+
+    unitdibeli = await UnitDibeli.objects.filter(id=id_unitdibeli).afirst()
+    if unitdibeli is None:
+        return {"error": "UnitDibeli not found"}, 404
+    if str(user_id) != str(unitdibeli.user_id):
+        return {"error": "You are not authorized to delete this unit"}, 403
+
+    if not await sync_to_async(remove_unit)(unitdibeli):
+        return {"error": "UnitDibeli not found"}, 404
+    return {"message": "Successfully sold unit reksadana"}, 201
+
+
+def purchase_units_batch(user_id, orders):
+    """
+    Records many purchases at once. `orders` is a list of
+    (id_reksadana, nominal) pairs with decrypted nominal values.
+
+    All funds are fetched with one query and the valid orders are written
+    with bulk_create in one transaction. Returns one result per order,
+    each with its own HTTP-like status.
+    """
+    results = [None] * len(orders)
+    parsed = [None] * len(orders)
+    for i, (id_reksadana, nominal) in enumerate(orders):
+        try:
+            parsed[i] = uuid.UUID(str(id_reksadana)), parse_nominal(nominal)
+        except ValueError:
+            results[i] = {"status": 400, "error": "Invalid id_reksadana or nominal"}
+    ids = {order[0] for order in parsed if order}
+    reksadanas = Reksadana.objects.in_bulk(ids)
+    navs = current_navs(list(reksadanas.values()))
+
+    now = timezone.now()
+    accepted = []
+    for i, order in enumerate(parsed):
+        if results[i]:
+            continue
+        id_reksadana, nominal = order
+        reksadana = reksadanas.get(id_reksadana)
+        if reksadana is None:
+            results[i] = {"status": 404, "error": "Reksadana not found"}
+            continue
+        accepted.append((
+            i,
+            Payment(user_id=user_id, id_reksadana=reksadana, nominal=nominal, waktu_pembelian=now),
+            UnitDibeli(
+                user_id=user_id,
+                id_reksadana=reksadana,
+                nominal=nominal,
+                waktu_pembelian=now,
+                nav_pembelian=navs[reksadana.pk],
+            ),
+        ))
+
+    with transaction.atomic():
+        Payment.objects.bulk_create([payment for _, payment, _ in accepted], batch_size=BATCH_SIZE)
+        UnitDibeli.objects.bulk_create([unit for _, _, unit in accepted], batch_size=BATCH_SIZE)
+        record_purchases([unit for _, _, unit in accepted])
+
+    for i, payment, unit in accepted:
+        results[i] = {"status": 201, "payment_id": payment.id, "unit_id": unit.id}
+    return results
+
+
+def sell_units_batch(user_id, ids_unitdibeli):
+    """
+    Sells many UnitDibeli of `user_id` with one lookup and one delete.
+    Returns one result per id, each with its own HTTP-like status.
+    """
+    results = [None] * len(ids_unitdibeli)
+    ids = set()
+    for i, id_unitdibeli in enumerate(ids_unitdibeli):
+        try:
+            ids.add(int(id_unitdibeli))
+        except (TypeError, ValueError):
+            results[i] = {"status": 400, "error": "Invalid id_unitdibeli"}
+    units = UnitDibeli.objects.in_bulk(ids)
+
+    sold = set()
+    for i, id_unitdibeli in enumerate(ids_unitdibeli):
+        if results[i]:
+            continue
+        unit = units.get(int(id_unitdibeli))
+        if unit is None or int(id_unitdibeli) in sold:
+            results[i] = {"status": 404, "error": "UnitDibeli not found"}
+        elif str(user_id) != str(unit.user_id):
+            results[i] = {"status": 403, "error": "You are not authorized to delete this unit"}
+        else:
+            sold.add(unit.id)
+            results[i] = {"status": 200, "id_unitdibeli": unit.id}
+
+    with transaction.atomic():
+        # Re-read under lock, a concurrent sell may have removed some already
+        removed = list(UnitDibeli.objects.select_for_update().filter(id__in=sold, user_id=user_id))
+        UnitDibeli.objects.filter(id__in=[unit.id for unit in removed]).delete()
+        record_sells(removed)
+
+    lost = sold - {unit.id for unit in removed}
+    for i, result in enumerate(results):
+        if result.get("id_unitdibeli") in lost:
+            results[i] = {"status": 404, "error": "UnitDibeli not found"}
+    return results
+
+
+class LocalOrderTransport:
+    """Processes orders in this process, no HTTP round-trip."""
+
+    def purchase(self, request, id_reksadana, nominal):
+        return purchase_units(request.user_id, id_reksadana, nominal)
+
+    def sell(self, request, id_unitdibeli):
+        return sell_unit(request.user_id, id_unitdibeli)
+
+    async def apurchase(self, request, id_reksadana, nominal):
+        return await apurchase_units(request.user_id, id_reksadana, nominal)
+
+    async def asell(self, request, id_unitdibeli):
+        return await asell_unit(request.user_id, id_unitdibeli)
+
+
+class HttpOrderTransport:
+    """
+    Sends orders to a payment processor over HTTP, with the same payloads as
+    the simulated third party endpoints (/dashboard/process-payment/ and
+    /portfolio/process-sell/), through the 'orders' upstream client.
+    """
+
+    def headers(self, request):
+        return {
+            "Authorization": request.headers.get("Authorization"),
+            "Content-Type": "application/json"
+        }
+
+    def post(self, request, path, data):
+        response = get_client("orders").post(path, json=data, headers=self.headers(request))
+        return response.json(), response.status_code
+
+    async def apost(self, request, path, data):
+        response = await get_async_client("orders").post(path, json=data, headers=self.headers(request))
+        return response.json(), response.status_code
+
+    def purchase_payload(self, id_reksadana, nominal):
+        return {"id_reksadana": id_reksadana, "nominal": encode_value(nominal)}
+
+    def purchase(self, request, id_reksadana, nominal):
+        return self.post(request, "/dashboard/process-payment/", self.purchase_payload(id_reksadana, nominal))
+
+    def sell(self, request, id_unitdibeli):
+        return self.post(request, "/portfolio/process-sell/", {"id_unitdibeli": id_unitdibeli})
+
+    async def apurchase(self, request, id_reksadana, nominal):
+        return await self.apost(request, "/dashboard/process-payment/", self.purchase_payload(id_reksadana, nominal))
+
+    async def asell(self, request, id_unitdibeli):
+        return await self.apost(request, "/portfolio/process-sell/", {"id_unitdibeli": id_unitdibeli})
+
+
+def get_order_transport():
+    if settings.ORDER_TRANSPORT == "http":
+        return HttpOrderTransport()
+    return LocalOrderTransport()
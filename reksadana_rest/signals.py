@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogue import invalidate_catalogue_on_commit
+from .models import Reksadana
+
+
+@receiver([post_save, post_delete], sender=Reksadana)
+def reksadana_changed(sender, **kwargs):
+    invalidate_catalogue_on_commit()
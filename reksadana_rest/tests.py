@@ -1,3 +1,975 @@
-from django.test import TestCase
+"""
+Query plan and query count regression tests for the endpoints.
 
-# Create your tests here.
+Every endpoint is requested against a small fixture and each SELECT, UPDATE
+and DELETE it runs is EXPLAINed. A plan that walks a whole table, other than
+the small lookup tables, or that sorts rows in a temporary B-tree instead of
+reading them in index order fails, and so does any change in the number of
+queries, which is how N+1 loops show up. The plans are SQLite's, run the
+suite with the default DATABASE_URL:
+
+    python manage.py test reksadana_rest
+"""
+import datetime
+import io
+import json
+import re
+import uuid
+from contextlib import ExitStack
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections
+from django.db.models import Count, F
+from django.test import (
+    AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.html import escape
+
+from . import catalogue, history
+from .history import (
+    HISTORY_LEASE_TTL, HISTORY_WAIT_POLL, HISTORY_WAIT_TIMEOUT, backfill_fund_history, backfill_history, query_history,
+    refresh_latest,
+)
+from .locks import acquire_lease, release_lease
+from .management.commands.advance_history import LOCK_NAME as ADVANCE_HISTORY_LOCK
+from .rollups import rebuild_candles, update_candles
+from .encoders import HISTORY_FORMATS, decode_binary, encode_binary, encode_columnar
+from .search import SEARCH_PAGE_SIZE, catalogue_page, find_reksadana
+from .services import record_purchase
+from .holdings import rebuild_holdings
+from .procedural import CHECKPOINT_INTERVAL, current_hour, refresh_procedural_latest, walk
+from .views import delete_unit_dibeli_by_id
+from .models import (
+    Bank, CandleReksadana, CatalogueVersion, CategoryReksadana, CheckpointReksadana, HistoryReksadana, Holding, Lease,
+    Payment, Reksadana, UnitDibeli,
+)
+from tibib.crypto import decode_value, decrypt_many, encode_value, encrypt_many
+from tibib.routers import PIN_COOKIE, REPLICA, PrimaryReplicaRouter, end_request, read_from_replica, start_request
+from tibib.testing import ASYNC_URLCONF, bearer
+
+# Small reference tables, reading them whole is fine
+LOOKUP_TABLES = {"reksadana_rest_bank", "reksadana_rest_categoryreksadana"}
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+FUNDS = 6
+HISTORY_DAYS = 45
+
+
+def plan_problems(sql, allowed_scans=(), allow_sort=False):
+    """
+    Full table scans and temporary sorts in the SQLite plan of `sql`, as
+    readable strings. Walking an index in order is fine when the statement
+    stops at a LIMIT. `allow_sort` is for orders no index can hold, e.g.
+    computed buckets, applied to rows an index already narrowed down.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        details = [row[-1] for row in cursor.fetchall()]
+
+    problems = []
+    for detail in details:
+        scan = re.match(r"SCAN (\w+)( USING (COVERING )?INDEX)?", detail)
+        if scan and scan.group(1) not in LOOKUP_TABLES and scan.group(1) not in allowed_scans:
+            if not (scan.group(2) and re.search(r"\bLIMIT\b", sql)):
+                problems.append(detail)
+        elif detail.startswith("USE TEMP B-TREE") and not allow_sort:
+            problems.append(detail)
+    return problems
+
+
+class EndpointQueryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = [CategoryReksadana.objects.create(name=f"Kategori {i}") for i in range(3)]
+        banks = [Bank.objects.create(name=f"Bank {i}") for i in range(3)]
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        cls.funds = [
+            Reksadana.objects.create(
+                name=f"Reksadana {i}",
+                category=categories[i % 3],
+                kustodian=banks[i % 3],
+                penampung=banks[(i + 1) % 3],
+                nav=100 + i,
+                aum=1000 + i,
+                tingkat_resiko=Reksadana.TINGKAT_RESIKO_CHOICE[i % 3][0],
+                latest_date=now - datetime.timedelta(days=HISTORY_DAYS),
+            )
+            for i in range(FUNDS)
+        ]
+        backfill_history(now=now)
+        cls.fund = cls.funds[0]
+        cls.category, cls.bank = categories[0], banks[0]
+
+        # Someone else's portfolio, so user lookups have rows to skip
+        cls.user_id, other_id = uuid.uuid4(), uuid.uuid4()
+        for user_id in (cls.user_id, other_id):
+            for fund in cls.funds:
+                for _ in range(2):
+                    Payment.objects.create(user_id=user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=now)
+                    UnitDibeli.objects.create(
+                        user_id=user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=now, nav_pembelian=100,
+                    )
+        rebuild_holdings()
+
+    def setUp(self):
+        # Built on first use, the catalogue request then always reads the table
+        catalogue._entry = catalogue._checked_at = None
+        self.token = bearer(self.user_id)
+        self.client = Client(headers={"Authorization": self.token})
+
+    def request(self, method, path, body=None):
+        """The response and the SQL of every query it ran."""
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.databases]
+            if method == "post":
+                response = self.client.post(path, body, content_type="application/json")
+            else:
+                response = self.client.get(path)
+            if response.streaming:
+                # The body's queries run while it is read
+                response.streamed = b"".join(response.streaming_content)
+        return response, [query["sql"] for queries in captured for query in queries]
+
+    def assertQueries(self, method, path, queries, body=None, status=200, allowed_scans=(), allow_sort=False):
+        response, executed = self.request(method, path, body)
+        self.assertEqual(response.status_code, status, path)
+        self.assertEqual(
+            len(executed), queries,
+            f"{method.upper()} {path} ran {len(executed)} queries instead of {queries}:\n" + "\n".join(executed),
+        )
+        if connection.vendor == "sqlite":
+            for sql in executed:
+                if sql.lstrip().upper().startswith(EXPLAINED):
+                    problems = plan_problems(sql, allowed_scans, allow_sort)
+                    self.assertFalse(problems, f"{method.upper()} {path}:\n{sql}\n" + "\n".join(problems))
+        return response
+
+
+class ReksadanaEndpointQueryTests(EndpointQueryTestCase):
+    def test_catalogue(self):
+        # The whole catalogue is the point, it is then cached per version
+        self.assertQueries("get", "/reksadana/get-all-reksadana/", 2, allowed_scans={"reksadana_rest_reksadana"})
+        self.assertQueries("get", "/reksadana/get-all-reksadana/", 0)
+        with override_settings(CATALOGUE_RECHECK_SECONDS=0):
+            self.assertQueries("get", "/reksadana/get-all-reksadana/", 1)
+
+    def test_catalogue_edits_from_other_processes(self):
+        before = len(catalogue.get_catalogue())
+        # Another worker renames a fund and bumps the version in the database,
+        # twice at once: both increments count
+        Reksadana.objects.filter(pk=self.fund.pk).update(name="Renamed")
+        version = catalogue.catalogue_version()
+        CatalogueVersion.objects.filter(pk=1).update(version=F("version") + 1)
+        CatalogueVersion.objects.filter(pk=1).update(version=F("version") + 1)
+        self.assertEqual(catalogue.catalogue_version(), version + 2)
+
+        # Seen here once CATALOGUE_RECHECK_SECONDS have passed
+        names = lambda: {row["name"] for row in catalogue.get_catalogue()}
+        with override_settings(CATALOGUE_RECHECK_SECONDS=3600):
+            self.assertNotIn("Renamed", names())
+        with override_settings(CATALOGUE_RECHECK_SECONDS=0):
+            self.assertIn("Renamed", names())
+        self.assertEqual(len(catalogue.get_catalogue()), before)
+
+        # Edits made by this process are seen straight away
+        catalogue.invalidate_catalogue()
+        Reksadana.objects.filter(pk=self.fund.pk).update(name="Renamed again")
+        catalogue.invalidate_catalogue()
+        with override_settings(CATALOGUE_RECHECK_SECONDS=3600):
+            self.assertIn("Renamed again", names())
+
+    def test_catalogue_without_its_version_row(self):
+        # e.g. after a flush, the first invalidation recreates the row
+        names = lambda: {row["name"] for row in catalogue.get_catalogue()}
+        CatalogueVersion.objects.all().delete()
+        self.assertEqual(catalogue.catalogue_version(), 0)
+        self.assertNotIn("Renamed", names())
+        Reksadana.objects.filter(pk=self.fund.pk).update(name="Renamed")
+        catalogue.invalidate_catalogue()
+        self.assertGreater(catalogue.catalogue_version(), 0)
+        with override_settings(CATALOGUE_RECHECK_SECONDS=0):
+            self.assertIn("Renamed", names())
+
+    def test_unchanged_snapshot_keeps_the_catalogue(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            refresh_latest(self.funds)
+        self.assertEqual(callbacks, [])
+
+        HistoryReksadana.objects.create(
+            id_reksadana=self.fund, date=timezone.now() + datetime.timedelta(hours=1), nav=123456, aum=654321,
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            refresh_latest(self.funds)
+        self.assertEqual(len(callbacks), 1)
+        self.fund.refresh_from_db()
+        self.assertEqual((self.fund.latest_nav, self.fund.latest_aum), (123456, 654321))
+
+    def test_search(self):
+        for filters in ["", f"category={self.category.pk}", "tingkat_resiko=Moderat",
+                        f"kustodian={self.bank.pk}", "name=Reksadana%201"]:
+            for sort in ["name", "-name", "nav", "-nav", "aum", "-aum"]:
+                # A name prefix sorted by something else sorts the funds
+                # the name index found, there is no index for both
+                allow_sort = filters.startswith("name=") and not sort.endswith("name")
+                path = f"/reksadana/search-reksadana/?{filters}&sort={sort}&limit=1"
+                response = self.assertQueries("get", path, 1, allow_sort=allow_sort)
+                self.assertQueries("get", f"{path}&cursor={response['X-Next-Cursor']}", 1, allow_sort=allow_sort)
+
+    def check_user_lookups(self, funds_held):
+        self.assertQueries("get", "/reksadana/get-payment-by-user/", 1)
+        self.assertQueries("get", "/reksadana/get-unitdibeli-by-user/", 1)
+        response = self.assertQueries("get", "/reksadana/get-holdings-by-user/", 1)
+        self.assertEqual(len(response.json()), funds_held)
+        # Sorting one user's holdings by fund name
+        response = self.assertQueries("get", "/reksadana/get-portfolio-valuation/", 1, allow_sort=True)
+        self.assertEqual(len(response.json()["holdings"]), funds_held)
+
+    def test_user_lookups(self):
+        self.check_user_lookups(FUNDS)
+
+    def test_user_lookups_do_not_grow_with_the_portfolio(self):
+        fund = Reksadana.objects.create(
+            name="Reksadana baru", category=self.category, kustodian=self.bank, penampung=self.bank, nav=100, aum=1000,
+        )
+        now = timezone.now()
+        UnitDibeli.objects.create(user_id=self.user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=now, nav_pembelian=100)
+        Payment.objects.create(user_id=self.user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=now)
+        rebuild_holdings([self.user_id])
+        self.check_user_lookups(FUNDS + 1)
+
+    def test_history(self):
+        fund = self.fund.pk
+        self.assertQueries("get", f"/reksadana/get-reksadana-history/{fund}/?limit=50", 3)
+        response = self.assertQueries("get", f"/reksadana/get-reksadana-history/{fund}/?limit=50&format=columnar", 3)
+        self.assertQueries(
+            "get", f"/reksadana/get-reksadana-history/{fund}/?limit=50&cursor={response['X-Next-Cursor']}", 3,
+        )
+        start = (timezone.now() - datetime.timedelta(days=7)).date().isoformat()
+        self.assertQueries("get", f"/reksadana/get-reksadana-history/{fund}/?from={start}", 3)
+        for resolution in ["daily", "weekly"]:
+            self.assertQueries(
+                "get", f"/reksadana/get-reksadana-history/{fund}/?resolution={resolution}", 2, allow_sort=True,
+            )
+        # Plus the bounds of the stored history to pick the resolution from
+        self.assertQueries(
+            "get", f"/reksadana/get-reksadana-history/{fund}/?max_points=100&from={start}", 3, allow_sort=True,
+        )
+
+    def test_history_formats_agree(self):
+        empty = Reksadana.objects.create(
+            name="Tanpa Riwayat", category=self.category, kustodian=self.bank, penampung=self.bank, nav=100, aum=1000,
+        )
+        for fund in [self.fund, empty]:
+            path = f"/reksadana/get-reksadana-history/{fund.pk}/?limit=50"
+            bodies = {}
+            for encoding in ["json", "columnar", "binary"]:
+                response = self.client.get(f"{path}&format={encoding}")
+                self.assertEqual(response["Content-Type"], HISTORY_FORMATS[encoding])
+                bodies[encoding] = b"".join(response.streaming_content) if response.streaming else response.content
+            rows = json.loads(bodies["json"])
+            self.assertEqual(len(rows), 50 if fund == self.fund else 0)
+            columns = {
+                "date": [int(datetime.datetime.fromisoformat(row["date"]).timestamp()) for row in rows],
+                "nav": [row["nav"] for row in rows],
+                "aum": [row["aum"] for row in rows],
+            }
+            self.assertEqual(json.loads(bodies["columnar"]), columns)
+            self.assertEqual(dict(zip(["date", "nav", "aum"], decode_binary(bodies["binary"]))), columns)
+
+    def test_history_without_parameters_is_the_whole_series(self):
+        response = self.assertQueries("get", f"/reksadana/get-reksadana-history/{self.fund.pk}/", 2)
+        stored = HistoryReksadana.objects.filter(id_reksadana=self.fund).count()
+        self.assertGreater(stored, 1000)
+        self.assertEqual(len(json.loads(response.streamed)), stored)
+        self.assertNotIn("X-Next-Cursor", response)
+
+    def test_history_of_an_unknown_fund(self):
+        self.assertQueries("get", f"/reksadana/get-reksadana-history/{uuid.uuid4()}/", 1, status=404)
+
+    def test_history_max_points_below_the_weekly_buckets(self):
+        response = self.assertQueries(
+            "get", f"/reksadana/get-reksadana-history/{self.fund.pk}/?max_points=2", 2, status=400,
+        )
+        self.assertIn("weekly", response.json()["error"])
+        ids = ",".join(str(fund.pk) for fund in self.funds)
+        self.assertQueries("get", f"/reksadana/get-multi-reksadana-history/?ids={ids}&max_points=2", 0, status=400)
+
+    def test_multi_history(self):
+        ids = ",".join(str(fund.pk) for fund in self.funds)
+        for resolution in ["hourly", "daily", "weekly"]:
+            response = self.assertQueries(
+                "get", f"/reksadana/get-multi-reksadana-history/?ids={ids}&resolution={resolution}", 2,
+                allow_sort=True,
+            )
+            self.assertEqual(len(response.json()["series"]), FUNDS)
+
+    def test_candles(self):
+        fund = self.fund.pk
+        response = self.assertQueries("get", f"/reksadana/get-reksadana-candles/{fund}/?limit=10", 2)
+        self.assertQueries(
+            "get", f"/reksadana/get-reksadana-candles/{fund}/?limit=10&cursor={response['X-Next-Cursor']}", 2,
+        )
+        self.assertQueries("get", f"/reksadana/get-reksadana-candles/{fund}/?period=monthly", 2)
+
+    def test_create_reksadana(self):
+        body = {
+            "name": "Reksadana baru", "category_id": self.category.pk, "kustodian_id": self.bank.pk,
+            "penampung_id": self.bank.pk, "nav": 100, "aum": 1000,
+        }
+        self.assertQueries("post", "/reksadana/create-reksadana/", 4, body, status=201)
+
+    def test_create_payment_and_unit(self):
+        body = {"id_reksadana": str(self.fund.pk), "nominal": encode_value(10000)}
+        self.assertQueries("post", "/reksadana/create-payment/", 2, body, status=201)
+        self.assertQueries("post", "/reksadana/create-unitdibeli/", 5, body, status=201)
+
+    def test_create_payment_and_unit_with_a_bad_nominal(self):
+        for nominal in [encode_value("banyak"), encode_value(0), encode_value(-10000), "zz", None]:
+            body = {"id_reksadana": str(self.fund.pk), "nominal": nominal}
+            self.assertQueries("post", "/reksadana/create-payment/", 0, body, status=400)
+            self.assertQueries("post", "/reksadana/create-unitdibeli/", 0, body, status=400)
+
+    def test_valuation_of_procedural_funds(self):
+        origin = timezone.now() - datetime.timedelta(days=30)
+        funds = [
+            Reksadana.objects.create(
+                name=f"Procedural {i}", category=self.category, kustodian=self.bank, penampung=self.bank,
+                nav=100, aum=1000, history_origin=origin,
+            )
+            for i in range(3)
+        ]
+        refresh_procedural_latest(funds)
+        for fund in funds:
+            UnitDibeli.objects.create(
+                user_id=self.user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=origin, nav_pembelian=100,
+            )
+        rebuild_holdings([self.user_id])
+        # The holdings, the procedural funds and then all their checkpoints,
+        # nothing per fund
+        response = self.assertQueries("get", "/reksadana/get-portfolio-valuation/", 3, allow_sort=True)
+        holdings = response.json()["holdings"]
+        self.assertEqual(len(holdings), FUNDS + len(funds))
+        navs = {holding["id_reksadana"]: holding["nav"] for holding in holdings}
+        for fund in funds:
+            self.assertEqual(navs[str(fund.pk)], int(walk(fund, current_hour(fund), current_hour(fund))[0][1]))
+
+    def test_batch_purchase(self):
+        orders = [{"id_reksadana": str(fund.pk), "nominal": encode_value(10000)} for fund in self.funds]
+        # Holdings are updated with one statement per fund the batch touches
+        response = self.assertQueries("post", "/reksadana/batch-purchase/", 5 + FUNDS, {"orders": orders})
+        self.assertEqual([result["status"] for result in response.json()["results"]], [201] * FUNDS)
+
+    def test_batch_purchase_with_bad_nominals(self):
+        nominals = [encode_value(0), encode_value(-10000), encode_value("banyak"), "zz", encode_value(10000)]
+        orders = [{"id_reksadana": str(self.fund.pk), "nominal": nominal} for nominal in nominals]
+        payments = Payment.objects.count()
+        response = self.client.post("/reksadana/batch-purchase/", {"orders": orders}, content_type="application/json")
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [400, 400, 400, 400, 201])
+        self.assertEqual(Payment.objects.count(), payments + 1)
+        self.assertEqual(Payment.objects.get(pk=results[-1]["payment_id"]).nominal, 10000)
+
+    def test_batch_sell(self):
+        # Every unit of two funds, whose holdings are updated and then dropped
+        units = UnitDibeli.objects.filter(user_id=self.user_id, id_reksadana__in=self.funds[:2])
+        ids = list(units.values_list("id", flat=True))
+        response = self.assertQueries("post", "/reksadana/batch-sell/", 5 + 2 * 2, {"ids": ids})
+        self.assertEqual([result["status"] for result in response.json()["results"]], [200] * len(ids))
+
+
+class DashboardEndpointQueryTests(EndpointQueryTestCase):
+    def test_index(self):
+        # The unfiltered listing pages the cached catalogue
+        self.assertQueries("get", "/dashboard/", 2, allowed_scans={"reksadana_rest_reksadana"})
+        self.assertQueries("get", "/dashboard/?sort=-name", 0)
+        self.assertQueries("get", f"/dashboard/?category={self.category.pk}&sort=-nav", 1)
+
+    def test_process_payment(self):
+        body = {"id_reksadana": str(self.fund.pk), "nominal": encode_value(10000)}
+        # The fund, then a transaction writing the payment, unit and holding
+        self.assertQueries("post", "/dashboard/process-payment/", 1 + 5, body, status=201)
+
+    def test_purchase_prices_the_loaded_fund(self):
+        # Savepoint, payment, unit, holding, release: the fund is not read again
+        with self.assertNumQueries(5):
+            data, status = record_purchase(self.user_id, self.fund, 10000)
+        self.assertEqual(status, 201)
+        self.assertEqual(UnitDibeli.objects.get(pk=data["unit_id"]).nav_pembelian, self.fund.latest_nav)
+
+    def test_catalogue_pages(self):
+        for sort in ("name", "-name"):
+            cursor, seen = None, []
+            while True:
+                page = catalogue_page(sort=sort, cursor=cursor, limit=2)
+                self.assertEqual(page, find_reksadana(sort=sort, cursor=cursor, limit=2))
+                seen += page[0]
+                cursor = page[1]
+                if cursor is None:
+                    break
+            self.assertEqual(len(seen), FUNDS)
+
+
+class AsyncStreamingTests(EndpointQueryTestCase):
+    async def test_user_rows_stream_under_asgi(self):
+        for path in ["/reksadana/get-payment-by-user/", "/reksadana/get-unitdibeli-by-user/"]:
+            with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+                response = await AsyncClient().get(path, headers={"Authorization": self.token})
+                # An async iterator, ASGI would read a sync one whole before sending
+                self.assertTrue(response.is_async, path)
+                body = b"".join([chunk async for chunk in response.streaming_content])
+            sync = await sync_to_async(lambda: b"".join(self.client.get(path).streaming_content))()
+            self.assertEqual(json.loads(body), json.loads(sync), path)
+            self.assertEqual(len(json.loads(body)), FUNDS * 2)
+
+
+@override_settings(READ_FROM_REPLICA=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The replica is a test mirror of the primary, so both see the same rows
+    and only the connection a query ran on tells them apart. A TestCase would
+    keep its rows in a transaction the mirror connection can't read.
+    """
+    databases = {"default", REPLICA}
+
+    def setUp(self):
+        catalogue._entry = catalogue._checked_at = None
+        category = CategoryReksadana.objects.create(name="Kategori")
+        bank = Bank.objects.create(name="Bank")
+        self.fund = Reksadana.objects.create(
+            name="Reksadana", category=category, kustodian=bank, penampung=bank, nav=100, aum=1000,
+            tingkat_resiko="Moderat",
+        )
+        self.user_id = uuid.uuid4()
+        for _ in range(3):
+            Payment.objects.create(user_id=self.user_id, id_reksadana=self.fund, nominal=10000, waktu_pembelian=timezone.now())
+            UnitDibeli.objects.create(
+                user_id=self.user_id, id_reksadana=self.fund, nominal=10000, waktu_pembelian=timezone.now(),
+                nav_pembelian=100,
+            )
+        rebuild_holdings()
+        self.headers = {"Authorization": bearer(self.user_id)}
+        self.client = Client(headers=self.headers)
+
+    def get(self, path):
+        """The response, its streamed body and the queries it ran on (primary, replica)."""
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get(path)
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, body, (len(primary), len(replica))
+
+    def test_reads_go_to_the_replica(self):
+        response, body, (primary, replica) = self.get("/reksadana/get-holdings-by-user/")
+        self.assertEqual(len(json.loads(body)), 1)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        # Views without @read_from_replica stay on the primary
+        response, body, (primary, replica) = self.get("/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+
+    def test_streamed_reads_stay_on_the_replica(self):
+        for path in ["/reksadana/get-payment-by-user/", "/reksadana/get-unitdibeli-by-user/"]:
+            response, body, (primary, replica) = self.get(path)
+            self.assertTrue(response.streaming, path)
+            self.assertEqual(len(json.loads(body)), 3, path)
+            self.assertEqual((primary, replica), (0, 1), path)
+
+    def test_async_streamed_reads_stay_on_the_replica(self):
+        async def read(path):
+            response = await AsyncClient().get(path, headers=self.headers)
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            for path in ["/reksadana/get-payment-by-user/", "/reksadana/get-unitdibeli-by-user/"]:
+                with CaptureQueriesContext(connections["default"]) as primary, \
+                        CaptureQueriesContext(connections[REPLICA]) as replica:
+                    body = async_to_sync(read)(path)
+                self.assertEqual(len(json.loads(body)), 3, path)
+                self.assertEqual((len(primary), len(replica)), (0, 1), path)
+
+    def test_reads_after_a_write_are_pinned_to_the_primary(self):
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.post(
+                "/dashboard/process-payment/",
+                {"id_reksadana": str(self.fund.pk), "nominal": encode_value(10000)},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(replica), 0)
+        self.assertEqual(int(response.cookies[PIN_COOKIE]["max-age"]), settings.REPLICA_PIN_SECONDS)
+
+        response, body, (primary, replica) = self.get("/reksadana/get-unitdibeli-by-user/")
+        self.assertEqual(len(json.loads(body)), 4)
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+        # Back on the replica once the pin expires
+        del self.client.cookies[PIN_COOKIE]
+        response, body, (primary, replica) = self.get("/reksadana/get-unitdibeli-by-user/")
+        self.assertEqual((primary, replica), (0, 1))
+
+    def test_reads_after_a_write_in_the_same_request(self):
+        router = PrimaryReplicaRouter()
+        read = read_from_replica(lambda request: router.db_for_read(Payment))
+        token = start_request()
+        try:
+            # Building and assigning objects asks for a write alias, nothing is written
+            payment = Payment(user_id=self.user_id, nominal=10000, waktu_pembelian=timezone.now())
+            payment.id_reksadana = self.fund
+            self.assertEqual(read(None), REPLICA)
+            payment.save()
+            self.assertEqual(read(None), "default")
+        finally:
+            self.assertTrue(end_request(token))
+
+        token = start_request()
+        try:
+            Payment.objects.filter(pk=payment.pk).update(nominal=20000)
+            self.assertEqual(read(None), "default")
+        finally:
+            self.assertTrue(end_request(token))
+        # Outside a request, e.g. management commands
+        self.assertEqual(router.db_for_read(Payment), "default")
+
+    @override_settings(READ_FROM_REPLICA=False)
+    def test_without_a_replica(self):
+        response, body, (primary, replica) = self.get("/reksadana/get-holdings-by-user/")
+        self.assertEqual(len(json.loads(body)), 1)
+        self.assertEqual(replica, 0)
+
+
+class PortfolioEndpointQueryTests(EndpointQueryTestCase):
+    def test_index(self):
+        # Holdings are read once and valued as read
+        response = self.assertQueries("get", "/portfolio/", 1)
+        holdings = response.context["holdings"]
+        self.assertEqual(len(holdings), FUNDS)
+        latest = UnitDibeli.objects.filter(user_id=self.user_id, id_reksadana=self.fund).latest("id")
+        holding = next(holding for holding in holdings if holding["id_reksadana"] == self.fund.pk)
+        self.assertEqual(holding["latest_unit_id"], latest.pk)
+        self.fund.refresh_from_db()
+        self.assertEqual(holding["market_value"], round(holding["total_units"] * self.fund.latest_nav, 2))
+        self.assertContains(response, f'name="id_unitdibeli" value="{latest.pk}"')
+
+    def test_process_sell(self):
+        unit = UnitDibeli.objects.filter(user_id=self.user_id).first()
+        self.assertQueries("post", "/portfolio/process-sell/", 6, {"id_unitdibeli": unit.pk}, status=201)
+
+
+class DashboardPagingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = CategoryReksadana.objects.create(name="Kategori")
+        bank = Bank.objects.create(name="Bank")
+        Reksadana.objects.bulk_create(
+            Reksadana(
+                name=f"Reksadana {i:03}", category=category, kustodian=bank, penampung=bank, nav=100, aum=1000,
+                latest_nav=100 + i % 7, latest_aum=1000 - i % 5, tingkat_resiko=Reksadana.TINGKAT_RESIKO_CHOICE[i % 3][0],
+            )
+            for i in range(SEARCH_PAGE_SIZE * 3 + 1)
+        )
+        # No history and not bulk inserted, its snapshot is the initial nav/aum
+        Reksadana.objects.create(
+            name="Tanpa Riwayat", category=category, kustodian=bank, penampung=bank, nav=103, aum=998,
+        )
+
+    def setUp(self):
+        catalogue._entry = catalogue._checked_at = None
+        self.client = Client(headers={"Authorization": bearer()})
+
+    def read_pages(self, query):
+        """Names on every page, following the rendered next-page links."""
+        names, path = [], f"/dashboard/?{query}"
+        while True:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            names += [row["name"] for row in response.context["reksadanas"]]
+            if response.context["next_cursor"] is None:
+                self.assertNotContains(response, "Next Page")
+                return names
+            self.assertContains(response, f'href="?{escape(response.context["next_query"])}"')
+            path = "/dashboard/?" + response.context["next_query"]
+
+    def test_pages(self):
+        names = sorted(Reksadana.objects.values_list("name", flat=True))
+        self.assertEqual(self.read_pages(""), names)
+        self.assertEqual(self.read_pages("sort=-name"), names[::-1])
+        moderat = sorted(Reksadana.objects.filter(tingkat_resiko="Moderat").values_list("name", flat=True))
+        self.assertEqual(self.read_pages("tingkat_resiko=Moderat&sort=-name"), moderat[::-1])
+
+    def test_pages_by_snapshot(self):
+        for sort, column in [("nav", "latest_nav"), ("-aum", "latest_aum")]:
+            with self.subTest(sort=sort):
+                order = [column, "id_reksadana"] if sort[0] != "-" else [f"-{column}", "-id_reksadana"]
+                names = list(Reksadana.objects.order_by(*order).values_list("name", flat=True))
+                self.assertIn("Tanpa Riwayat", names[SEARCH_PAGE_SIZE:])
+                self.assertEqual(self.read_pages(f"sort={sort}"), names)
+
+    def test_bulk_insert_needs_a_snapshot(self):
+        fund = Reksadana.objects.first()
+        fund.pk, fund.name, fund.latest_nav = uuid.uuid4(), "Tanpa Snapshot", None
+        with self.assertRaises(IntegrityError):
+            Reksadana.objects.bulk_create([fund])
+
+
+class ProceduralHistoryTests(TestCase):
+    """The computed series must not depend on how or when it is read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bank = Bank.objects.create(name="Bank")
+        cls.category = CategoryReksadana.objects.create(name="Kategori")
+        cls.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        cls.origin = cls.now - datetime.timedelta(days=60)
+        cls.fund = cls.make_fund(uuid.uuid4())
+
+    @classmethod
+    def make_fund(cls, pk):
+        return Reksadana.objects.create(
+            id_reksadana=pk, name=f"Procedural {pk}", category=cls.category, kustodian=cls.bank,
+            penampung=cls.bank, nav=100, aum=1000, history_origin=cls.origin,
+        )
+
+    def read(self, resolution="hourly", start=None, end=None):
+        return query_history(self.fund, start=start, end=end or self.now, resolution=resolution)
+
+    def test_same_fund_and_range_give_the_same_points(self):
+        first = self.read()
+        self.assertEqual(self.read(), first)
+        # The fund id is the seed, a fund recreated under it walks the same series
+        pk = self.fund.pk
+        self.fund.delete()
+        self.fund = self.make_fund(pk)
+        self.assertEqual(self.read(), first)
+        self.assertEqual(len(first), 60 * 24 + 1)
+
+    def test_checkpoints_do_not_change_the_series(self):
+        middle = self.now - datetime.timedelta(days=20)
+        checkpoints = CheckpointReksadana.objects.filter(id_reksadana=self.fund)
+        self.assertFalse(checkpoints.exists())
+        cold = self.read(start=middle)
+        # Replayed from the origin, reads store nothing
+        self.assertFalse(checkpoints.exists())
+        # The scheduler stores the checkpoints the series passed
+        refresh_procedural_latest([self.fund], now=self.now)
+        self.assertEqual(checkpoints.count(), 60 * 24 // CHECKPOINT_INTERVAL)
+        self.assertEqual(self.read(start=middle), cold)
+        self.assertEqual([row for row in self.read() if row["date"] >= middle], cold)
+
+        # Only the older checkpoints kept, reads start from wherever they stop
+        checkpoints.filter(hour__gt=CHECKPOINT_INTERVAL * 2).delete()
+        self.assertEqual(self.read(start=middle), cold)
+
+    def test_pages_add_up_to_one_read(self):
+        for resolution, limit in [("hourly", 100), ("daily", 7), ("weekly", 3)]:
+            whole = self.read(resolution)
+            pages, after = [], None
+            while True:
+                page = query_history(self.fund, end=self.now, resolution=resolution, after=after, limit=limit)
+                pages.extend(page)
+                if len(page) < limit:
+                    break
+                after = page[-1]["date"]
+            self.assertEqual(pages, whole, resolution)
+
+
+class CryptoTests(SimpleTestCase):
+    def test_round_trip(self):
+        # Up to 10^20 so some values span two AES blocks
+        values = [str(10 ** exponent + 7) for exponent in range(21)]
+        encrypted = encrypt_many(values)
+        self.assertEqual(encrypted, [encode_value(value) for value in values])
+        self.assertEqual(decrypt_many(encrypted), values)
+        self.assertEqual([decode_value(value) for value in encrypted], values)
+
+    def test_undecryptable_values_are_none(self):
+        valid = encode_value(10000)
+        self.assertEqual(decrypt_many(["", "zz", valid[:-2], None, valid]), [None] * 4 + ["10000"])
+        with self.assertRaises(ValueError):
+            decode_value(valid[:-2])
+
+
+class SellRaceTests(TestCase):
+    def test_losing_a_concurrent_sell_is_a_404(self):
+        bank = Bank.objects.create(name="Bank")
+        fund = Reksadana.objects.create(
+            name="Reksadana", category=CategoryReksadana.objects.create(name="Kategori"),
+            kustodian=bank, penampung=bank, nav=100, aum=1000,
+        )
+        user_id = uuid.uuid4()
+        unit = UnitDibeli.objects.create(
+            user_id=user_id, id_reksadana=fund, nominal=10000, waktu_pembelian=timezone.now(), nav_pembelian=100,
+        )
+        rebuild_holdings([user_id])
+        request = RequestFactory().post("/", {"id_unitdibeli": unit.pk}, content_type="application/json")
+        request.user_id = str(user_id)
+
+        # Both requests found the unit, the other one deleted it first
+        UnitDibeli.objects.filter(pk=unit.pk).delete()
+        with mock.patch("reksadana_rest.views.get_object_or_404", return_value=unit):
+            response = delete_unit_dibeli_by_id(request)
+        self.assertEqual(response.status_code, 404)
+        # The ledger still counts the unit once, it is the other sell's to remove
+        self.assertEqual(Holding.objects.get(user_id=user_id).unit_count, 1)
+
+
+class UnsnapshottedHistoryTests(TestCase):
+    """History rows written without refresh_latest(), e.g. by a bulk load."""
+
+    def setUp(self):
+        bank = Bank.objects.create(name="Bank")
+        self.fund = Reksadana.objects.create(
+            name="Reksadana", category=CategoryReksadana.objects.create(name="Kategori"),
+            kustodian=bank, penampung=bank, nav=100, aum=1000,
+        )
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.loaded_until = self.now - datetime.timedelta(hours=10)
+        HistoryReksadana.objects.bulk_create(
+            HistoryReksadana(id_reksadana=self.fund, date=self.loaded_until - datetime.timedelta(hours=i), nav=200, aum=3000)
+            for i in range(24)
+        )
+
+    def test_backfill_continues_from_the_stored_rows(self):
+        self.assertEqual(backfill_history([self.fund], now=self.now), {self.fund.pk: 10})
+        dates = list(HistoryReksadana.objects.filter(id_reksadana=self.fund).order_by("date").values_list("date", flat=True))
+        self.assertEqual(len(dates), 34)
+        self.assertEqual(dates[-1], self.now)
+        self.assertTrue(all(later - earlier == datetime.timedelta(hours=1) for earlier, later in zip(dates, dates[1:])))
+
+    def test_rebuild_candles_refreshes_the_snapshot(self):
+        rebuild_candles([self.fund])
+        self.fund.refresh_from_db()
+        self.assertEqual((self.fund.latest_date, self.fund.latest_nav, self.fund.latest_aum), (self.loaded_until, 200, 3000))
+
+
+class FakeClock:
+    """Stands in for the time module, sleep() moves monotonic() forward."""
+
+    def __init__(self, on_sleep=None):
+        self.now = 0.0
+        self.on_sleep = on_sleep
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.on_sleep:
+            self.on_sleep()
+
+
+class HistoryLeaseTests(TestCase):
+    """backfill_fund_history callers of one fund, the lease decides who generates."""
+
+    def setUp(self):
+        bank = Bank.objects.create(name="Bank")
+        self.fund = Reksadana.objects.create(
+            name="Reksadana", category=CategoryReksadana.objects.create(name="Kategori"),
+            kustodian=bank, penampung=bank, nav=100, aum=1000,
+        )
+        self.now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        HistoryReksadana.objects.bulk_create(
+            HistoryReksadana(id_reksadana=self.fund, date=self.now - datetime.timedelta(hours=10 + i), nav=200, aum=3000)
+            for i in range(24)
+        )
+        refresh_latest([self.fund])
+        self.fund.refresh_from_db()
+        self.lease = f"history:{self.fund.pk}"
+
+    def stored(self):
+        return HistoryReksadana.objects.filter(id_reksadana=self.fund).count()
+
+    def test_overlapping_callers_backfill_once(self):
+        def backfill_while_another_caller_arrives(funds, now):
+            self.assertEqual(backfill_fund_history(self.fund, now=self.now), {})
+            return backfill_history(funds, now=now)
+
+        with mock.patch.object(history, "time", FakeClock()), \
+                mock.patch.object(history, "backfill_history", side_effect=backfill_while_another_caller_arrives) as backfill:
+            self.assertEqual(backfill_fund_history(self.fund, now=self.now), {self.fund.pk: 10})
+        backfill.assert_called_once()
+        self.assertEqual(self.stored(), 34)
+        self.assertFalse(Lease.objects.filter(name=self.lease).exists())
+
+    def test_waiter_reads_the_rows_of_the_holder(self):
+        holder = acquire_lease(self.lease, HISTORY_LEASE_TTL)
+
+        def holder_finishes():
+            if Lease.objects.filter(name=self.lease).exists():
+                backfill_history([self.fund], now=self.now)
+                release_lease(self.lease, holder)
+
+        clock = FakeClock(on_sleep=holder_finishes)
+        with mock.patch.object(history, "time", clock), \
+                mock.patch.object(history, "backfill_history") as backfill:
+            self.assertEqual(backfill_fund_history(self.fund, now=self.now), {})
+        backfill.assert_not_called()
+        # Back as soon as the lease was gone, with the rows in place
+        self.assertEqual(clock.now, HISTORY_WAIT_POLL)
+        self.assertEqual(self.stored(), 34)
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.latest_date, self.now)
+
+    def test_expired_lease_is_taken_over(self):
+        # Its holder crashed before releasing it
+        Lease.objects.create(name=self.lease, owner="crashed", expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(backfill_fund_history(self.fund, now=self.now), {self.fund.pk: 10})
+        self.assertEqual(self.stored(), 34)
+        self.assertFalse(Lease.objects.filter(name=self.lease).exists())
+
+    def test_waiter_gives_up_after_the_timeout(self):
+        holder = acquire_lease(self.lease, HISTORY_LEASE_TTL)
+        clock = FakeClock()
+        with mock.patch.object(history, "time", clock):
+            self.assertEqual(backfill_fund_history(self.fund, now=self.now), {})
+        self.assertGreaterEqual(clock.now, HISTORY_WAIT_TIMEOUT)
+        self.assertLess(clock.now, HISTORY_WAIT_TIMEOUT + HISTORY_WAIT_POLL)
+        self.assertEqual(self.stored(), 24)
+        self.assertEqual(Lease.objects.get(name=self.lease).owner, holder)
+
+
+class AdvanceHistoryTests(TestCase):
+    def setUp(self):
+        bank = Bank.objects.create(name="Bank")
+        category = CategoryReksadana.objects.create(name="Kategori")
+        self.last_date = timezone.now().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=5)
+        self.funds = [
+            Reksadana.objects.create(
+                name=f"Reksadana {i}", category=category, kustodian=bank, penampung=bank, nav=100, aum=1000,
+            )
+            for i in range(3)
+        ]
+        HistoryReksadana.objects.bulk_create(
+            HistoryReksadana(id_reksadana=fund, date=self.last_date, nav=100, aum=1000) for fund in self.funds
+        )
+        refresh_latest(self.funds)
+
+    def tick(self):
+        out = io.StringIO()
+        call_command("advance_history", "--once", "--batch-size=2", stdout=out)
+        return out.getvalue()
+
+    def stored(self):
+        return dict(
+            HistoryReksadana.objects.values_list("id_reksadana").annotate(rows=Count("id")).order_by()
+        )
+
+    def test_tick_advances_each_fund_once(self):
+        self.assertIn("Advanced 3/3 reksadana, created 15 history rows", self.tick())
+        self.assertEqual(self.stored(), {fund.pk: 6 for fund in self.funds})
+        for fund in self.funds:
+            fund.refresh_from_db()
+            self.assertEqual(fund.latest_date, self.last_date + datetime.timedelta(hours=5))
+
+        # Caught up, the next tick has nothing to add
+        self.assertIn("Advanced 0/3 reksadana, created 0 history rows", self.tick())
+        self.assertEqual(self.stored(), {fund.pk: 6 for fund in self.funds})
+        self.assertFalse(Lease.objects.exists())
+
+    def test_tick_without_the_lease_writes_nothing(self):
+        holder = acquire_lease(ADVANCE_HISTORY_LOCK, 600)
+        self.assertIn("Another scheduler holds the lock", self.tick())
+        self.assertEqual(self.stored(), {fund.pk: 1 for fund in self.funds})
+        self.assertEqual(Lease.objects.get(name=ADVANCE_HISTORY_LOCK).owner, holder)
+
+
+class BinaryHistoryTests(SimpleTestCase):
+    def rows(self, count):
+        start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+        return [
+            {"date": start + datetime.timedelta(hours=i), "nav": 100 + i * 0.25, "aum": 1000 - i * 1.5}
+            for i in range(count)
+        ]
+
+    def test_round_trip(self):
+        for count in [0, 1, 24 * 31]:
+            with self.subTest(count=count):
+                rows = self.rows(count)
+                timestamps, navs, aums = decode_binary(encode_binary(rows))
+                self.assertEqual(timestamps, [int(row["date"].timestamp()) for row in rows])
+                self.assertEqual(navs, [row["nav"] for row in rows])
+                self.assertEqual(aums, [row["aum"] for row in rows])
+                # Same values as the columnar encoding
+                self.assertEqual(
+                    json.loads(encode_columnar(rows)), {"date": timestamps, "nav": navs, "aum": aums},
+                )
+
+    def test_first_and_last_points(self):
+        rows = self.rows(100)
+        # A gap, deltas are relative to the previous row
+        rows[-1]["date"] += datetime.timedelta(days=30)
+        timestamps, navs, aums = decode_binary(encode_binary(rows))
+        self.assertEqual((timestamps[0], navs[0], aums[0]), (int(rows[0]["date"].timestamp()), 100, 1000))
+        self.assertEqual(
+            (timestamps[-1], navs[-1], aums[-1]), (int(rows[-1]["date"].timestamp()), rows[-1]["nav"], rows[-1]["aum"]),
+        )
+
+    def test_other_payloads_are_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_binary(b"JSON" + encode_binary(self.rows(2))[4:])
+
+
+class CandleTests(TestCase):
+    OHLC = ["open_nav", "high_nav", "low_nav", "close_nav", "open_aum", "high_aum", "low_aum", "close_aum"]
+
+    def setUp(self):
+        bank = Bank.objects.create(name="Bank")
+        self.fund = Reksadana.objects.create(
+            name="Reksadana", category=CategoryReksadana.objects.create(name="Kategori"),
+            kustodian=bank, penampung=bank, nav=100, aum=1000,
+        )
+
+    def store(self, points):
+        """Stores (local datetime args, nav, aum) points like a backfill and updates their candles."""
+        rows = HistoryReksadana.objects.bulk_create(
+            HistoryReksadana(id_reksadana=self.fund, date=timezone.make_aware(datetime.datetime(*date)), nav=nav, aum=aum)
+            for date, nav, aum in points
+        )
+        update_candles({self.fund.pk: (rows[0].date, rows[-1].date)})
+
+    def candles(self, period):
+        candles = CandleReksadana.objects.filter(id_reksadana=self.fund, period=period).order_by("date")
+        return {
+            timezone.localtime(candle["date"]).date().isoformat(): tuple(candle[field] for field in self.OHLC)
+            for candle in candles.values("date", *self.OHLC)
+        }
+
+    def test_daily_and_monthly_ohlc(self):
+        self.store([
+            ((2026, 1, 30, 22), 100, 1000),
+            ((2026, 1, 30, 23), 90, 1100),
+            ((2026, 1, 31, 0), 95, 1050),
+            ((2026, 1, 31, 5), 120, 900),
+            ((2026, 1, 31, 23), 110, 950),
+            ((2026, 2, 1, 0), 105, 1000),
+        ])
+        self.assertEqual(self.candles("daily"), {
+            "2026-01-30": (100, 100, 90, 90, 1000, 1100, 1000, 1100),
+            "2026-01-31": (95, 120, 95, 110, 1050, 1050, 900, 950),
+            "2026-02-01": (105, 105, 105, 105, 1000, 1000, 1000, 1000),
+        })
+        self.assertEqual(self.candles("monthly"), {
+            "2026-01-01": (100, 120, 90, 110, 1000, 1100, 900, 950),
+            "2026-02-01": (105, 105, 105, 105, 1000, 1000, 1000, 1000),
+        })
+
+        # The next backfill extends the open day and month in place
+        day = CandleReksadana.objects.get(id_reksadana=self.fund, period="daily", date__month=2)
+        self.store([
+            ((2026, 2, 1, 1), 130, 800),
+            ((2026, 2, 1, 2), 101, 1200),
+        ])
+        self.assertEqual(self.candles("daily")["2026-02-01"], (105, 130, 101, 101, 1000, 1200, 800, 1200))
+        self.assertEqual(self.candles("monthly"), {
+            "2026-01-01": (100, 120, 90, 110, 1000, 1100, 900, 950),
+            "2026-02-01": (105, 130, 101, 101, 1000, 1200, 800, 1200),
+        })
+        self.assertEqual(CandleReksadana.objects.get(pk=day.pk).high_nav, 130)
+        self.assertEqual(CandleReksadana.objects.filter(id_reksadana=self.fund).count(), 5)
@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
 
 urlpatterns = [
     path('create-reksadana/',create_reksadana, name="create_reksadana"),
     path('get-all-reksadana/',get_all_reksadana, name="get_all_reksadana"),
+    path('search-reksadana/', search_reksadana, name="search_reksadana"),
     path("create-payment/", create_payment, name="create_payment"),
-    path("get-payment-by-user/", get_payments_by_user, name="get_payments_by_user"),
+    path("get-payment-by-user/", aget_payments_by_user if settings.ASYNC_VIEWS else get_payments_by_user, name="get_payments_by_user"),
     path("create-unitdibeli/", create_unit_dibeli, name="create_unit_dibeli"),
-    path("get-unitdibeli-by-user/", get_units_by_user, name="get_units_by_user"),
-    path('get-reksadana-history/<uuid:id_reksadana>/', get_reksadana_history, name="get_reksadana_history")
+    path("get-unitdibeli-by-user/", aget_units_by_user if settings.ASYNC_VIEWS else get_units_by_user, name="get_units_by_user"),
+    path("get-holdings-by-user/", get_holdings_by_user, name="get_holdings_by_user"),
+    path("get-portfolio-valuation/", get_portfolio_valuation, name="get_portfolio_valuation"),
+    path("batch-purchase/", batch_purchase, name="batch_purchase"),
+    path("batch-sell/", batch_sell, name="batch_sell"),
+    path('get-reksadana-history/<uuid:id_reksadana>/', aget_reksadana_history if settings.ASYNC_VIEWS else get_reksadana_history, name="get_reksadana_history"),
+    path('get-multi-reksadana-history/', get_multi_reksadana_history, name="get_multi_reksadana_history"),
+    path('get-reksadana-candles/<uuid:id_reksadana>/', aget_reksadana_candles if settings.ASYNC_VIEWS else get_reksadana_candles, name="get_reksadana_candles"),
 ]
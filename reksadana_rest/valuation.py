@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from django.db.models import F, OuterRef, Subquery
+
+from .models import Holding, Reksadana, UnitDibeli
+from .procedural import current_points
+
+
+def current_navs(reksadanas):
+    """
+    {id_reksadana: current NAV} of loaded funds: their latest_nav snapshot,
+    or for procedural funds the point computed from their checkpoints, all
+    read in one query.
+    """
+    procedural = current_points([fund for fund in reksadanas if fund.history_origin])
+    return {
+        fund.pk: procedural[fund.pk][1] if fund.history_origin else fund.latest_nav
+        for fund in reksadanas
+    }
+
+
+def current_nav(fund):
+    """The NAV a loaded fund trades at now, see current_navs()."""
+    return current_navs([fund])[fund.pk]
+
+
+def latest_navs(reksadanas):
+    """
+    {id_reksadana: current NAV} for the given funds (instances or primary
+    keys), read again in one query. Use current_navs() for funds already
+    loaded in this request.
+    """
+    ids = [getattr(fund, "pk", fund) for fund in reksadanas]
+    if not ids:
+        return {}
+    return current_navs(list(Reksadana.objects.filter(pk__in=ids)))
+
+
+def allocation(totals, market_value):
+    return {
+        key: {"market_value": round(value, 2), "weight": round(value / market_value, 4) if market_value else 0}
+        for key, value in sorted(totals.items())
+    }
+
+
+def user_holdings(user_id, latest_unit=False):
+    """
+    One row per fund `user_id` holds, read from the Holding ledger with the
+    fund details value_holdings() needs, in one query. With `latest_unit`
+    each row also has `latest_unit_id`, the unit a sell acts on.
+    """
+    holdings = Holding.objects.filter(user_id=user_id).annotate(
+        name=F("id_reksadana__name"),
+        category=F("id_reksadana__category__name"),
+        tingkat_resiko=F("id_reksadana__tingkat_resiko"),
+        history_origin=F("id_reksadana__history_origin"),
+        latest_nav=F("id_reksadana__latest_nav"),
+    )
+    fields = [
+        "id_reksadana", "name", "category", "tingkat_resiko", "history_origin",
+        "latest_nav", "total_nominal", "total_units", "unit_count",
+    ]
+    if latest_unit:
+        latest = UnitDibeli.objects.filter(
+            user_id=OuterRef("user_id"), id_reksadana=OuterRef("id_reksadana")
+        ).order_by("-id").values("id")[:1]
+        holdings = holdings.annotate(latest_unit_id=Subquery(latest))
+        fields.append("latest_unit_id")
+    return list(holdings.values(*fields))
+
+
+def value_portfolio(user_id):
+    """
+    Values every holding of `user_id` at its fund's current NAV.
+
+    Holdings, fund details and each fund's latest NAV snapshot come from a
+    single join over the Holding ledger, so the cost grows with the number of
+    funds held, not with the number of units bought.
+    """
+    return value_holdings(user_holdings(user_id))
+
+
+def value_holdings(holdings):
+    """value_portfolio of rows already read with user_holdings(), by fund name."""
+    holdings = sorted(holdings, key=lambda holding: holding["name"])
+    # Procedural funds are valued at their computed current point
+    procedural_navs = latest_navs([holding["id_reksadana"] for holding in holdings if holding["history_origin"]])
+
+    rows = []
+    by_category = defaultdict(float)
+    by_risk = defaultdict(float)
+    for holding in holdings:
+        holding = dict(holding)
+        nav = holding.pop("latest_nav")
+        if holding.pop("history_origin"):
+            nav = procedural_navs[holding["id_reksadana"]]
+        market_value = holding["total_units"] * nav
+        gain = market_value - holding["total_nominal"]
+        rows.append({
+            **holding,
+            "nav": nav,
+            "market_value": round(market_value, 2),
+            "unrealized_gain": round(gain, 2),
+            "unrealized_gain_pct": round(gain / holding["total_nominal"], 4) if holding["total_nominal"] else 0,
+        })
+        by_category[holding["category"]] += market_value
+        by_risk[holding["tingkat_resiko"]] += market_value
+
+    market_value = sum(by_category.values())
+    cost = sum(row["total_nominal"] for row in rows)
+    return {
+        "holdings": rows,
+        "total_nominal": cost,
+        "market_value": round(market_value, 2),
+        "unrealized_gain": round(market_value - cost, 2),
+        "allocation": {
+            "category": allocation(by_category, market_value),
+            "tingkat_resiko": allocation(by_risk, market_value),
+        },
+    }
@@ -1,32 +1,35 @@
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, get_object_or_404
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from .models import *
+from .history import HISTORY_RESOLUTIONS, pick_resolution, query_aligned_history, query_history, resolution_for_span
+from .catalogue import get_catalogue_payload
+from .holdings import record_purchases
+from .encoders import HISTORY_ENCODERS, HISTORY_FORMATS, astream_json_array, negotiate_format, stream_json_array
+from .rollups import CANDLE_FIELDS
+from .search import SEARCH_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, find_reksadana
+from .services import BATCH_MAX_ORDERS, parse_purchase, purchase_units_batch, remove_unit, sell_units_batch
+from .valuation import current_nav, user_holdings, value_portfolio
+import datetime
 import json
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
-import os
-import base64
-
-AES_KEY = base64.b64decode(os.getenv("AES_KEY"))
-AES_IV = base64.b64decode(os.getenv("AES_IV"))
-
-# Function to decrypt a single value using AES
-def decode_value(encrypted_value):
-    """
-    Decrypts a single value using AES.
-    """
-    cipher = Cipher(algorithms.AES(AES_KEY), modes.CBC(AES_IV), backend=default_backend())
-    decryptor = cipher.decryptor()
-
-    encrypted_bytes = bytes.fromhex(encrypted_value)  # Convert hex string to bytes
-    decrypted_data = decryptor.update(encrypted_bytes) + decryptor.finalize()
-
-    unpadder = padding.PKCS7(128).unpadder()
-    unpadded_data = unpadder.update(decrypted_data) + unpadder.finalize()
-
-    return unpadded_data.decode('utf-8')
+import uuid
+from tibib.crypto import decode_value, decrypt_many
+from tibib.routers import read_from_replica
+
+HISTORY_PAGE_SIZE = 1000
+HISTORY_MAX_PAGE_SIZE = 5000
+HISTORY_MAX_FUNDS = 20
+HISTORY_DEFAULT_WINDOW = datetime.timedelta(days=30)
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# get-holdings-by-user, one entry per fund held
+HOLDING_FIELDS = ("id_reksadana", "name", "total_nominal", "unit_count", "latest_unit_id")
 
 @csrf_exempt  # Remove this if CSRF protection is handled properly
 def create_reksadana(request):
@@ -47,6 +50,10 @@ def create_reksadana(request):
         kustodian = Bank.objects.get(id=kustodian_id)
         penampung = Bank.objects.get(id=penampung_id)
 
+        history_origin = None
+        if settings.HISTORY_MODE == "procedural":
+            history_origin = timezone.now().replace(minute=0, second=0, microsecond=0)
+
         # Create new Reksadana entry
         reksadana = Reksadana.objects.create(
             name=name,
@@ -55,7 +62,8 @@ def create_reksadana(request):
             penampung=penampung,
             nav=nav,
             aum=aum,
-            tingkat_resiko=tingkat_resiko
+            tingkat_resiko=tingkat_resiko,
+            history_origin=history_origin
         )
 
         return JsonResponse({"message": "Reksadana created successfully", "id": str(reksadana.id_reksadana)}, status=201)
@@ -69,10 +77,53 @@ def create_reksadana(request):
     #TODO bikin htmlnya
     # return render(request, "beli_reksadana.html")
 
+def order_data(request):
+    """
+    The fields of an order POST, sent as JSON or from a form such as
+    buy_page.html or portfolio.html.
+    """
+    if request.content_type == "application/json":
+        return json.loads(request.body)
+    return request.POST
+
 def get_all_reksadana(request):
     if request.method == "GET":
-        reksadana_list = Reksadana.objects.all().values()
-        return JsonResponse({"reksadana": list(reksadana_list)}, status=200)
+        return HttpResponse(get_catalogue_payload(), content_type="application/json")
+
+@read_from_replica
+def search_reksadana(request):
+    """
+    Query parameters (all optional):
+    category, kustodian -- CategoryReksadana / Bank id
+    tingkat_resiko      -- Konservatif, Moderat or Agresif
+    name                -- name prefix, case-sensitive
+    sort                -- name (default), nav or aum, "-" prefix for descending
+    limit               -- page size, the next page cursor is sent in X-Next-Cursor
+    cursor              -- value of X-Next-Cursor from the previous page
+    """
+    if request.method == "GET":
+        try:
+            limit = min(int(request.GET.get("limit", SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE)
+            if limit <= 0:
+                raise ValueError("limit must be positive")
+            rows, next_cursor = find_reksadana(
+                category=request.GET.get("category"),
+                tingkat_resiko=request.GET.get("tingkat_resiko"),
+                kustodian=request.GET.get("kustodian"),
+                name=request.GET.get("name"),
+                sort=request.GET.get("sort", "name"),
+                cursor=request.GET.get("cursor"),
+                limit=limit,
+            )
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        response = JsonResponse({"reksadana": rows})
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
 
 @csrf_exempt
 def create_payment(request):
@@ -81,10 +132,11 @@ def create_payment(request):
             user_id = request.user_id
             data = json.loads(request.body)
             id_reksadana = data.get("id_reksadana")
-            nominal = decode_value(data.get("nominal"))
+            nominal = decode_value(data.get("nominal")) if data.get("nominal") else None
 
-            if not user_id or not id_reksadana or not nominal:
-                return JsonResponse({"error": "Missing required fields"}, status=400)
+            error, nominal = parse_purchase(user_id, id_reksadana, nominal)
+            if error:
+                return JsonResponse(error[0], status=error[1])
 
             # Ensure Reksadana exists
             reksadana = get_object_or_404(Reksadana, id_reksadana=id_reksadana)
@@ -100,14 +152,36 @@ def create_payment(request):
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "Invalid nominal"}, status=400)
 
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
+def streamed_rows(rows):
+    """A queryset as a JSON array, read while the response is sent."""
+    # Pick the database now, the body is streamed after the view returns
+    rows = rows.using(rows.db)
+    return StreamingHttpResponse(stream_json_array(rows.iterator()), content_type="application/json")
+
+def astreamed_rows(rows):
+    """streamed_rows for async views, ASGI would buffer a sync iterator whole."""
+    rows = rows.using(rows.db)
+    return StreamingHttpResponse(astream_json_array(rows.aiterator()), content_type="application/json")
+
+@read_from_replica
 def get_payments_by_user(request):
     if request.method == "GET":
         user_id = request.user_id
         payments = Payment.objects.filter(user_id=user_id).values()
-        return JsonResponse(list(payments), safe=False)
+        return streamed_rows(payments)
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+async def aget_payments_by_user(request):
+    """get_payments_by_user for ASGI, see ASYNC_VIEWS."""
+    if request.method == "GET":
+        return astreamed_rows(Payment.objects.filter(user_id=request.user_id).values())
 
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
@@ -118,41 +192,355 @@ def create_unit_dibeli(request):
             user_id = request.user_id
             data = json.loads(request.body)
             id_reksadana = data.get("id_reksadana")
-            nominal = decode_value(data.get("nominal"))
+            nominal = decode_value(data.get("nominal")) if data.get("nominal") else None
 
-            if not user_id or not id_reksadana or not nominal:
-                return JsonResponse({"error": "Missing required fields"}, status=400)
+            error, nominal = parse_purchase(user_id, id_reksadana, nominal)
+            if error:
+                return JsonResponse(error[0], status=error[1])
 
             # Ensure Reksadana exists
             reksadana = get_object_or_404(Reksadana, id_reksadana=id_reksadana)
 
-            unit = UnitDibeli.objects.create(
-                user_id=user_id,
-                id_reksadana=reksadana,
-                nominal=nominal,
-                waktu_pembelian = datetime.datetime.now()
-            )
+            with transaction.atomic():
+                unit = UnitDibeli.objects.create(
+                    user_id=user_id,
+                    id_reksadana=reksadana,
+                    nominal=nominal,
+                    waktu_pembelian = datetime.datetime.now(),
+                    nav_pembelian=current_nav(reksadana)
+                )
+                record_purchases([unit])
 
             return JsonResponse({"message": "Unit dibeli created", "unit_id": unit.id}, status=201)
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({"error": "Invalid nominal"}, status=400)
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@csrf_exempt
+def batch_purchase(request):
+    """
+    Body: {"orders": [{"id_reksadana": ..., "nominal": <encrypted>}, ...]}
+    Returns {"results": [...]} in order, each item with its own status.
+    """
+    if request.method == "POST":
+        try:
+            orders = json.loads(request.body).get("orders")
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(orders, list) or not 0 < len(orders) <= BATCH_MAX_ORDERS:
+            return JsonResponse({"error": f"orders must be a list of 1 to {BATCH_MAX_ORDERS} items"}, status=400)
+
+        orders = [order if isinstance(order, dict) else {} for order in orders]
+        nominals = decrypt_many([order.get("nominal") for order in orders])
+        decoded = [(order.get("id_reksadana"), nominal) for order, nominal in zip(orders, nominals)]
+        results = purchase_units_batch(request.user_id, decoded)
+        return JsonResponse({"results": results}, status=200)
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@csrf_exempt
+def batch_sell(request):
+    """
+    Body: {"ids": [id_unitdibeli, ...]}
+    Returns {"results": [...]} in order, each item with its own status.
+    """
+    if request.method == "POST":
+        try:
+            ids = json.loads(request.body).get("ids")
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(ids, list) or not 0 < len(ids) <= BATCH_MAX_ORDERS:
+            return JsonResponse({"error": f"ids must be a list of 1 to {BATCH_MAX_ORDERS} items"}, status=400)
+
+        results = sell_units_batch(request.user_id, ids)
+        return JsonResponse({"results": results}, status=200)
 
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
+@read_from_replica
 def get_units_by_user(request):
     if request.method == "GET":
         user_id = request.user_id
         units = UnitDibeli.objects.filter(user_id=user_id).values()
-        return JsonResponse(list(units), safe=False)
+        return streamed_rows(units)
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+async def aget_units_by_user(request):
+    """get_units_by_user for ASGI, see ASYNC_VIEWS."""
+    if request.method == "GET":
+        return astreamed_rows(UnitDibeli.objects.filter(user_id=request.user_id).values())
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+def get_holdings_by_user(request):
+    """
+    One entry per fund the user holds, read from the Holding ledger instead
+    of every UnitDibeli row. `latest_unit_id` is the unit a sell acts on.
+    """
+    if request.method == "GET":
+        holdings = [
+            {field: holding[field] for field in HOLDING_FIELDS}
+            for holding in user_holdings(request.user_id, latest_unit=True)
+        ]
+        return JsonResponse(holdings, safe=False)
+
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+def get_portfolio_valuation(request):
+    if request.method == "GET":
+        return JsonResponse(value_portfolio(request.user_id))
 
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
+def parse_history_time(value):
+    """
+    Parses a `from`/`to` query parameter, either a date or an ISO datetime.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def parse_cursor(value):
+    if not value:
+        return None
+    return EPOCH + datetime.timedelta(microseconds=int(value))
+
+def set_next_cursor(response, last_date):
+    patch_vary_headers(response, ["Accept"])
+    if last_date:
+        response["X-Next-Cursor"] = str((last_date - EPOCH) // datetime.timedelta(microseconds=1))
+    return response
+
+def paginated_response(rows, limit, encoding="json"):
+    """
+    `rows` in the given HISTORY_FORMATS encoding, with the cursor of the next
+    page in X-Next-Cursor when the page is full.
+    """
+    if isinstance(rows, QuerySet):
+        # Pick the database now, the body is streamed after the view returns
+        rows = rows.using(rows.db)
+        # Find the cursor up front, the body is streamed after the headers
+        last_date = rows.values_list("date", flat=True)[limit - 1:limit].first() if limit else None
+        if encoding == "json":
+            response = StreamingHttpResponse(stream_json_array(rows.iterator()), content_type=HISTORY_FORMATS[encoding])
+        else:
+            response = HttpResponse(HISTORY_ENCODERS[encoding](list(rows)), content_type=HISTORY_FORMATS[encoding])
+    else:
+        last_date = rows[-1]["date"] if len(rows) == limit else None
+        response = HttpResponse(HISTORY_ENCODERS[encoding](rows), content_type=HISTORY_FORMATS[encoding])
+    return set_next_cursor(response, last_date)
+
+async def apaginated_response(rows, limit, encoding="json"):
+    """paginated_response for async views, querysets are read with the async ORM."""
+    if isinstance(rows, QuerySet):
+        rows = rows.using(rows.db)
+        last_date = await rows.values_list("date", flat=True)[limit - 1:limit].afirst() if limit else None
+        if encoding == "json":
+            response = StreamingHttpResponse(astream_json_array(rows.aiterator()), content_type=HISTORY_FORMATS[encoding])
+        else:
+            rows = [row async for row in rows]
+            response = HttpResponse(HISTORY_ENCODERS[encoding](rows), content_type=HISTORY_FORMATS[encoding])
+    else:
+        last_date = rows[-1]["date"] if len(rows) == limit else None
+        response = HttpResponse(HISTORY_ENCODERS[encoding](rows), content_type=HISTORY_FORMATS[encoding])
+    return set_next_cursor(response, last_date)
+
+def history_query(request):
+    """
+    (start, end, limit, after, resolution, max_points) of a history request.
+    Without a range, limit or cursor the limit is None and the whole series
+    is returned, as before pagination existed. Raises ValueError for invalid
+    parameters.
+    """
+    start = parse_history_time(request.GET.get("from"))
+    end = parse_history_time(request.GET.get("to"))
+    after = parse_cursor(request.GET.get("cursor"))
+    limit = None
+    if any(request.GET.get(name) for name in ("from", "to", "limit", "cursor")):
+        limit = min(int(request.GET.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+    resolution = request.GET.get("resolution", "hourly")
+    max_points = None
+    if request.GET.get("max_points"):
+        max_points = int(request.GET["max_points"])
+        limit = min(limit or max_points, max_points)
+    return start, end, limit, after, resolution, max_points
+
+def history_params(request):
+    """
+    (error response or None, history_query(request) + (encoding,)) of a
+    history request. The resolution is only checked without max_points,
+    which picks one later.
+    """
+    invalid = (None,) * 7
+    try:
+        start, end, limit, after, resolution, max_points = history_query(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400), invalid
+    if (not max_points and resolution not in HISTORY_RESOLUTIONS) or (limit is not None and limit <= 0):
+        return JsonResponse({"error": "Invalid resolution or limit"}, status=400), invalid
+    encoding = negotiate_format(request)
+    if encoding is None:
+        return JsonResponse({"error": "Invalid format"}, status=400), invalid
+    return None, (start, end, limit, after, resolution, max_points, encoding)
+
+def max_points_error():
+    return JsonResponse({"error": "max_points is fewer than the weekly buckets in the range"}, status=400)
+
+@read_from_replica
 def get_reksadana_history(request, id_reksadana):
+    """
+    Query parameters (all optional):
+    from, to    -- date or ISO datetime bounds, inclusive
+    resolution  -- hourly (default), daily or weekly averages
+    max_points  -- pick the finest resolution that fits in this many points
+    limit       -- page size, the next page cursor is sent in X-Next-Cursor.
+                   Defaults to HISTORY_PAGE_SIZE once from, to or cursor is
+                   given, without any of them the whole series is returned.
+    cursor      -- value of X-Next-Cursor from the previous page
+    format      -- json (default), columnar or binary, see encoders.py.
+                   Can also be picked with the Accept header.
+    """
     if request.method == "GET":
-        reksadana = Reksadana.objects.get(id_reksadana=id_reksadana)
-        reksadana.generate_made_up_history_per_hour()
-        return JsonResponse(list(HistoryReksadana.objects.filter(id_reksadana=reksadana).values()), safe=False)
+        reksadana = get_object_or_404(Reksadana, id_reksadana=id_reksadana)
+        if settings.HISTORY_GENERATE_ON_READ:
+            reksadana.generate_made_up_history_per_hour()
+
+        error, (start, end, limit, after, resolution, max_points, encoding) = history_params(request)
+        if error:
+            return error
+        if max_points:
+            resolution = pick_resolution(reksadana, start, end, max_points)
+            if resolution is None:
+                return max_points_error()
+
+        history = query_history(reksadana, start, end, resolution, after, limit)
+        return paginated_response(history, limit, encoding)
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+async def aget_reksadana_history(request, id_reksadana):
+    """get_reksadana_history for ASGI, see ASYNC_VIEWS."""
+    if request.method == "GET":
+        reksadana = await aget_object_or_404(Reksadana, id_reksadana=id_reksadana)
+        if settings.HISTORY_GENERATE_ON_READ:
+            await sync_to_async(reksadana.generate_made_up_history_per_hour)()
+
+        error, (start, end, limit, after, resolution, max_points, encoding) = history_params(request)
+        if error:
+            return error
+        if max_points:
+            resolution = await sync_to_async(pick_resolution)(reksadana, start, end, max_points)
+            if resolution is None:
+                return max_points_error()
+
+        # Stored hourly history comes back as a lazy queryset, read below with
+        # the async ORM. Bucketed and procedural history is computed here.
+        history = await sync_to_async(query_history)(reksadana, start, end, resolution, after, limit)
+        return await apaginated_response(history, limit, encoding)
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+def get_multi_reksadana_history(request):
+    """
+    History of several funds for comparison charts, in one response.
+
+    Query parameters:
+    ids         -- comma separated fund ids (required, at most HISTORY_MAX_FUNDS)
+    from, to    -- window, defaults to the last 30 days
+    resolution  -- hourly (default), daily or weekly
+    max_points  -- pick the finest resolution that fits in this many points
+
+    Returns one shared `date` axis and per fund `nav`/`aum` arrays aligned to it.
+    """
+    if request.method == "GET":
+        try:
+            ids = [uuid.UUID(value) for value in request.GET.get("ids", "").split(",") if value]
+            end = parse_history_time(request.GET.get("to")) or timezone.now()
+            start = parse_history_time(request.GET.get("from")) or end - HISTORY_DEFAULT_WINDOW
+            resolution = request.GET.get("resolution", "hourly")
+            if request.GET.get("max_points"):
+                resolution = resolution_for_span(start, end, int(request.GET["max_points"]))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if not ids or len(ids) > HISTORY_MAX_FUNDS:
+            return JsonResponse({"error": f"Between 1 and {HISTORY_MAX_FUNDS} ids are required"}, status=400)
+        if resolution is None:
+            return max_points_error()
+        if resolution not in HISTORY_RESOLUTIONS:
+            return JsonResponse({"error": "Invalid resolution"}, status=400)
+
+        reksadanas = list(Reksadana.objects.filter(id_reksadana__in=ids))
+        if len(reksadanas) != len(set(ids)):
+            return JsonResponse({"error": "Reksadana not found"}, status=404)
+
+        axis, series = query_aligned_history(reksadanas, start, end, resolution)
+        return JsonResponse({"resolution": resolution, "date": axis, "series": series})
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+def candle_query(request, reksadana):
+    """
+    The CandleReksadana rows a candles request asks for and its limit.
+    Raises ValueError for invalid parameters.
+    """
+    period = request.GET.get("period", "daily")
+    start = parse_history_time(request.GET.get("from"))
+    end = parse_history_time(request.GET.get("to"))
+    after = parse_cursor(request.GET.get("cursor"))
+    limit = min(int(request.GET.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+    if period not in dict(CandleReksadana.PERIOD_CHOICE) or limit <= 0:
+        raise ValueError("Invalid period or limit")
+
+    candles = CandleReksadana.objects.filter(id_reksadana=reksadana, period=period)
+    if start:
+        candles = candles.filter(date__gte=start)
+    if end:
+        candles = candles.filter(date__lte=end)
+    if after:
+        candles = candles.filter(date__gt=after)
+    return candles.order_by("date").values("date", *CANDLE_FIELDS)[:limit], limit
+
+@read_from_replica
+def get_reksadana_candles(request, id_reksadana):
+    """
+    Daily or monthly NAV/AUM candles, read straight from CandleReksadana.
+    Takes the same from/to/limit/cursor parameters as get_reksadana_history
+    plus period=daily (default) or monthly.
+    """
+    if request.method == "GET":
+        reksadana = get_object_or_404(Reksadana, id_reksadana=id_reksadana)
+        try:
+            candles, limit = candle_query(request, reksadana)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return paginated_response(list(candles), limit)
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+@read_from_replica
+async def aget_reksadana_candles(request, id_reksadana):
+    """get_reksadana_candles for ASGI, see ASYNC_VIEWS."""
+    if request.method == "GET":
+        reksadana = await aget_object_or_404(Reksadana, id_reksadana=id_reksadana)
+        try:
+            candles, limit = candle_query(request, reksadana)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return await apaginated_response([row async for row in candles], limit)
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 def edit_reksadana(request):
@@ -201,7 +589,9 @@ def delete_unit_dibeli_by_id(request):
         if str(request.user_id) != str(unitdibeli.user_id):
             return JsonResponse({"error": "You are not authorized to delete this unit"}, status=403)
 
-        unitdibeli.delete()
+        if not remove_unit(unitdibeli):
+            # A concurrent sell removed it first
+            return JsonResponse({"error": "UnitDibeli not found"}, status=404)
         return JsonResponse({"message": "UnitDibeli deleted successfully"}, status=200)
 
     except json.JSONDecodeError:
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tibib import authz
+
+
+class Command(BaseCommand):
+    help = "Deny staff actions to a token straight away, whatever its role claim or cached check says"
+
+    def add_arguments(self, parser):
+        parser.add_argument("token", help="The token or the whole Authorization header")
+        parser.add_argument("--timeout", type=int, help="Seconds to keep the revocation, default JWT_EXPIRATION_SECONDS")
+
+    def handle(self, *args, **options):
+        if not authz.shared_cache():
+            # This command's process would be the only one to see it
+            backend = settings.CACHES[authz.AUTHZ_CACHE]["BACKEND"]
+            raise CommandError(
+                f"The '{authz.AUTHZ_CACHE}' cache ({backend}) is not shared between processes, "
+                "use a file-based, Redis or database cache so the revocation reaches the workers"
+            )
+        authz.revoke_token(options["token"], timeout=options["timeout"])
+        self.stdout.write("Revoked")
@@ -1,3 +1,152 @@
-from django.test import TestCase
+import tempfile
+import time
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from auth_page.tests import StandInAuthTestCase
+from tibib import authz, upstream
+from tibib.middleware import JWTAuthenticationMiddleware
+from tibib.testing import ASYNC_URLCONF, bearer
+
+
+def staff_view(request):
+    denied = authz.check_staff(request)
+    if denied is not None:
+        return denied
+    return HttpResponse()
+
+
+async def astaff_view(request):
+    denied = await authz.acheck_staff(request)
+    if denied is not None:
+        return denied
+    return HttpResponse()
+
+
+def authz_cache(location):
+    """CACHES with the 'authz' cache in `location`, like the default setup."""
+    return {
+        **settings.CACHES,
+        authz.AUTHZ_CACHE: {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location},
+    }
+
+
+class StaffAuthzTests(StandInAuthTestCase):
+    def setUp(self):
+        super().setUp()
+        location = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            CACHES=authz_cache(location),
+            UPSTREAMS={"auth": {"base_url": self.server.base_url, "retries": 0, "failure_threshold": 1000}},
+        ))
+        upstream.reset_clients()
+        self.addCleanup(upstream.reset_clients)
+        self.factory = RequestFactory(HTTP_HOST="localhost")
+
+    def submit(self, auth_header, view=staff_view):
+        return JWTAuthenticationMiddleware(view)(self.factory.post("/staff/edit-uwu", HTTP_AUTHORIZATION=auth_header))
+
+    def remote_calls(self):
+        return self.server.hits.get("/staff/", 0)
+
+    def test_role_claim_decides_without_the_auth_service(self):
+        for _ in range(3):
+            self.assertEqual(self.submit(bearer(role="staff")).status_code, 200)
+            self.assertEqual(self.submit(bearer(role="user")).status_code, 403)
+        self.assertEqual(self.remote_calls(), 0)
+
+    def test_remote_check_is_cached(self):
+        for _ in range(3):
+            self.assertEqual(self.submit("Token opaque-staff-session").status_code, 200)
+            self.assertEqual(self.submit("Token not-staff").status_code, 403)
+        self.assertEqual(self.remote_calls(), 2)
+
+        # Each answer is asked for again once its TTL is over
+        with override_settings(STAFF_AUTHZ_TTL=0.2, STAFF_AUTHZ_NEGATIVE_TTL=0.1):
+            authz.forget_token("Token opaque-staff-session")
+            authz.forget_token("Token not-staff")
+            self.submit("Token opaque-staff-session"), self.submit("Token not-staff")
+            time.sleep(0.25)
+            self.submit("Token opaque-staff-session"), self.submit("Token not-staff")
+        self.assertEqual(self.remote_calls(), 6)
+
+    def test_claims_can_be_ignored(self):
+        with override_settings(STAFF_AUTHZ_TRUST_CLAIMS=False):
+            user_token = bearer(role="user")
+            self.assertEqual(self.submit(user_token).status_code, 200)
+            self.assertEqual(self.submit(user_token).status_code, 200)
+        self.assertEqual(self.remote_calls(), 1)
+
+    def test_revocation(self):
+        # Beats both a staff claim and a cached allow
+        staff_token, opaque = bearer(role="staff"), "Token opaque-staff-session"
+        self.assertEqual(self.submit(staff_token).status_code, 200)
+        self.assertEqual(self.submit(opaque).status_code, 200)
+        call_command("revoke_staff_token", staff_token, stdout=StringIO())
+        authz.revoke_token(opaque)
+        self.assertEqual(self.submit(staff_token).status_code, 403)
+        self.assertEqual(self.submit(opaque).status_code, 403)
+
+    def test_auth_service_down(self):
+        with override_settings(UPSTREAMS={"auth": {"base_url": "http://127.0.0.1:9", "retries": 0}}):
+            upstream.reset_clients()
+            self.assertEqual(self.submit("Token unknown").status_code, 503)
+        self.assertIsNone(caches[authz.AUTHZ_CACHE].get(authz.decision_key(authz.token_digest("Token unknown"))))
+
+    async def test_async_check(self):
+        self.assertEqual((await self.asubmit(bearer(role="staff"))).status_code, 200)
+        self.assertEqual((await self.asubmit(bearer(role="user"))).status_code, 403)
+        for _ in range(2):
+            self.assertEqual((await self.asubmit("Token opaque-staff-session")).status_code, 200)
+            self.assertEqual((await self.asubmit("Token not-staff")).status_code, 403)
+        self.assertEqual(self.remote_calls(), 2)
+
+        staff_token = bearer(role="staff")
+        await caches[authz.AUTHZ_CACHE].aset(authz.revoked_key(authz.token_digest(staff_token)), True)
+        self.assertEqual((await self.asubmit(staff_token)).status_code, 403)
+
+    async def asubmit(self, auth_header):
+        return await self.submit(auth_header, view=astaff_view)
+
+
+class AsyncStaffViewTests(TestCase):
+    def setUp(self):
+        location = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(ROOT_URLCONF=ASYNC_URLCONF, CACHES=authz_cache(location)))
+
+    async def edit(self, headers=None):
+        return await self.async_client.post(
+            "/staff/edit-uwu", "{}", content_type="application/json", headers=headers or {},
+        )
+
+    async def test_staff_check(self):
+        self.assertEqual((await self.edit()).status_code, 401)
+        self.assertEqual((await self.edit({"Authorization": bearer(role="user")})).status_code, 403)
+        response = await self.edit({"Authorization": bearer(role="staff")})
+        self.assertRedirects(response, "/staff/daftar_reksadana/", fetch_redirect_response=False)
+
+        revoked = bearer(role="staff")
+        await sync_to_async(authz.revoke_token)(revoked)
+        self.assertEqual((await self.edit({"Authorization": revoked})).status_code, 403)
+
+
+class RevokeStaffTokenTests(SimpleTestCase):
+    def test_refuses_a_per_process_cache(self):
+        locmem = {**settings.CACHES, authz.AUTHZ_CACHE: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with override_settings(CACHES=locmem):
+            with self.assertRaisesMessage(CommandError, "not shared between processes"):
+                call_command("revoke_staff_token", "Token x")
+            self.assertIsNone(caches[authz.AUTHZ_CACHE].get(authz.revoked_key(authz.token_digest("Token x"))))
+
+    def test_revocation_reaches_other_processes(self):
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES=authz_cache(location)):
+            call_command("revoke_staff_token", "Token x", stdout=StringIO())
+            # A fresh cache object on the same location, as another worker has
+            other_worker = caches.create_connection(authz.AUTHZ_CACHE)
+            self.assertTrue(other_worker.get(authz.revoked_key(authz.token_digest("Token x"))))
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path
-from .views import create_uwu, edit_uwu
+from .views import acreate_uwu, aedit_uwu, create_uwu, edit_uwu
 
 urlpatterns = [
-    path('create-uwu', create_uwu,name="create-reksadana"),
-    path('edit-uwu', edit_uwu,name="edit-reksadana"),
+    path('create-uwu', acreate_uwu if settings.ASYNC_VIEWS else create_uwu,name="create-reksadana"),
+    path('edit-uwu', aedit_uwu if settings.ASYNC_VIEWS else edit_uwu,name="edit-reksadana"),
 ]
@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+This is the async deployment profile, it switches the I/O bound endpoints
+to their async views (ASYNC_VIEWS) unless the environment says otherwise:
+
+    gunicorn tibib.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+    uvicorn tibib.asgi:application --workers 4 --no-access-log
 """
 
 import os
@@ -12,5 +18,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tibib.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
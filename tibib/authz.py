@@ -0,0 +1,167 @@
+"""
+Role checks for views that need more than a signed-in user, e.g. staff
+actions.
+
+The role claim JWTAuthenticationMiddleware already verified is trusted
+first. Only requests without one (a token the middleware could not read)
+are checked against the auth service, and that answer is cached per token
+digest: allowed for STAFF_AUTHZ_TTL seconds, denied for
+STAFF_AUTHZ_NEGATIVE_TTL. revoke_token() denies a token straight away,
+whatever its claims or cached answer say, in every worker process as long
+as the 'authz' cache is shared between them.
+"""
+import hashlib
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import JsonResponse
+
+from tibib.upstream import get_async_client, get_client
+
+AUTHZ_CACHE = "authz"
+ALLOWED = "allowed"
+DENIED = "denied"
+
+
+def token_digest(auth_header):
+    token = auth_header.removeprefix("Bearer ")
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decision_key(digest):
+    return f"authz:staff:{digest}"
+
+
+def revoked_key(digest):
+    return f"authz:revoked:{digest}"
+
+
+def shared_cache():
+    """
+    Whether the 'authz' cache is seen by every worker process, i.e. not a
+    per-process (LocMem) or no-op (Dummy) cache.
+    """
+    return not isinstance(caches[AUTHZ_CACHE], (LocMemCache, DummyCache))
+
+
+def revoke_token(auth_header, timeout=None):
+    """
+    Denies staff actions to this token until `timeout` seconds pass,
+    by default for as long as a token can be valid.
+    """
+    digest = token_digest(auth_header)
+    cache = caches[AUTHZ_CACHE]
+    cache.set(revoked_key(digest), True, timeout=timeout or settings.JWT_EXPIRATION_SECONDS)
+    cache.delete(decision_key(digest))
+
+
+def forget_token(auth_header):
+    """Drops the cached answer, the next check asks the auth service again."""
+    caches[AUTHZ_CACHE].delete(decision_key(token_digest(auth_header)))
+
+
+def cached_answer(value):
+    # The denied status itself is cached so it can be replayed
+    return (ALLOWED, 200) if value == ALLOWED else (DENIED, value)
+
+
+def answer_to_cache(status):
+    """(value, timeout) to cache for an auth service status, None for no caching."""
+    if status == 200:
+        return ALLOWED, settings.STAFF_AUTHZ_TTL
+    if status in (401, 403):
+        return status, settings.STAFF_AUTHZ_NEGATIVE_TTL
+    return None
+
+
+def remote_staff_check(auth_header, digest):
+    """
+    Asks the auth service, caching 200 as allowed and 401/403 as denied.
+    Returns (decision, status), other statuses are returned uncached.
+    """
+    cache = caches[AUTHZ_CACHE]
+    value = cache.get(decision_key(digest))
+    if value is not None:
+        return cached_answer(value)
+
+    response = get_client("auth").get("/staff/", headers={"Authorization": auth_header})
+    answer = answer_to_cache(response.status_code)
+    if answer is not None:
+        cache.set(decision_key(digest), answer[0], timeout=answer[1])
+    return (ALLOWED if response.status_code == 200 else DENIED), response.status_code
+
+
+async def aremote_staff_check(auth_header, digest):
+    cache = caches[AUTHZ_CACHE]
+    value = await cache.aget(decision_key(digest))
+    if value is not None:
+        return cached_answer(value)
+
+    response = await get_async_client("auth").get("/staff/", headers={"Authorization": auth_header})
+    answer = answer_to_cache(response.status_code)
+    if answer is not None:
+        await cache.aset(decision_key(digest), answer[0], timeout=answer[1])
+    return (ALLOWED if response.status_code == 200 else DENIED), response.status_code
+
+
+def claim_decision(request):
+    """
+    Whether a verified role claim allows staff actions, None when there is
+    no claim to trust.
+    """
+    role = getattr(request, "user_role", None)
+    if role is None or not settings.STAFF_AUTHZ_TRUST_CLAIMS:
+        return None
+    return role in settings.STAFF_ROLES
+
+
+def decision_response(decision, status):
+    if decision == ALLOWED:
+        return None
+    return JsonResponse({"error": "Unauthorized or forbidden access"}, status=status)
+
+
+def check_staff(request):
+    """
+    None when the request may perform staff actions, otherwise the
+    JsonResponse to return instead.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return JsonResponse({"error": "Missing Authorization token"}, status=401)
+
+    digest = token_digest(auth_header)
+    if caches[AUTHZ_CACHE].get(revoked_key(digest)):
+        return decision_response(DENIED, 403)
+
+    allowed = claim_decision(request)
+    if allowed is not None:
+        return decision_response(ALLOWED if allowed else DENIED, 403)
+
+    try:
+        return decision_response(*remote_staff_check(auth_header, digest))
+    except requests.RequestException as e:
+        return JsonResponse({"error": f"Auth service unavailable: {str(e)}"}, status=503)
+
+
+async def acheck_staff(request):
+    """check_staff for async views."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return JsonResponse({"error": "Missing Authorization token"}, status=401)
+
+    digest = token_digest(auth_header)
+    if await caches[AUTHZ_CACHE].aget(revoked_key(digest)):
+        return decision_response(DENIED, 403)
+
+    allowed = claim_decision(request)
+    if allowed is not None:
+        return decision_response(ALLOWED if allowed else DENIED, 403)
+
+    try:
+        return decision_response(*await aremote_staff_check(auth_header, digest))
+    except requests.RequestException as e:
+        return JsonResponse({"error": f"Auth service unavailable: {str(e)}"}, status=503)
@@ -0,0 +1,61 @@
+"""
+AES-CBC encoding of order values exchanged with the payment processor.
+
+The key, IV and Cipher are built once at import, each value only gets its
+own encryptor/decryptor and PKCS7 padder.
+"""
+import base64
+import os
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+AES_KEY = base64.b64decode(os.getenv("AES_KEY"))
+AES_IV = base64.b64decode(os.getenv("AES_IV"))
+
+CBC_CIPHER = Cipher(algorithms.AES(AES_KEY), modes.CBC(AES_IV), backend=default_backend())
+PKCS7 = padding.PKCS7(algorithms.AES.block_size)
+
+
+def encode_value(value):
+    """
+    Encrypts a single value using AES.
+    """
+    padder = PKCS7.padder()
+    padded_data = padder.update(str(value).encode("utf-8")) + padder.finalize()
+    encryptor = CBC_CIPHER.encryptor()
+    encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
+    return encrypted_data.hex()  # Convert bytes to hex string
+
+
+def decode_value(encrypted_value):
+    """
+    Decrypts a single value using AES.
+    """
+    encrypted_bytes = bytes.fromhex(encrypted_value)  # Convert hex string to bytes
+    decryptor = CBC_CIPHER.decryptor()
+    decrypted_data = decryptor.update(encrypted_bytes) + decryptor.finalize()
+    unpadder = PKCS7.unpadder()
+    return (unpadder.update(decrypted_data) + unpadder.finalize()).decode("utf-8")
+
+
+def encrypt_many(values):
+    """
+    Same result as ``[encode_value(value) for value in values]``.
+    """
+    return [encode_value(value) for value in values]
+
+
+def decrypt_many(encrypted_values):
+    """
+    Like ``[decode_value(value) for value in encrypted_values]``, except that
+    values that cannot be decrypted come back as None instead of raising.
+    """
+    values = []
+    for encrypted_value in encrypted_values:
+        try:
+            values.append(decode_value(encrypted_value))
+        except (TypeError, ValueError):
+            values.append(None)
+    return values
@@ -1,30 +1,199 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
 from django.http import JsonResponse
 
+from tibib import routers
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified JWT claims, keyed by the token's SHA-256 digest.
+
+    Entries live for at most `ttl` seconds and never past the token's own
+    `exp`. A `maxsize` of 0 disables caching. `clock` returns the current
+    Unix time.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token, claims):
+        if not self.maxsize:
+            return
+        expires_at = self.clock() + self.ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, claims["exp"])
+        key = hashlib.sha256(token.encode()).digest()
+        with self.lock:
+            self.entries[key] = (claims, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+class RoutePolicy:
+    """
+    Maps a request path to "public", "optional" or "required" auth.
+
+    `rules` maps path prefixes to a policy, a trailing "$" makes the path
+    exact. The most specific rule wins. All rules are compiled into a single
+    regex once, so a lookup is one match call.
+    """
+
+    def __init__(self, rules, default):
+        ordered = sorted(rules.items(), key=lambda rule: len(rule[0].rstrip("$")), reverse=True)
+        self.policies = [policy for _, policy in ordered]
+        self.default = default
+        alternatives = []
+        for i, (path, _) in enumerate(ordered):
+            if path.endswith("$"):
+                alternatives.append(f"(?P<r{i}>{re.escape(path[:-1])}\\Z)")
+            else:
+                alternatives.append(f"(?P<r{i}>{re.escape(path)})")
+        self.matcher = re.compile("|".join(alternatives)) if alternatives else None
+
+    def __call__(self, path):
+        match = self.matcher and self.matcher.match(path)
+        if not match:
+            return self.default
+        return self.policies[int(match.lastgroup[1:])]
+
+
 class JWTAuthenticationMiddleware:
-    """Middleware to authenticate users via JWT token."""
+    """
+    Middleware to authenticate users via JWT token.
+
+    Sync and async, so async views under ASGI don't hop to a thread for it.
+    """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.token_cache = TokenCache(settings.JWT_CACHE_SIZE, settings.JWT_CACHE_TTL)
+        self.route_policy = RoutePolicy(settings.JWT_ROUTE_POLICY, settings.JWT_DEFAULT_POLICY)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.authenticate(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.authenticate(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def authenticate(self, request):
+        """
+        Attaches the token's claims to `request`. Returns the error response
+        when the request may not go through, else None.
+        """
+        policy = self.route_policy(request.path_info)
+        if policy == "public":
+            return None
+
         auth_header = request.headers.get("Authorization")
 
         if not auth_header:
+            if policy == "optional":
+                return None
             return JsonResponse({"error": "Authorization header missing"}, status=401)
 
         if auth_header and auth_header.startswith("Bearer "):
             token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
-                request.user_id = payload["id"]  # Attach user ID to request
-                request.user_username = payload['full_phone']
-                request.user_role = payload['role']
-            except jwt.ExpiredSignatureError:
-                return JsonResponse({"error": "Token has expired"}, status=401)
-            except jwt.InvalidTokenError as e:
-                print("JWT Error:", str(e))
-                return JsonResponse({"error": "Invalid token"}, status=401)
-
-        return self.get_response(request)
+            payload = self.token_cache.get(token)
+            if payload is None:
+                try:
+                    payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
+                except jwt.ExpiredSignatureError:
+                    return JsonResponse({"error": "Token has expired"}, status=401)
+                except jwt.InvalidTokenError as e:
+                    logger.warning("Rejected JWT: %s", e)
+                    return JsonResponse({"error": "Invalid token"}, status=401)
+                self.token_cache.set(token, payload)
+
+            request.user_id = payload["id"]  # Attach user ID to request
+            request.user_username = payload['full_phone']
+            request.user_role = payload['role']
+
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Tracks whether a request wrote to the primary (tibib.routers). After a
+    write the client gets a cookie that keeps its reads on the primary for
+    REPLICA_PIN_SECONDS, long enough for the replica to catch up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.start_request(pinned=routers.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self.pin(request, response, wrote)
+
+    async def __acall__(self, request):
+        token = routers.start_request(pinned=routers.PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            wrote = routers.end_request(token)
+        return self.pin(request, response, wrote)
+
+    def pin(self, request, response, wrote):
+        # An unsafe method counts too, its write may happen in another
+        # service, e.g. the http order transport
+        if wrote or request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                routers.PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,112 @@
+"""
+Primary/replica routing.
+
+Writes always go to the primary ('default'). Reads go to the 'replica' alias
+only inside views marked with @read_from_replica, and only while the request
+has not written anything and the client is not pinned to the primary by
+ReplicaPinningMiddleware after a recent write. Without a replica configured
+(READ_FROM_REPLICA off) every query uses 'default'.
+
+The routing state ends with the request, so a response that reads while
+it is sent (StreamingHttpResponse) must pick its database in the view with
+``queryset.using(queryset.db)``.
+
+A request counts as having written once it sends an INSERT, UPDATE or
+DELETE to the primary, not when the router is merely asked for a write
+alias: assigning a foreign key asks for one too.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+
+REPLICA = "replica"
+PIN_COOKIE = "tibib_primary"
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Routing state of the current request, a dict shared by reference so the
+# threads sync_to_async runs in update the same one
+_routing = ContextVar("db_routing", default=None)
+
+
+def start_request(pinned=False):
+    """Starts routing a request, returns the token for end_request()."""
+    return _routing.set({"replica": False, "pinned": pinned, "wrote": False})
+
+
+def end_request(token):
+    """Whether the request wrote to the primary."""
+    state = _routing.get()
+    _routing.reset(token)
+    return bool(state and state["wrote"])
+
+
+def read_from_replica(view):
+    """Lets the reads of a read-heavy view go to the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            state = _routing.get()
+            if state is None:
+                return await view(request, *args, **kwargs)
+            previous, state["replica"] = state["replica"], True
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                state["replica"] = previous
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            state = _routing.get()
+            if state is None:
+                return view(request, *args, **kwargs)
+            previous, state["replica"] = state["replica"], True
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                state["replica"] = previous
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is not None and state["replica"] and not state["pinned"] and not state["wrote"]
+            and settings.READ_FROM_REPLICA
+        ):
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db != REPLICA
+
+
+def record_writes(execute, sql, params, many, context):
+    """
+    Execute wrapper of the primary's connections, marks the current request
+    as having written so it reads its own writes for the rest of it.
+    """
+    state = _routing.get()
+    if state is not None and not state["wrote"] and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        state["wrote"] = True
+    return execute(sql, params, many, context)
+
+
+def install_write_recorder(sender, connection, **kwargs):
+    if connection.alias == DEFAULT_DB_ALIAS and record_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_writes)
+
+
+connection_created.connect(install_write_recorder)
@@ -0,0 +1,48 @@
+"""
+Helpers shared by the apps' tests.
+
+Tests of async views route through this module, ``ROOT_URLCONF=ASYNC_URLCONF``:
+the site's URLconf with every view that has an async variant swapped for
+it, like tibib.asgi serves it with ASYNC_VIEWS on.
+"""
+import sys
+import uuid
+
+import jwt
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.urls import URLPattern, URLResolver
+
+from tibib import urls as site_urls
+
+ASYNC_URLCONF = __name__
+
+
+def async_variant(view):
+    """The async view next to `view`, named like it with an "a" prefix, or None."""
+    module = sys.modules.get(getattr(view, "__module__", None))
+    variant = getattr(module, "a" + getattr(view, "__name__", ""), None)
+    return variant if iscoroutinefunction(variant) else None
+
+
+def async_patterns(patterns):
+    routed = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            routed.append(URLResolver(
+                pattern.pattern, async_patterns(pattern.url_patterns), pattern.default_kwargs,
+                pattern.app_name, pattern.namespace,
+            ))
+        else:
+            view = async_variant(pattern.callback) or pattern.callback
+            routed.append(URLPattern(pattern.pattern, view, pattern.default_args, pattern.name))
+    return routed
+
+
+urlpatterns = async_patterns(site_urls.urlpatterns)
+
+
+def bearer(user_id=None, role="user", **claims):
+    """An Authorization header value with a JWT the middleware accepts."""
+    claims = {"id": str(user_id or uuid.uuid4()), "full_phone": "+620000", "role": role, **claims}
+    return "Bearer " + jwt.encode(claims, settings.JWT_SECRET_KEY, algorithm="HS256")
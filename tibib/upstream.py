@@ -0,0 +1,323 @@
+"""
+Pooled HTTP clients for the services this app calls, e.g. the auth service.
+
+One requests.Session per upstream keeps connections alive between calls.
+Every call has connect/read timeouts, idempotent requests are retried with
+backoff, and a circuit breaker fails fast while an upstream keeps erroring
+so a slow service can't tie up every worker.
+
+Async views use get_async_client(), the same policy on an httpx.AsyncClient.
+It shares the circuit breaker and metrics of the sync client and raises the
+same requests exceptions, so callers handle both alike.
+"""
+import asyncio
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+LATENCY_WINDOW = 1024  # recent calls kept per upstream for percentiles
+RETRY_STATUSES = (502, 503, 504)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without calling the upstream while its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. After
+    `reset_timeout` seconds one trial call is let through, its outcome
+    closes the circuit again or keeps it open for another period. Every
+    call that allow() let through must end in one of the record_* methods.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def record_aborted(self):
+        """
+        The call ended without telling anything about the upstream, e.g. it
+        was cancelled. A trial it held is handed to the next call.
+        """
+        with self.lock:
+            self.trial_running = False
+
+
+class LatencyStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+
+    def record(self, elapsed, error=False):
+        with self.lock:
+            self.calls += 1
+            self.errors += error
+            self.total += elapsed
+            self.recent.append(elapsed)
+
+    def reject(self):
+        with self.lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self.lock:
+            recent = sorted(self.recent)
+            stats = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "avg_ms": round(self.total / self.calls * 1000, 2) if self.calls else None,
+            }
+        if len(recent) >= 2:
+            cuts = statistics.quantiles(recent, n=100, method="inclusive")
+            stats.update(p50_ms=round(cuts[49] * 1000, 2), p95_ms=round(cuts[94] * 1000, 2),
+                         p99_ms=round(cuts[98] * 1000, 2))
+        stats["max_ms"] = round(recent[-1] * 1000, 2) if recent else None
+        return stats
+
+
+class UpstreamClient:
+    """
+    Session for one upstream. `get`/`post` take a path relative to
+    `base_url` and the usual requests keyword arguments.
+
+    Only idempotent methods are retried on read errors and 502/503/504,
+    other methods only when the connection could not be made.
+    5xx responses and request errors count as circuit breaker failures.
+    """
+
+    def __init__(self, name, base_url, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.1,
+                 pool_size=10, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.stats = LatencyStats()
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, path, **kwargs):
+        if not self.breaker.allow():
+            self.stats.reject()
+            raise CircuitOpenError(f"{self.name} is unavailable, circuit open")
+
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except requests.RequestException:
+            self.stats.record(time.perf_counter() - started, error=True)
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, or failed before there was a response to judge
+            self.breaker.record_aborted()
+            raise
+
+        failed = response.status_code >= 500
+        self.stats.record(time.perf_counter() - started, error=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def metrics(self):
+        return {**self.stats.snapshot(), "circuit": self.breaker.state}
+
+
+class AsyncUpstreamClient:
+    """
+    UpstreamClient for async views, on an httpx.AsyncClient. An AsyncClient
+    is bound to the event loop it first ran on, get_async_client() keeps one
+    per loop.
+    """
+
+    def __init__(self, name, base_url, connect_timeout=2.0, read_timeout=5.0, retries=2, backoff=0.1,
+                 pool_size=10, failure_threshold=5, reset_timeout=30.0, breaker=None, stats=None):
+        self.name = name
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(failure_threshold, reset_timeout)
+        self.stats = stats or LatencyStats()
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def send(self, method, path, **kwargs):
+        """The request with Retry.DEFAULT_ALLOWED_METHODS semantics, see UpstreamClient."""
+        idempotent = method.upper() in Retry.DEFAULT_ALLOWED_METHODS
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            last = attempt == self.retries
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if last:
+                    raise (requests.ConnectTimeout if isinstance(e, httpx.ConnectTimeout)
+                           else requests.ConnectionError)(str(e)) from e
+                continue
+            except httpx.TimeoutException as e:
+                if last or not idempotent:
+                    raise requests.ReadTimeout(str(e)) from e
+                continue
+            except httpx.TransportError as e:
+                if last or not idempotent:
+                    raise requests.ConnectionError(str(e)) from e
+                continue
+            if last or not idempotent or response.status_code not in RETRY_STATUSES:
+                return response
+
+    async def request(self, method, path, **kwargs):
+        if not self.breaker.allow():
+            self.stats.reject()
+            raise CircuitOpenError(f"{self.name} is unavailable, circuit open")
+
+        started = time.perf_counter()
+        try:
+            response = await self.send(method, path, **kwargs)
+        except requests.RequestException:
+            self.stats.record(time.perf_counter() - started, error=True)
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled, or failed before there was a response to judge
+            self.breaker.record_aborted()
+            raise
+
+        failed = response.status_code >= 500
+        self.stats.record(time.perf_counter() - started, error=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+# event loop -> {name: AsyncUpstreamClient}
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client(name):
+    """
+    The process-wide client of an upstream configured in settings.UPSTREAMS.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = UpstreamClient(name, **settings.UPSTREAMS[name])
+    return client
+
+
+def get_async_client(name):
+    """
+    The async client of an upstream for the running event loop, sharing
+    the circuit breaker and metrics of get_client(name).
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    client = clients.get(name)
+    if client is None:
+        shared = get_client(name)
+        client = clients[name] = AsyncUpstreamClient(
+            name, breaker=shared.breaker, stats=shared.stats, **settings.UPSTREAMS[name]
+        )
+    return client
+
+
+def upstream_metrics():
+    return {name: client.metrics() for name, client in list(_clients.items())}
+
+
+def reset_clients():
+    """
+    Drops the clients so the next get_client() reads settings.UPSTREAMS
+    again, for when the settings change at runtime.
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        # Async clients can only be closed on their own loop, they are dropped
+        _async_clients.clear()
+    for client in clients:
+        client.session.close()